@@ -46,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'users.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -84,6 +85,8 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'kykam_agencies.wsgi.application'
+# HTTP plus the booking notification WebSockets (users/routing.py), served by Daphne
+ASGI_APPLICATION = 'kykam_agencies.asgi.application'
 
 DATABASES = {
     'default': {
@@ -106,13 +109,93 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'users.authentication.ExpiringTokenAuthentication',
         'users.authentication.CsrfExemptSessionAuthentication', # This one replaces SessionAuthentication
-        'rest_framework.authentication.TokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
 }
 
+# Keyset pagination for list endpoints (users/pagination.py)
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', 20))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 100))
+
+# Rows fetched per round trip by the streaming admin exports (users/exports.py)
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
+
+# Rows per admin dashboard counter (users/counters.py). Each write adds to one random shard,
+# so concurrent writers rarely queue on the same row; reads sum the shards.
+PLATFORM_COUNTER_SHARDS = int(os.getenv('PLATFORM_COUNTER_SHARDS', 8))
+
+# Delta sync (?since=, users/sync.py): the cursor that ends a sync is set this many seconds back,
+# so rows whose transaction committed late are sent on the next sync instead of being missed
+BOOKING_SYNC_LAG = int(os.getenv('BOOKING_SYNC_LAG', 5))
+# Days deleted-booking tombstones are kept; older cursors are told to reload the full list
+BOOKING_TOMBSTONE_RETENTION_DAYS = int(os.getenv('BOOKING_TOMBSTONE_RETENTION_DAYS', 30))
+
+# --- CACHE ---
+# Shared between processes (Redis in docker-compose); falls back to per-process memory
+REDIS_URL = os.getenv('REDIS_URL')
+# The channel layer carries booking events (users/events.py) to whichever process holds the
+# user's WebSocket, so outside a single process it has to be Redis as well.
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [REDIS_URL]},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
+
+# Seconds a notification socket may stay open before sending its auth message (users/consumers.py)
+WEBSOCKET_AUTH_TIMEOUT = int(os.getenv('WEBSOCKET_AUTH_TIMEOUT', 10))
+
+# Seconds a process trusts its copy of the PlatformSetting row before re-checking the shared cache
+PLATFORM_SETTINGS_CACHE_TTL = int(os.getenv('PLATFORM_SETTINGS_CACHE_TTL', 5))
+
+# Token authentication cache (users/caching.py): shared entries live AUTH_CACHE_TTL seconds,
+# the per-process LRU holds up to AUTH_CACHE_MAX_ENTRIES for AUTH_CACHE_LOCAL_TTL seconds
+AUTH_CACHE_TTL = int(os.getenv('AUTH_CACHE_TTL', 300))
+AUTH_CACHE_LOCAL_TTL = int(os.getenv('AUTH_CACHE_LOCAL_TTL', 5))
+AUTH_CACHE_INVALID_TTL = int(os.getenv('AUTH_CACHE_INVALID_TTL', 30))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv('AUTH_CACHE_MAX_ENTRIES', 10000))
+
+# Worker counts per category: shared entry lives CATEGORY_COUNTS_CACHE_TTL seconds (it is also
+# cleared whenever a worker's role, worker_type or is_deleted changes), local copies CATEGORY_COUNTS_LOCAL_TTL
+CATEGORY_COUNTS_CACHE_TTL = int(os.getenv('CATEGORY_COUNTS_CACHE_TTL', 600))
+CATEGORY_COUNTS_LOCAL_TTL = int(os.getenv('CATEGORY_COUNTS_LOCAL_TTL', 5))
+
+# Version stamps behind the ETags of polled endpoints (users/conditional.py). An expired stamp only
+# costs one full response, so they don't need to live forever.
+VERSION_STAMP_TTL = int(os.getenv('VERSION_STAMP_TTL', 86400))
+
+# Worker directory pages (ids only); a generation bump on any directory-visible change orphans them all at once
+DIRECTORY_CACHE_TTL = int(os.getenv('DIRECTORY_CACHE_TTL', 300))
+
+# Per-route request metrics served at /api/metrics/ (users/metrics.py). Each process publishes its
+# totals to the shared cache every METRICS_FLUSH_INTERVAL seconds. Scrapers authenticate with
+# `Authorization: Bearer <METRICS_TOKEN>`; admins can read the endpoint with their usual token.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_FLUSH_INTERVAL = int(os.getenv('METRICS_FLUSH_INTERVAL', 10))
+# Registry slots in the shared cache, i.e. the most app processes whose totals are merged
+METRICS_MAX_PROCESSES = int(os.getenv('METRICS_MAX_PROCESSES', 64))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
 # --- STATIC & MEDIA FILES ---
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
@@ -121,6 +204,21 @@ STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Identity documents (users/media.py): signed URLs stay valid for one to two PROTECTED_MEDIA_URL_TTL
+# periods. With PROTECTED_MEDIA_ACCEL_PREFIX set (the internal nginx location aliasing MEDIA_ROOT)
+# nginx sends the bytes; left empty, Django streams them itself.
+PROTECTED_MEDIA_URL_TTL = int(os.getenv('PROTECTED_MEDIA_URL_TTL', 3600))
+PROTECTED_MEDIA_ACCEL_PREFIX = os.getenv('PROTECTED_MEDIA_ACCEL_PREFIX', '')
+
+# Background thumbnail generation for uploaded ID / passport photos (users/renditions.py)
+RENDITION_WORKERS = int(os.getenv('RENDITION_WORKERS', 2))
+
+# Duplicate ID photo detection (users/fingerprints.py): images whose 64-bit perceptual hashes differ
+# in at most DUPLICATE_IMAGE_MAX_DISTANCE bits are reported as possible duplicates. At most
+# DUPLICATE_IMAGE_MAX_CANDIDATES index hits are compared per lookup.
+DUPLICATE_IMAGE_MAX_DISTANCE = int(os.getenv('DUPLICATE_IMAGE_MAX_DISTANCE', 6))
+DUPLICATE_IMAGE_MAX_CANDIDATES = int(os.getenv('DUPLICATE_IMAGE_MAX_CANDIDATES', 500))
+
 # --- SECURITY & CORS ---
 CORS_ALLOWED_ORIGINS = [
     os.getenv("FRONTEND_URL", "https://kykamagencies.co.ke"),
@@ -129,6 +227,8 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
     "http://127.0.0.1:5173",
 ]
+# The next-page cursor of paginated lists is sent in the Link header
+CORS_EXPOSE_HEADERS = ['Link', 'X-Sync-Since']
 
 CSRF_TRUSTED_ORIGINS = [
     "https://kykamagencies.co.ke",
@@ -158,4 +258,14 @@ EMAIL_BACKEND = "sendgrid_backend.SendgridBackend"
 SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
 DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL")
 
+# Email outbox (users/outbox.py): views queue emails, `manage.py send_outbox` delivers them.
+# OUTBOX_EMAIL_BACKEND overrides EMAIL_BACKEND for the worker only.
+OUTBOX_EMAIL_BACKEND = os.getenv("OUTBOX_EMAIL_BACKEND")
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 50))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 6))
+OUTBOX_RETRY_BASE_DELAY = int(os.getenv("OUTBOX_RETRY_BASE_DELAY", 60))
+OUTBOX_MAX_RETRY_DELAY = int(os.getenv("OUTBOX_MAX_RETRY_DELAY", 3600))
+# Seconds a worker holds a claimed batch; a batch whose worker died is picked up again after this
+OUTBOX_CLAIM_TIMEOUT = int(os.getenv("OUTBOX_CLAIM_TIMEOUT", 600))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
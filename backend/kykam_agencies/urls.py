@@ -16,8 +16,7 @@ urlpatterns = [
 
 ]
 
-# 3. Serve Media & Static files during development
-# This allows you to view uploaded ID photos via URL when DEBUG is True
+# 3. Serve static files during development
+# Uploads are all identity documents, which only go out through /api/media/ (users/media.py)
 if settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
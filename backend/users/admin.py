@@ -1,10 +1,13 @@
 from django.contrib import admin
 from django.db.models import Count
-from django.utils.html import format_html
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
 from django.contrib import messages
-from django.core.mail import send_mail
-from django.conf import settings
-from .models import User, Booking, Category, PlatformSetting, VerificationLog
+from .models import User, Booking, Category, PlatformSetting, PlatformCounter, VerificationLog, EmailOutbox
+from .verification import review_users
+from .counters import get_counters
+from .renditions import rendition_url
+from .fingerprints import possible_duplicates
 
 # Customizing the Admin Header
 admin.site.site_header = "Kykam Agency Command Center"
@@ -23,16 +26,17 @@ class UserAdmin(admin.ModelAdmin):
     list_editable = ('is_verified',)
     readonly_fields = (
         'display_id_front_large', 'display_id_back_large', 
-        'display_passport_large', 'date_joined', 'last_login'
+        'display_passport_large', 'display_possible_duplicates', 'date_joined', 'last_login'
     )
     
     # --- DASHBOARD METRICS ---
     def changelist_view(self, request, extra_context=None):
         extra_context = extra_context or {}
-        # Metrics for the top boxes
-        extra_context['pending_workers'] = User.objects.filter(role='worker', status='pending').count()
-        extra_context['new_bookings'] = Booking.objects.filter(status='pending').count()
-        extra_context['active_employers'] = User.objects.filter(role='employer', is_verified=True).count()
+        # Metrics for the top boxes, from the incrementally maintained counters
+        counters = get_counters()
+        extra_context['pending_workers'] = counters['pending_workers']
+        extra_context['new_bookings'] = counters['pending_bookings']
+        extra_context['active_employers'] = counters['verified_employers']
         return super().changelist_view(request, extra_context=extra_context)
 
     # --- COLOR CODED STATUS ---
@@ -55,32 +59,27 @@ class UserAdmin(admin.ModelAdmin):
 
     @admin.action(description="Approve & Send Welcome Email")
     def approve_and_notify(self, request, queryset):
-        for user in queryset:
-            user.status = 'approved'
-            user.is_verified = True
-            user.save()
-            # Send Email to Worker
-            try:
-                send_mail(
-                    "Account Verified - Kykam Agency",
-                    f"Hello {user.first_name}, your account has been verified! You are now visible to employers.",
-                    settings.DEFAULT_FROM_EMAIL,
-                    [user.email],
-                    fail_silently=True,
-                )
-            except Exception:
-                pass
-        self.message_user(request, f"Approved {queryset.count()} users and sent notifications.", messages.SUCCESS)
+        updated, skipped = review_users(queryset.values_list('id', flat=True), 'approved', request.user)
+        self.message_user(request, f"Approved {updated} users and queued notifications.", messages.SUCCESS)
+        self.report_skipped(request, skipped)
 
     @admin.action(description="Reject & Request New ID")
     def reject_and_notify(self, request, queryset):
-        queryset.update(status='rejected', is_verified=False)
+        _, skipped = review_users(queryset.values_list('id', flat=True), 'rejected', request.user, notify=False)
         self.message_user(request, "Users rejected. Please manually email them the reason.", messages.WARNING)
+        self.report_skipped(request, skipped)
+
+    def report_skipped(self, request, skipped):
+        if skipped:
+            self.message_user(
+                request, f"Skipped {len(skipped)} accounts that are not active workers (ids: {', '.join(map(str, skipped))}).",
+                messages.WARNING,
+            )
 
     # --- IMAGE RENDERING ---
     def display_thumbnail(self, obj):
         if obj.id_photo_front:
-            return format_html('<img src="{}" style="width: 45px; height: 45px; object-fit: cover; border-radius: 8px; border: 1px solid #eee;" />', obj.id_photo_front.url)
+            return format_html('<img src="{}" style="width: 45px; height: 45px; object-fit: cover; border-radius: 8px; border: 1px solid #eee;" />', rendition_url(obj, 'id_photo_front', 'thumb'))
         return format_html('<span style="color: #999;">No Image</span>')
     display_thumbnail.short_description = 'ID Preview'
 
@@ -99,6 +98,24 @@ class UserAdmin(admin.ModelAdmin):
             return format_html('<a href="{0}" target="_blank"><img src="{0}" width="200" style="border-radius: 10px;" /></a>', obj.passport_img.url)
         return "No File"
 
+    def display_possible_duplicates(self, obj):
+        duplicates = possible_duplicates(obj)
+        if not duplicates:
+            return "None found"
+        return format_html_join(
+            format_html('<br>'),
+            '<a href="{}">{} {}</a> ({}): {} looks like their {} ({} bits apart)',
+            (
+                (
+                    reverse('admin:users_user_change', args=[d['user'].pk]),
+                    d['user'].first_name, d['user'].last_name, d['user'].get_status_display(),
+                    d['field'], d['matched_field'], d['distance'],
+                )
+                for d in duplicates
+            ),
+        )
+    display_possible_duplicates.short_description = 'Possible Duplicates'
+
     def full_name(self, obj):
         return f"{obj.first_name} {obj.last_name}"
     full_name.short_description = 'User Name'
@@ -116,7 +133,8 @@ class UserAdmin(admin.ModelAdmin):
                 'id_number', 
                 'display_id_front_large', 'id_photo_front', 
                 'display_id_back_large', 'id_photo_back', 
-                'display_passport_large', 'passport_img'
+                'display_passport_large', 'passport_img',
+                'display_possible_duplicates'
             )
         }),
         ('Profile Data', {
@@ -142,4 +160,21 @@ class CategoryAdmin(admin.ModelAdmin):
 @admin.register(PlatformSetting)
 class PlatformSettingAdmin(admin.ModelAdmin):
     def has_add_permission(self, request):
-        return not PlatformSetting.objects.exists()
\ No newline at end of file
+        return not PlatformSetting.objects.exists()
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject',)
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+
+@admin.register(PlatformCounter)
+class PlatformCounterAdmin(admin.ModelAdmin):
+    # Maintained by users/counters.py; fix drift with `manage.py reconcile_counters`
+    # Each counter is spread over shards that add up to its value
+    list_display = ('name', 'shard', 'value')
+    readonly_fields = ('name', 'shard', 'value')
+
+    def has_add_permission(self, request):
+        return False
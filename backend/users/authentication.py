@@ -2,10 +2,15 @@ from rest_framework.authentication import TokenAuthentication
 from rest_framework import exceptions
 from django.utils import timezone
 from django.conf import settings
+from django.contrib.auth import get_user_model
 from datetime import timedelta
 
+from . import caching
+
 from rest_framework.authentication import SessionAuthentication
 
+User = get_user_model()
+
 class CsrfExemptSessionAuthentication(SessionAuthentication):
     def enforce_csrf(self, request):
         """
@@ -14,26 +19,54 @@ class CsrfExemptSessionAuthentication(SessionAuthentication):
         """
         return
     
+def token_expires_at(token):
+    # We pull the limit from settings. Defaulting to 3600 seconds (1 hour) if not found
+    # You set this in settings.py as TOKEN_EXPIRED_AFTER_SECONDS
+    expiry_limit = getattr(settings, 'TOKEN_EXPIRED_AFTER_SECONDS', 3600)
+    return token.created + timedelta(seconds=expiry_limit)
+
+
 class ExpiringTokenAuthentication(TokenAuthentication):
+    """
+    Token auth with expiry, served from users.caching so a warm token costs no
+    queries. The cache is cleared by signals whenever a token is deleted
+    (rotate_token, logout, password reset, soft delete, trash) or a user is saved.
+    """
     def authenticate_credentials(self, key):
         model = self.get_model()
-        try:
-            token = model.objects.select_related('user').get(key=key)
-        except model.DoesNotExist:
+        entry = caching.get_cached_token(key)
+
+        if entry == caching.INVALID_TOKEN:
             raise exceptions.AuthenticationFailed('Invalid token.')
 
-        if not token.user.is_active:
+        if entry is None:
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                caching.remember_invalid_token(key)
+                raise exceptions.AuthenticationFailed('Invalid token.')
+            caching.cache_token(token)
+            user = token.user
+        else:
+            user_id, created = entry
+            user = caching.get_cached_user(user_id)
+            if user is None:
+                user = User.objects.filter(pk=user_id).first()
+                if user is None:
+                    caching.invalidate_token(key)
+                    raise exceptions.AuthenticationFailed('Invalid token.')
+                caching.cache_user(user)
+            # Unsaved stand-in with the real primary key, so request.auth.delete() still works
+            token = model(key=key, user=user, created=created)
+
+        if not user.is_active:
             raise exceptions.AuthenticationFailed('User inactive or deleted.')
 
-        # We pull the limit from settings. Defaulting to 600 seconds (10 mins) if not found
-        # You set this in settings.py as TOKEN_EXPIRED_AFTER_SECONDS
-        expiry_limit = getattr(settings, 'TOKEN_EXPIRED_AFTER_SECONDS', 3600)
-        
         # Check if the token is older than our limit
-        is_expired = token.created < timezone.now() - timedelta(seconds=expiry_limit)
+        is_expired = token_expires_at(token) < timezone.now()
         
         if is_expired:
-            token.delete()  # Remove from DB
+            token.delete()  # Remove from DB (the post_delete signal clears the cache)
             raise exceptions.AuthenticationFailed('Token has expired.')
 
-        return (token.user, token)
\ No newline at end of file
+        return (user, token)
\ No newline at end of file
@@ -0,0 +1,377 @@
+"""
+Helpers shared by the benchmark management commands: latency samplers, bulk
+seeders for synthetic workers, employers, bookings and verification logs, the
+hot-path queries whose plans the index benchmark checks and the API calls the
+endpoint benchmark drives. Nothing here is used by the request path.
+"""
+import random
+import re
+import time
+import uuid
+
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from . import counters
+from .caching import invalidate_category_worker_counts, invalidate_directory
+from .feeds import employer_history, invite_feed
+from .metrics import QueryRecorder
+from .models import Booking, User, VerificationLog
+from .pagination import UserKeysetPagination
+from .verification import pending_reviews
+
+LOCATIONS = [
+    'Nairobi', 'Westlands', 'Kilimani', 'Karen', 'Kasarani', 'Ruaka', 'Kitengela',
+    'Mombasa', 'Nyali', 'Kisumu', 'Nakuru', 'Eldoret', 'Thika', 'Machakos',
+]
+FIRST_NAMES = ['Achieng', 'Wanjiku', 'Njeri', 'Atieno', 'Mwende', 'Akinyi', 'Chebet', 'Wambui', 'Nafula', 'Kerubo']
+LAST_NAMES = ['Otieno', 'Kamau', 'Mwangi', 'Odhiambo', 'Wanjala', 'Kiprono', 'Mutua', 'Njoroge', 'Omondi', 'Chege']
+
+# Page size the list endpoints are benchmarked with, sent explicitly so results
+# don't shift with API_PAGE_SIZE (the hot path queries fetch the same 20 + 1 rows)
+PAGE_SIZE = 20
+
+
+def percentile(sorted_samples, pct):
+    index = min(len(sorted_samples) - 1, round(pct / 100 * (len(sorted_samples) - 1)))
+    return round(sorted_samples[index], 3)
+
+
+def measure(fn, repeat=30, warmup=3):
+    """Calls fn `repeat` times and returns latency percentiles in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'runs': repeat,
+        'p50_ms': percentile(samples, 50),
+        'p95_ms': percentile(samples, 95),
+        'p99_ms': percentile(samples, 99),
+        'max_ms': round(samples[-1], 3),
+    }
+
+
+def measure_requests(call, repeat=30, warmup=3):
+    """
+    measure() for a test-client call that also reports the SQL queries each
+    request issued and the status codes it got back.
+    """
+    queries = []
+    statuses = set()
+
+    def run():
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = call()
+        queries.append(recorder.queries)
+        statuses.add(response.status_code)
+
+    result = measure(run, repeat, warmup)
+    timed = queries[warmup:]
+    result.update(
+        queries_min=min(timed),
+        queries_max=max(timed),
+        queries_mean=round(sum(timed) / len(timed), 2),
+        statuses=sorted(statuses),
+    )
+    return result
+
+
+# Index names in PostgreSQL ("Index Scan using x", "Bitmap Index Scan on x") and SQLite ("USING INDEX x") plans
+INDEX_IN_PLAN = re.compile(r'(?:Index (?:Only )?Scan(?: Backward)? using|Bitmap Index Scan on|USING (?:COVERING )?INDEX) (\w+)')
+FULL_SCAN_IN_PLAN = re.compile(r'Seq Scan on users_|SCAN users_\w+\b(?! USING)')
+
+
+def plan_indexes(plan):
+    """Names of the indexes an EXPLAIN output uses."""
+    return sorted(set(INDEX_IN_PLAN.findall(plan)))
+
+
+def has_full_scan(plan):
+    return bool(FULL_SCAN_IN_PLAN.search(plan))
+
+
+def analyze_tables():
+    """Refreshes planner statistics after a bulk load so EXPLAIN/timings reflect the new data."""
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def seed_workers(count, batch_size=2000, seed=None, available_share=0.8):
+    """
+    Bulk-inserts `count` synthetic workers and returns the tag used in their
+    usernames. About `available_share` of them are open to hire.
+    """
+    rng = random.Random(seed)
+    tag = uuid.uuid4().hex[:6]
+    worker_types = [value for value, _ in User.WORKER_TYPE]
+    experiences = [value for value, _ in User.EXPERIENCE_CHOICES]
+
+    batch = []
+    for n in range(count):
+        batch.append(User(
+            username=f"bench-{tag}-{n}@example.com",
+            email=f"bench-{tag}-{n}@example.com",
+            phone=f"b{tag}{n:07d}",
+            password='!',
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            role='worker',
+            status=rng.choice(['pending', 'approved', 'approved', 'approved']),
+            is_available=rng.random() < available_share,
+            worker_type=rng.choice(worker_types),
+            experience=rng.choice(experiences),
+            location=rng.choice(LOCATIONS),
+            expected_salary=rng.randrange(5000, 60000, 500),
+        ))
+        if len(batch) >= batch_size:
+            User.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        User.objects.bulk_create(batch)
+    return tag
+
+
+def seed_employers(count, batch_size=2000, seed=None):
+    """Bulk-inserts `count` synthetic, verified employers and returns the tag used in their usernames."""
+    rng = random.Random(seed)
+    tag = uuid.uuid4().hex[:6]
+    batch = []
+    for n in range(count):
+        batch.append(User(
+            username=f"bench-{tag}-{n}@example.com",
+            email=f"bench-{tag}-{n}@example.com",
+            phone=f"e{tag}{n:07d}",
+            password='!',
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            role='employer',
+            status='approved',
+            is_verified=True,
+            location=rng.choice(LOCATIONS),
+            salary=rng.randrange(5000, 60000, 500),
+        ))
+        if len(batch) >= batch_size:
+            User.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        User.objects.bulk_create(batch)
+    return tag
+
+
+def seed_bookings(employer_ids, worker_ids, per_employer, batch_size=5000, seed=None, statuses=None):
+    """
+    Bulk-inserts `per_employer` bookings for every employer, to distinct random
+    workers, in a state bookings.accept could have left behind: a worker holds at
+    most one accepted booking, only if they were free to hire, and is then marked
+    unavailable with that employer as current_employer; their other pending
+    requests are declined. Returns the number of bookings created.
+    """
+    rng = random.Random(seed)
+    statuses = statuses or ['pending', 'accepted', 'declined', 'declined', 'completed']
+    hireable = set(
+        User.objects.filter(pk__in=worker_ids, is_available=True, current_employer__isnull=True)
+        .values_list('id', flat=True)
+    )
+    hired_by = {}
+    rows = []
+    for employer_id in employer_ids:
+        for worker_id in rng.sample(worker_ids, min(per_employer, len(worker_ids))):
+            status = rng.choice(statuses)
+            if status == 'accepted':
+                if worker_id in hireable and worker_id not in hired_by:
+                    hired_by[worker_id] = employer_id
+                else:
+                    status = 'declined'
+            rows.append((employer_id, worker_id, status))
+
+    created = 0
+    for start in range(0, len(rows), batch_size):
+        created += len(Booking.objects.bulk_create([
+            Booking(
+                employer_id=employer_id, worker_id=worker_id,
+                status='declined' if status == 'pending' and worker_id in hired_by else status,
+            )
+            for employer_id, worker_id, status in rows[start:start + batch_size]
+        ]))
+    User.objects.bulk_update(
+        [User(pk=worker_id, is_available=False, current_employer_id=employer_id) for worker_id, employer_id in hired_by.items()],
+        ['is_available', 'current_employer'], batch_size=batch_size,
+    )
+    return created
+
+
+def seed_verification_logs(worker_ids, admin_id, per_worker, batch_size=5000, seed=None):
+    """Bulk-inserts `per_worker` approve/reject log entries for every worker."""
+    rng = random.Random(seed)
+    batch = []
+    created = 0
+    for worker_id in worker_ids:
+        for _ in range(per_worker):
+            action = rng.choice(['approved', 'approved', 'rejected'])
+            batch.append(VerificationLog(
+                worker_id=worker_id,
+                admin_id=admin_id,
+                action=action,
+                rejection_reasons=['Blurry ID photo'] if action == 'rejected' else None,
+            ))
+            if len(batch) >= batch_size:
+                created += len(VerificationLog.objects.bulk_create(batch))
+                batch = []
+    if batch:
+        created += len(VerificationLog.objects.bulk_create(batch))
+    return created
+
+
+def seed_dataset(workers, employers, bookings_per_employer, logs_per_worker=0, admin=None, seed=None):
+    """
+    Seeds a whole synthetic dataset and returns {'workers': [ids], 'employers': [ids], 'bookings': n,
+    'verification_logs': n}. bulk_create skips the signals, so the platform counters are
+    recounted and the cached category counts and directory pages dropped at the end.
+    """
+    seed = 0 if seed is None else seed
+    worker_tag = seed_workers(workers, seed=seed + 1)
+    employer_tag = seed_employers(employers, seed=seed + 2)
+    worker_ids = list(User.objects.filter(username__startswith=f'bench-{worker_tag}-').values_list('id', flat=True))
+    employer_ids = list(User.objects.filter(username__startswith=f'bench-{employer_tag}-').values_list('id', flat=True))
+    dataset = {
+        'workers': worker_ids,
+        'employers': employer_ids,
+        'bookings': seed_bookings(employer_ids, worker_ids, bookings_per_employer, seed=seed + 3),
+        'verification_logs': 0,
+    }
+    if logs_per_worker:
+        dataset['verification_logs'] = seed_verification_logs(
+            worker_ids, admin.pk if admin else None, logs_per_worker, seed=seed + 4,
+        )
+    counters.reconcile()
+    invalidate_category_worker_counts()
+    invalidate_directory()
+    return dataset
+
+
+def hot_path_queries(employer, worker):
+    """
+    The hot dashboard and directory queries, as issued by the views, each paired
+    with the index built for it (see User.Meta, Booking.Meta and VerificationLog.Meta). For a common
+    worker_type the planner may rather walk worker_directory_idx and filter,
+    which is just as cheap; the type index pays off for the rarer categories.
+    """
+    directory = User.objects.filter(role='worker', is_deleted=False, is_available=True)
+    return {
+        'directory': (
+            directory.order_by('-date_joined', '-id')[:21],
+            'worker_directory_idx',
+        ),
+        'directory_by_type': (
+            directory.filter(worker_type='nanny').order_by('-date_joined', '-id')[:21],
+            'worker_directory_type_idx',
+        ),
+        'directory_request_status': (
+            # What the viewer_request_status subquery runs for each worker on the page
+            Booking.objects.filter(employer=employer, worker=worker).order_by('-created_at', '-id').values('status')[:1],
+            'booking_pair_latest_idx',
+        ),
+        'employer_history': (
+            employer_history(employer).order_by('-created_at', '-id')[:21],
+            'booking_employer_feed_idx',
+        ),
+        'employer_accepted_count': (
+            Booking.objects.filter(employer=employer, status='accepted').order_by(),
+            'booking_employer_status_idx',
+        ),
+        'job_invites': (
+            invite_feed(worker).order_by('-created_at', '-id')[:21],
+            'booking_worker_feed_idx',
+        ),
+        'pending_invites': (
+            Booking.objects.filter(worker=worker, status='pending').order_by(),
+            'booking_worker_pending_idx',
+        ),
+        'invite_sync': (
+            # ?since= on the invite feed (users/sync.py)
+            invite_feed(worker).filter(updated_at__gt=worker.date_joined).order_by('updated_at', 'id')[:21],
+            'booking_worker_sync_idx',
+        ),
+        'history_sync': (
+            employer_history(employer).filter(updated_at__gt=employer.date_joined).order_by('updated_at', 'id')[:21],
+            'booking_employer_sync_idx',
+        ),
+        'review_queue': (
+            pending_reviews().order_by('date_joined', 'id')[:21],
+            'worker_review_queue_idx',
+        ),
+        'latest_review': (
+            # profile_status, and the review queue's latest_review subquery for each worker
+            VerificationLog.objects.filter(worker=worker).order_by('-created_at', '-id')[:1],
+            'verification_worker_latest_idx',
+        ),
+    }
+
+
+def deep_directory_cursor(depth=0.9):
+    """
+    Cursor of the default directory page `depth` of the way down the list, so
+    the benchmark shows whether a late page costs the same as the first.
+    """
+    directory = User.objects.filter(role='worker', is_deleted=False, is_available=True)
+    paginator = UserKeysetPagination()
+    offset = int(max(directory.count() - PAGE_SIZE, 0) * depth)
+    row = directory.order_by(*paginator.ordering).values('date_joined', 'id')[offset:offset + 1].first()
+    return paginator.encode_cursor(paginator.get_position(row)) if row else None
+
+
+def api_calls(admin, employer, worker, spare_workers, pending_bookings):
+    """
+    The main API endpoints as {name: zero-argument test-client call}. List
+    endpoints are asked for PAGE_SIZE rows.
+
+    `hire` needs one available worker `employer` has no booking with per call
+    (spare_workers), and `respond_to_request` one pending booking per call whose
+    worker is still available (pending_bookings); each call consumes one.
+    """
+    spare_workers = iter(spare_workers)
+    pending_bookings = iter(pending_bookings)
+    client = APIClient()
+    # Its own client: force_authenticate(None) would log out, and the session flush is SQL we'd count
+    anonymous = APIClient()
+
+    def as_user(user, method, url, data=None):
+        client.force_authenticate(user)
+        if method == 'post':
+            return client.post(url, data, format='json')
+        return client.get(url, data)
+
+    def hire():
+        return as_user(employer, 'post', reverse('workers-directory-hire', args=[next(spare_workers).pk]))
+
+    def respond():
+        booking = next(pending_bookings)
+        return as_user(
+            booking.worker, 'post', reverse('worker-requests-respond-to-request', args=[booking.pk]),
+            {'status': 'accepted'},
+        )
+
+    directory = reverse('workers-directory-list')
+    page = {'page_size': PAGE_SIZE}
+    deep_page = {**page, 'cursor': deep_directory_cursor()}
+    return {
+        'directory_list': lambda: as_user(employer, 'get', directory, page),
+        'directory_deep_page': lambda: as_user(employer, 'get', directory, deep_page),
+        'directory_search': lambda: as_user(
+            employer, 'get', directory, {**page, 'search': 'Wanjiku', 'location': 'Nairobi'},
+        ),
+        'hire': hire,
+        'respond_to_request': respond,
+        'job_invites': lambda: as_user(worker, 'get', reverse('worker-requests-job-invites'), page),
+        'employer_history': lambda: as_user(employer, 'get', reverse('employer-dash-history'), page),
+        'admin_stats': lambda: as_user(admin, 'get', reverse('admin-users-stats')),
+        'review_queue': lambda: as_user(admin, 'get', reverse('admin-users-review-queue')),
+        'categories': lambda: anonymous.get(reverse('admin-categories-public-list')),
+    }
@@ -0,0 +1,95 @@
+"""
+Booking state machine.
+
+    pending --accept--> accepted --complete--> completed
+    pending --decline-> declined
+
+Every transition is a guarded write: the UPDATE only matches rows still in the
+expected state (and, for accept, a worker who is still available), and the
+row count says whether we won. Two simultaneous accepts can therefore never
+both succeed, without holding locks across the request.
+
+Within one transaction rows are always taken worker first, then bookings, so
+concurrent transitions for the same worker queue up instead of deadlocking.
+"""
+from django.db import transaction
+
+from .caching import bump_versions, invalidate_cached_users, invalidate_directory
+from .counters import bulk_transition
+from .events import UPDATED, publish_booking_events
+from .models import Booking, User
+from .signals import run_now_and_on_commit
+
+
+class BookingNotFound(Exception):
+    pass
+
+
+class BookingConflict(Exception):
+    """The booking or worker changed state before this transition could apply."""
+
+
+def bump_employer_versions(employer_ids):
+    # Version stamps of the employers' dashboards (users/conditional.py); post_save covers single saves
+    bump_versions([f'employer-bookings:{employer_id}' for employer_id in set(employer_ids)])
+
+
+def _get(booking_id, **ownership):
+    booking = Booking.objects.filter(pk=booking_id, **ownership).values('id', 'employer_id', 'worker_id', 'status').first()
+    if booking is None:
+        raise BookingNotFound("Booking not found.")
+    return booking
+
+
+def accept(booking_id, worker):
+    """Worker accepts a pending request: hires the worker and declines their other pending requests."""
+    booking = _get(booking_id, worker=worker)
+    with transaction.atomic():
+        hired = User.objects.filter(pk=worker.pk, is_available=True).update(
+            is_available=False, current_employer_id=booking['employer_id'],
+        )
+        if not hired:
+            raise BookingConflict("You have already accepted another job.")
+        if not bulk_transition(Booking.objects.filter(pk=booking_id, status='pending'), status='accepted'):
+            raise BookingConflict("This request is no longer pending.")
+        # Locked as they are read: a sibling withdrawn or declined meanwhile is
+        # either left out here or waited for, so the events below name exactly
+        # the rows the UPDATE changes
+        others = list(
+            Booking.objects.filter(worker=worker, status='pending').exclude(pk=booking_id)
+            .select_for_update().values('id', 'employer_id', 'worker_id')
+        )
+        declined = bulk_transition(
+            Booking.objects.filter(pk__in=[other['id'] for other in others], status='pending'), status='declined',
+        )
+        run_now_and_on_commit(invalidate_cached_users, [worker.pk])
+        run_now_and_on_commit(invalidate_directory)
+        run_now_and_on_commit(bump_employer_versions, [booking['employer_id'], *(o['employer_id'] for o in others)])
+        publish_booking_events(UPDATED, [
+            {**booking, 'status': 'accepted'}, *({**other, 'status': 'declined'} for other in others),
+        ])
+    return declined
+
+
+def decline(booking_id, worker):
+    booking = _get(booking_id, worker=worker)
+    if not bulk_transition(Booking.objects.filter(pk=booking_id, status='pending'), status='declined'):
+        raise BookingConflict("This request is no longer pending.")
+    run_now_and_on_commit(bump_employer_versions, [booking['employer_id']])
+    publish_booking_events(UPDATED, [{**booking, 'status': 'declined'}])
+
+
+def complete(booking_id, employer):
+    """Employer releases an accepted worker: the booking is completed and the worker is available again."""
+    booking = _get(booking_id, employer=employer)
+    with transaction.atomic():
+        if not bulk_transition(Booking.objects.filter(pk=booking_id, status='accepted'), status='completed'):
+            raise BookingConflict("This worker is not currently hired through this booking.")
+        User.objects.filter(pk=booking['worker_id'], current_employer=employer).update(
+            is_available=True, current_employer=None,
+        )
+        run_now_and_on_commit(invalidate_cached_users, [booking['worker_id']])
+        run_now_and_on_commit(invalidate_directory)
+        run_now_and_on_commit(bump_employer_versions, [booking['employer_id']])
+        publish_booking_events(UPDATED, [{**booking, 'status': 'completed'}])
+    return User.objects.get(pk=booking['worker_id'])
@@ -0,0 +1,327 @@
+"""
+Caches in front of rows that are read on (almost) every request.
+
+Each process keeps its own copy in memory; cross-process invalidation goes
+through the shared Django cache (Redis in docker-compose, locmem in tests).
+"""
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count
+
+from .models import PlatformSetting, User
+
+
+class LocalTTLCache:
+    """Thread-safe LRU holding at most `maxsize` entries, each for at most `ttl` seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# -----------------------------------------------------------
+# VERSION STAMPS
+# -----------------------------------------------------------
+# A stamp is (random token, unix time it was minted) for a named scope such as
+# 'categories' or 'user:42'. Writers bump a scope by deleting its stamp; the
+# next reader mints a fresh one, so readers can tell "unchanged" from one
+# shared-cache read instead of looking at the data. users/conditional.py turns
+# stamps into ETags.
+
+def _version_key(scope):
+    return f'version:{scope}'
+
+
+def get_version_stamps(scopes):
+    """Returns the stamp of every scope in `scopes`, minting missing ones."""
+    keys = [_version_key(scope) for scope in scopes]
+    stamps = cache.get_many(keys)
+    for key in keys:
+        if key not in stamps:
+            # add() so concurrent readers agree on one stamp
+            cache.add(key, (uuid.uuid4().hex, time.time()), settings.VERSION_STAMP_TTL)
+            stamps[key] = cache.get(key) or (uuid.uuid4().hex, time.time())
+    return [stamps[key] for key in keys]
+
+
+def bump_versions(scopes):
+    cache.delete_many([_version_key(scope) for scope in scopes])
+
+
+# -----------------------------------------------------------
+# PLATFORM SETTINGS (singleton row)
+# -----------------------------------------------------------
+
+PLATFORM_SETTINGS_VERSION_KEY = 'platform-settings:version'
+
+_platform_settings_lock = threading.Lock()
+_platform_settings_state = {'version': None, 'row': None, 'checked_at': None}
+
+
+def _shared_platform_settings_version():
+    version = cache.get(PLATFORM_SETTINGS_VERSION_KEY)
+    if version is None:
+        # Shared cache was flushed or never populated: start a new version so everyone reloads once
+        cache.add(PLATFORM_SETTINGS_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(PLATFORM_SETTINGS_VERSION_KEY)
+    return version
+
+
+def get_platform_settings():
+    """
+    Returns the PlatformSetting row (or None) without a DB query on the hot path.
+
+    The local copy is trusted for PLATFORM_SETTINGS_CACHE_TTL seconds. After
+    that a single shared-cache read tells us whether any process saved the row
+    in the meantime; only then is it reloaded from the database.
+    The returned instance is shared between requests, so treat it as read-only.
+    """
+    state = _platform_settings_state
+    now = time.monotonic()
+    checked_at = state['checked_at']
+    if checked_at is not None and now - checked_at < settings.PLATFORM_SETTINGS_CACHE_TTL:
+        return state['row']
+
+    version = _shared_platform_settings_version()
+    with _platform_settings_lock:
+        if state['checked_at'] is None or state['version'] != version:
+            state['row'] = PlatformSetting.objects.first()
+            state['version'] = version
+        state['checked_at'] = now
+        return state['row']
+
+
+def invalidate_platform_settings():
+    """Drops this process's copy and tells every other process to reload on its next check."""
+    with _platform_settings_lock:
+        _platform_settings_state.update(version=None, row=None, checked_at=None)
+    cache.set(PLATFORM_SETTINGS_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+# -----------------------------------------------------------
+# TOKEN AUTHENTICATION
+# -----------------------------------------------------------
+# token key -> (user id, created) and user id -> the few fields auth and the
+# permission checks read, in a small per-process LRU in front of the shared
+# cache. Nothing else of the user row (the password hash in particular) is
+# cached. Revocations (token deleted, user saved) clear both tiers here and the
+# shared tier for everyone; other processes' local copies expire within
+# AUTH_CACHE_LOCAL_TTL seconds.
+
+INVALID_TOKEN = 'invalid'
+
+AUTH_USER_FIELDS = ('id', 'is_active', 'is_staff', 'is_superuser', 'role')
+
+_local_auth = LocalTTLCache(maxsize=settings.AUTH_CACHE_MAX_ENTRIES, ttl=settings.AUTH_CACHE_LOCAL_TTL)
+
+
+def _token_cache_key(key):
+    # Hash the key so the shared cache never holds usable credentials
+    return 'auth:token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def _user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def get_cached_token(key):
+    """Returns (user_id, created), INVALID_TOKEN for a known-bad key, or None on a miss."""
+    cache_key = _token_cache_key(key)
+    entry = _local_auth.get(cache_key)
+    if entry is None:
+        entry = cache.get(cache_key)
+        if entry is not None:
+            _local_auth.set(cache_key, entry)
+    return entry
+
+
+def get_cached_user(user_id):
+    """
+    Returns a user built from the cached AUTH_USER_FIELDS, or None on a miss.
+    Its other fields are deferred: the first one read loads the rest of the row
+    in one query (User.refresh_from_db), and save() only writes loaded fields.
+    """
+    cache_key = _user_cache_key(user_id)
+    data = _local_auth.get(cache_key)
+    if data is None:
+        data = cache.get(cache_key)
+        if data is None:
+            return None
+        _local_auth.set(cache_key, data)
+    # Every request gets its own instance, so views can modify and save request.user safely
+    fields = [f for f in User._meta.concrete_fields if f.attname in data]
+    return User.from_db(DEFAULT_DB_ALIAS, [f.attname for f in fields], [data[f.attname] for f in fields])
+
+
+def cache_token(token):
+    entry = (token.user_id, token.created)
+    cache_key = _token_cache_key(token.key)
+    cache.set(cache_key, entry, settings.AUTH_CACHE_TTL)
+    _local_auth.set(cache_key, entry)
+    cache_user(token.user)
+
+
+def cache_user(user):
+    data = {name: getattr(user, name) for name in AUTH_USER_FIELDS}
+    cache_key = _user_cache_key(user.pk)
+    cache.set(cache_key, data, settings.AUTH_CACHE_TTL)
+    _local_auth.set(cache_key, data)
+
+
+def remember_invalid_token(key):
+    """Short negative entry so repeated bad keys don't each cost a query."""
+    cache_key = _token_cache_key(key)
+    cache.set(cache_key, INVALID_TOKEN, settings.AUTH_CACHE_INVALID_TTL)
+    _local_auth.set(cache_key, INVALID_TOKEN, min(settings.AUTH_CACHE_INVALID_TTL, _local_auth.ttl))
+
+
+def invalidate_token(key):
+    cache_key = _token_cache_key(key)
+    _local_auth.delete(cache_key)
+    cache.delete(cache_key)
+
+
+def invalidate_cached_users(user_ids):
+    """
+    Call after writes that bypass User.save() (queryset.update) so auth doesn't
+    serve stale rows. Also moves the users' version stamps (ETags of their dashboards).
+    """
+    cache_keys = [_user_cache_key(user_id) for user_id in user_ids]
+    for cache_key in cache_keys:
+        _local_auth.delete(cache_key)
+    cache.delete_many(cache_keys + [_version_key(f'user:{user_id}') for user_id in user_ids])
+
+
+# -----------------------------------------------------------
+# WORKER COUNTS PER CATEGORY
+# -----------------------------------------------------------
+
+CATEGORY_COUNTS_KEY = 'category:worker-counts'
+
+_local_counts = LocalTTLCache(maxsize=1, ttl=settings.CATEGORY_COUNTS_LOCAL_TTL)
+
+
+def get_category_worker_counts():
+    """
+    Returns {worker_type slug: number of active workers}, computed with one
+    grouped COUNT and then served from cache until a worker's role,
+    worker_type or is_deleted changes.
+    """
+    counts = _local_counts.get(CATEGORY_COUNTS_KEY)
+    if counts is None:
+        counts = cache.get(CATEGORY_COUNTS_KEY)
+        if counts is None:
+            counts = dict(
+                User.objects.filter(role='worker', is_deleted=False)
+                .exclude(worker_type=None)
+                .values_list('worker_type')
+                .annotate(Count('id'))
+                .order_by()
+            )
+            cache.set(CATEGORY_COUNTS_KEY, counts, settings.CATEGORY_COUNTS_CACHE_TTL)
+        _local_counts.set(CATEGORY_COUNTS_KEY, counts)
+    return counts
+
+
+def invalidate_category_worker_counts():
+    _local_counts.clear()
+    # The public category list shows the counts, so its version stamp moves with them
+    cache.delete_many([CATEGORY_COUNTS_KEY, _version_key('categories')])
+
+
+# -----------------------------------------------------------
+# WORKER DIRECTORY PAGES
+# -----------------------------------------------------------
+# A page of the directory is cached as the worker ids on it (plus the next
+# cursor) under its normalized filters and the current directory generation.
+# Any change to a field the directory filters or orders on moves the
+# generation to a fresh random value, which orphans every cached page at
+# once; orphans simply expire. Ids only, so the rows themselves (and each
+# viewer's request status) are always read fresh. Only bounded pages (at most
+# API_MAX_PAGE_SIZE ids) are cached, so a hit is always one small pk__in lookup.
+
+DIRECTORY_GENERATION_KEY = 'directory:generation'
+
+# Worker fields that decide whether and where a worker appears in the directory
+DIRECTORY_FIELDS = frozenset({
+    'role', 'is_deleted', 'is_available', 'worker_type', 'expected_salary', 'experience', 'location',
+    'first_name', 'last_name',
+})
+
+
+def _directory_generation():
+    generation = cache.get(DIRECTORY_GENERATION_KEY)
+    if generation is None:
+        # Never restart from a fixed value, or pages cached before a flush could come back
+        cache.add(DIRECTORY_GENERATION_KEY, uuid.uuid4().hex, None)
+        generation = cache.get(DIRECTORY_GENERATION_KEY)
+    return generation
+
+
+def directory_page_key(params):
+    """
+    Cache key for the page described by `params` (normalized filters, cursor and
+    page size). Take the key before running the query: a page computed while the
+    generation moves is then stored where nobody will look for it.
+    """
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    return f'directory:{_directory_generation()}:{digest}'
+
+
+def _is_bounded(ids, page_size):
+    return len(ids) <= min(page_size, settings.API_MAX_PAGE_SIZE)
+
+
+def get_directory_page(key, page_size):
+    """Returns (worker ids, next keyset position or None), or None on a miss."""
+    cached = cache.get(key)
+    if cached is None or not _is_bounded(cached[0], page_size):
+        return None
+    return cached
+
+
+def cache_directory_page(key, ids, next_position, page_size):
+    """Stores one page of `page_size` rows; anything larger is not a page and is never cached."""
+    if _is_bounded(ids, page_size):
+        cache.set(key, (ids, next_position), settings.DIRECTORY_CACHE_TTL)
+
+
+def invalidate_directory():
+    cache.set(DIRECTORY_GENERATION_KEY, uuid.uuid4().hex, None)
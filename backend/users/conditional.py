@@ -0,0 +1,55 @@
+"""
+Conditional GET for polled read endpoints.
+
+`@conditional(...)` gives a view method an ETag derived from version stamps
+(users/caching.py) instead of from the response body. A request whose
+If-None-Match still matches is answered 304 before the view runs, so an
+unchanged dashboard costs one shared-cache read and no SQL. Writers keep the
+stamps honest by bumping them (users/signals.py and the set-based services).
+"""
+import functools
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .caching import get_version_stamps
+
+
+def conditional(*scopes, vary=None):
+    """
+    `scopes` are scope names or callables taking the request and returning one,
+    e.g. `conditional(lambda request: f'user:{request.user.pk}')`.
+
+    `vary` is an optional callable taking the request, whose result is folded
+    into the tag. It is for bodies that change without any write, e.g. signed
+    URLs that roll over with time (users/media.py).
+
+    Only If-None-Match is honoured. Last-Modified is sent for information, but
+    stamps are minted lazily, so second-granularity If-Modified-Since checks
+    could miss a change made within the same second.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            names = [scope(request) if callable(scope) else scope for scope in scopes]
+            stamps = get_version_stamps(names)
+            # The path (with query string) and the viewer are part of the tag, as they shape the body
+            identity = repr((
+                request.get_full_path(), request.user.pk, [token for token, _ in stamps],
+                vary(request) if vary else None,
+            ))
+            etag = '"%s"' % hashlib.md5(identity.encode()).hexdigest()
+
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = method(view, request, *args, **kwargs)
+                if not 200 <= response.status_code < 300:
+                    return response
+                response['Last-Modified'] = http_date(max(minted for _, minted in stamps))
+            response['ETag'] = etag
+            # Let the browser keep the body but ask again every time
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
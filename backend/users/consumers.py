@@ -0,0 +1,82 @@
+import asyncio
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import ExpiringTokenAuthentication, token_expires_at
+from .events import session_id, user_group
+
+# Close code sent when the token is missing, invalid, expired or revoked
+UNAUTHORIZED = 4401
+
+
+@database_sync_to_async
+def authenticate(key):
+    try:
+        return ExpiringTokenAuthentication().authenticate_credentials(key)
+    except AuthenticationFailed:
+        return None
+
+
+class NotificationConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Pushes the connected user's booking events (users/events.py).
+
+    Browsers can't set headers on a WebSocket, and a token in the URL would end
+    up in access logs, so the client authenticates with its first message:
+    {"type": "auth", "token": "<key>"}, answered with {"type": "auth", "ok": true}.
+    A socket that doesn't within WEBSOCKET_AUTH_TIMEOUT seconds, or sends a bad
+    token, is closed with 4401. So is one whose token expires or is deleted
+    (logout, rotation, password reset, trash) while it is open.
+    """
+
+    group = None
+    session = None
+    timer = None
+
+    async def connect(self):
+        await self.accept()
+        self.close_after(settings.WEBSOCKET_AUTH_TIMEOUT)
+
+    async def disconnect(self, code):
+        if self.timer:
+            self.timer.cancel()
+        if self.group:
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        # Only the auth message is read; anything else the client sends is ignored
+        if self.group or not isinstance(content, dict) or content.get('type') != 'auth':
+            return
+        key = content.get('token')
+        credentials = await authenticate(key) if isinstance(key, str) and key else None
+        if credentials is None:
+            await self.close(code=UNAUTHORIZED)
+            return
+        user, token = credentials
+        self.session = session_id(key)
+        self.group = user_group(user.pk)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        self.close_after((token_expires_at(token) - timezone.now()).total_seconds())
+        await self.send_json({'type': 'auth', 'ok': True})
+
+    def close_after(self, seconds):
+        """(Re)schedules closing the socket as unauthorized `seconds` from now."""
+        async def close_later():
+            await asyncio.sleep(max(seconds, 0))
+            await self.close(code=UNAUTHORIZED)
+
+        if self.timer:
+            self.timer.cancel()
+        self.timer = asyncio.ensure_future(close_later())
+
+    async def booking_event(self, message):
+        await self.send_json({'type': 'booking', 'event': message['event'], 'booking': message['booking']})
+
+    async def session_revoked(self, message):
+        # Sent to all of the user's sockets; only those opened with the deleted token close
+        if message['session'] == self.session:
+            await self.close(code=UNAUTHORIZED)
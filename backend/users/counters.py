@@ -0,0 +1,163 @@
+"""
+Running totals behind the admin dashboard.
+
+Each counter is PLATFORM_COUNTER_SHARDS rows in PlatformCounter, and its
+value is their sum. Saves and deletes adjust the affected counters by +/-1
+from post_save/post_delete (users/signals.py), and set-based writes go
+through `bulk_transition()`, so reading the dashboard is one small SELECT
+however large the tables get. `manage.py reconcile_counters` recomputes
+everything from scratch and reports any drift.
+
+A write only locks one randomly picked shard per counter until it commits,
+so concurrent signups and bookings rarely wait on each other, where a single
+row per counter would make every writer queue behind the last one.
+"""
+import random
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import Booking, PlatformCounter, User
+
+# counter name -> field values a row must have to be counted
+USER_COUNTERS = {
+    'total_users': {},
+    'active_users': {'is_deleted': False},
+    'trashed_users': {'is_deleted': True},
+    'pending': {'status': 'pending'},
+    'approved': {'status': 'approved'},
+    'rejected': {'status': 'rejected'},
+    'banned': {'status': 'banned'},
+    'workers': {'role': 'worker'},
+    'employers': {'role': 'employer'},
+    'pending_workers': {'role': 'worker', 'status': 'pending'},
+    'verified_employers': {'role': 'employer', 'is_verified': True},
+}
+
+BOOKING_COUNTERS = {
+    'active_hires': {'status': 'accepted'},
+    'pending_bookings': {'status': 'pending'},
+}
+
+MODEL_COUNTERS = {User: USER_COUNTERS, Booking: BOOKING_COUNTERS}
+
+COUNTER_NAMES = [*USER_COUNTERS, *BOOKING_COUNTERS]
+
+
+def _counted_fields(model):
+    return sorted({field for condition in MODEL_COUNTERS[model].values() for field in condition})
+
+
+def _matches(values, condition):
+    return values is not None and all(values.get(field) == wanted for field, wanted in condition.items())
+
+
+def transition_deltas(model, old, new, count=1):
+    """Counter deltas for `count` rows moving from the `old` to the `new` field values (None = absent)."""
+    deltas = Counter()
+    for name, condition in MODEL_COUNTERS[model].items():
+        delta = _matches(new, condition) - _matches(old, condition)
+        if delta:
+            deltas[name] += delta * count
+    return deltas
+
+
+def apply_deltas(deltas):
+    """Adds `deltas` to the counters inside the current transaction, each on one random shard."""
+    shard = random.randrange(settings.PLATFORM_COUNTER_SHARDS)
+    # Fixed order so concurrent transactions lock the counter rows the same way round
+    for name, delta in sorted(deltas.items()):
+        if delta and not PlatformCounter.objects.filter(name=name, shard=shard).update(value=F('value') + delta):
+            # No shard row yet: counting now already includes the change being recorded
+            reconcile([name])
+
+
+def record_save(instance, created):
+    model = type(instance)
+    if model not in MODEL_COUNTERS:
+        return
+    fields = _counted_fields(model)
+    new = {field: getattr(instance, field) for field in fields}
+    old = None if created else instance.loaded_values
+    if old is not None and any(field not in old for field in fields):
+        return  # Partially loaded row: nothing reliable to diff against, reconcile_counters will catch it
+    apply_deltas(transition_deltas(model, old, new))
+
+
+def record_delete(instance):
+    model = type(instance)
+    if model not in MODEL_COUNTERS:
+        return
+    old = {field: getattr(instance, field) for field in _counted_fields(model)}
+    apply_deltas(transition_deltas(model, old, None))
+
+
+def bulk_transition(queryset, **changes):
+    """
+    queryset.update(**changes) that keeps the counters in step. The affected
+    rows are locked and their counted fields read first, so the deltas match
+    exactly what the UPDATE changed. auto_now fields are stamped as save()
+    would. Returns the number of rows updated.
+    """
+    model = queryset.model
+    now = timezone.now()
+    changes = {
+        **{field.name: now for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)},
+        **changes,
+    }
+    fields = _counted_fields(model)
+    with transaction.atomic():
+        rows = list(queryset.select_for_update().values_list('pk', *fields))
+        if not rows:
+            return 0
+        groups = Counter(tuple(row[1:]) for row in rows)
+        updated = model.objects.filter(pk__in=[row[0] for row in rows]).update(**changes)
+
+        deltas = Counter()
+        for values, count in groups.items():
+            old = dict(zip(fields, values))
+            deltas.update(transition_deltas(model, old, {**old, **changes}, count))
+        apply_deltas(deltas)
+    return updated
+
+
+def get_counters():
+    """Returns {name: value} for every counter, creating any that are missing."""
+    counters = dict(PlatformCounter.objects.values('name').annotate(total=Sum('value')).values_list('name', 'total'))
+    missing = [name for name in COUNTER_NAMES if name not in counters]
+    if missing:
+        counters.update(reconcile(missing))
+    return counters
+
+
+def _recount(names):
+    totals = {}
+    for model, definitions in MODEL_COUNTERS.items():
+        wanted = {name: Count('pk', filter=Q(**definitions[name])) for name in names if name in definitions}
+        if wanted:
+            totals.update(model.objects.aggregate(**wanted))
+    return totals
+
+
+def reconcile(names=None):
+    """
+    Recomputes counters from the tables and stores the results. Returns {name: value}.
+
+    All shard rows of the counters are locked before counting, so a concurrent
+    write either committed before (and is in the count) or waits to apply its
+    delta on top. The total goes on shard 0 and the other shards restart at 0.
+    """
+    names = list(names or COUNTER_NAMES)
+    with transaction.atomic():
+        for name in names:
+            for shard in range(settings.PLATFORM_COUNTER_SHARDS):
+                PlatformCounter.objects.get_or_create(name=name, shard=shard)
+        rows = list(PlatformCounter.objects.select_for_update().filter(name__in=names).order_by('name', 'shard'))
+        totals = _recount(names)
+        for row in rows:
+            row.value = totals[row.name] if row.shard == 0 else 0
+        PlatformCounter.objects.bulk_update(rows, ['value'])
+    return totals
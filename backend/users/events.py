@@ -0,0 +1,87 @@
+"""
+Real-time booking notifications.
+
+Whenever a booking is created, changes status or is deleted, its worker and
+employer each get a `booking` event over the channel layer (Redis in
+docker-compose, in memory otherwise). users/consumers.py relays the events to
+the users' open WebSockets, so dashboards refetch when something happened
+instead of polling.
+
+Events are sent after the transaction commits and delivery is best effort: a
+client that was offline reloads its lists when it reconnects.
+
+Deleting a token sends a `session.revoked` message to its user's group, which
+closes the sockets that were opened with it.
+"""
+import hashlib
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+CREATED, UPDATED, DELETED = 'created', 'updated', 'deleted'
+
+
+def user_group(user_id):
+    return f'user.{user_id}'
+
+
+def session_id(key):
+    """Stands in for a token key in channel messages, so keys never travel through the channel layer."""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def booking_message(event, booking):
+    """Channel layer message for one booking, given as a dict with id, employer_id, worker_id and status."""
+    return {
+        'type': 'booking.event',
+        'event': event,
+        'booking': {key: booking[key] for key in ('id', 'employer_id', 'worker_id', 'status')},
+    }
+
+
+def send_session_revoked(user_id, key):
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    try:
+        async_to_sync(layer.group_send)(user_group(user_id), {'type': 'session.revoked', 'session': session_id(key)})
+    except Exception:
+        logger.exception("Could not close the sockets of user %s", user_id)
+
+
+def publish_session_revoked(user_id, key):
+    """Closes the user's sockets that authenticated with token `key` once the current transaction commits."""
+    transaction.on_commit(lambda: send_session_revoked(user_id, key))
+
+
+def send_booking_events(event, bookings):
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    group_send = async_to_sync(layer.group_send)
+    for booking in bookings:
+        message = booking_message(event, booking)
+        for user_id in {booking['employer_id'], booking['worker_id']} - {None}:
+            try:
+                group_send(user_group(user_id), message)
+            except Exception:
+                # A broken channel layer must never fail the write that triggered the event
+                logger.exception("Could not push booking %s to user %s", booking['id'], user_id)
+
+
+def publish_booking_events(event, bookings):
+    """Sends `event` for each booking dict to its worker and employer once the current transaction commits."""
+    bookings = list(bookings)
+    if bookings:
+        transaction.on_commit(lambda: send_booking_events(event, bookings))
+
+
+def booking_row(booking, **changes):
+    return {
+        'id': booking.pk, 'employer_id': booking.employer_id, 'worker_id': booking.worker_id,
+        'status': booking.status, **changes,
+    }
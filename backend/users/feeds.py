@@ -0,0 +1,56 @@
+"""
+Booking feeds for the worker and employer dashboards.
+
+Each feed is a single `.values()` query that joins in just the columns the
+dashboard shows, so a page costs one query however many rows it holds.
+Rows are dicts, which KeysetPagination pages through like model instances.
+`updated_at` is included for delta sync (users/sync.py).
+"""
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Concat
+
+from .models import Booking
+
+
+def _full_name(relation):
+    return Concat(f'{relation}__first_name', Value(' '), f'{relation}__last_name')
+
+
+def invite_feed(worker):
+    """Job invites received by `worker`, with the inviting employer's details."""
+    return Booking.objects.filter(worker=worker).values(
+        'id',
+        'status',
+        'created_at',
+        'updated_at',
+        employer_name=_full_name('employer'),
+        location=F('employer__location'),
+        salary=F('employer__salary'),
+        age=F('employer__age'),
+        family_size=F('employer__family_size'),
+        employer_phone=F('employer__phone'),
+        start_date=F('employer__start_date'),
+        requirements=F('employer__requirements'),
+    )
+
+
+def employer_history(employer, statuses=None):
+    """
+    Hiring requests sent by `employer`, newest first, with the worker's details.
+    Dates are returned as-is for the client to format; the worker's phone is
+    only revealed once the request was accepted.
+    """
+    bookings = Booking.objects.filter(employer=employer)
+    if statuses:
+        bookings = bookings.filter(status__in=statuses)
+    return bookings.values(
+        'id',
+        'status',
+        'created_at',
+        'updated_at',
+        'worker_id',
+        worker_name=_full_name('worker'),
+        worker_type=F('worker__worker_type'),
+        location=F('worker__location'),
+        worker_phone=Case(When(status='accepted', then=F('worker__phone')), default=None),
+    )
@@ -0,0 +1,161 @@
+"""
+Perceptual hashes of identity photos, for spotting the same ID card or
+passport page uploaded by more than one account.
+
+Each uploaded image gets a 64-bit difference hash (dHash): the photo is
+shrunk to 9x8 greys and every bit records whether a pixel is brighter than
+its right-hand neighbour. Re-encoding, resizing or small edits flip only a
+few bits, so near-duplicates are images whose hashes are a small Hamming
+distance apart.
+
+Lookups use multi-index hashing. The hash is stored as four indexed 16-bit
+bands; if two hashes differ in at most d bits, at least one band differs in
+at most d // 4 of them. A search probes every band for values within that
+radius (plain index lookups), then checks the full distance in Python.
+"""
+from itertools import combinations
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Q, Value, When
+from PIL import Image, ImageOps
+
+from .models import ImageFingerprint, User
+from .renditions import run_in_background
+
+HASHED_FIELDS = ('id_photo_front', 'id_photo_back', 'passport_img')
+
+HASH_SIZE = 8
+BANDS = 4
+BAND_BITS = 64 // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+HASH_MASK = (1 << 64) - 1
+
+
+def dhash(source):
+    """Returns the 64-bit difference hash of an image file or file-like object."""
+    with Image.open(source) as image:
+        # Lets JPEG decode at a fraction of full size; the hash only needs 9x8 pixels
+        image.draft('L', ((HASH_SIZE + 1) * 8, HASH_SIZE * 8))
+        image = ImageOps.exif_transpose(image).convert('L')
+        image = image.resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.LANCZOS)
+        pixels = list(image.getdata())
+    value = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            offset = row * (HASH_SIZE + 1) + col
+            value = (value << 1) | (pixels[offset] > pixels[offset + 1])
+    return value
+
+
+def to_signed(value):
+    """Maps an unsigned 64-bit hash onto the BIGINT range."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def bands(value):
+    value &= HASH_MASK
+    return [(value >> (BAND_BITS * i)) & BAND_MASK for i in range(BANDS)]
+
+
+def distance(a, b):
+    return ((a ^ b) & HASH_MASK).bit_count()
+
+
+def _neighbours(band, radius):
+    """Every band value at most `radius` bits away from `band`."""
+    values = {band}
+    for flips in range(1, radius + 1):
+        for bits in combinations(range(BAND_BITS), flips):
+            value = band
+            for bit in bits:
+                value ^= 1 << bit
+            values.add(value)
+    return values
+
+
+def fingerprint_images(user_id, fields=HASHED_FIELDS):
+    """Hashes `fields` of one user and stores the fingerprints. Safe to re-run."""
+    user = User.objects.filter(pk=user_id).only('id', *fields).first()
+    if user is None:
+        return
+    for field in fields:
+        file = getattr(user, field)
+        if not file:
+            continue
+        with file.open('rb') as source:
+            value = dhash(source)
+        _record(user_id, field, file.name, value)
+
+
+def _record(user_id, field, source, value):
+    with transaction.atomic():
+        user = User.objects.select_for_update().filter(pk=user_id).only('id', field).first()
+        # Skip if the user uploaded a different file while we were hashing; that upload schedules its own run
+        if user is None or getattr(user, field).name != source:
+            return
+        ImageFingerprint.objects.update_or_create(
+            user_id=user_id,
+            field=field,
+            defaults={
+                'source': source,
+                'hash': to_signed(value),
+                **{f'band_{i}': band for i, band in enumerate(bands(value))},
+            },
+        )
+
+
+def schedule_fingerprints(user_id, fields=HASHED_FIELDS):
+    """Fingerprints the images in the background once the current transaction commits."""
+    run_in_background(fingerprint_images, user_id, tuple(fields))
+
+
+def forget_fingerprints(user_id, fields):
+    ImageFingerprint.objects.filter(user_id=user_id, field__in=fields).delete()
+
+
+def find_similar(value, max_distance=None, exclude_user=None):
+    """
+    Returns [(fingerprint, distance)] of stored images within `max_distance`
+    bits of the hash `value`, closest first.
+    """
+    if max_distance is None:
+        max_distance = settings.DUPLICATE_IMAGE_MAX_DISTANCE
+    radius = max_distance // BANDS
+    band_matches = [Q(**{f'band_{i}__in': sorted(_neighbours(band, radius))}) for i, band in enumerate(bands(value))]
+    condition = Q()
+    for match in band_matches:
+        condition |= match
+    # Rows agreeing on more bands are likelier to be close, so they are checked first when
+    # DUPLICATE_IMAGE_MAX_CANDIDATES cuts the list short; id keeps the cut deterministic
+    matched_bands = sum(Case(When(match, then=Value(1)), default=Value(0)) for match in band_matches)
+    candidates = (
+        ImageFingerprint.objects.filter(condition).select_related('user')
+        .alias(matched_bands=matched_bands).order_by('-matched_bands', 'id')
+    )
+    if exclude_user is not None:
+        candidates = candidates.exclude(user=exclude_user)
+    matches = []
+    for fingerprint in candidates[:settings.DUPLICATE_IMAGE_MAX_CANDIDATES]:
+        d = distance(fingerprint.hash, value)
+        if d <= max_distance:
+            matches.append((fingerprint, d))
+    matches.sort(key=lambda match: (match[1], match[0].user_id))
+    return matches
+
+
+def possible_duplicates(user):
+    """
+    Other accounts with an ID or passport photo close to one of `user`'s, as
+    [{user, field, matched_field, distance}] with the closest match per account
+    and field, closest first. Fingerprints of replaced uploads are ignored.
+    """
+    results = {}
+    for own in ImageFingerprint.objects.filter(user=user):
+        if getattr(user, own.field).name != own.source:
+            continue
+        for match, d in find_similar(own.hash, exclude_user=user):
+            key = (match.user_id, own.field)
+            if key not in results or d < results[key]['distance']:
+                results[key] = {'user': match.user, 'field': own.field, 'matched_field': match.field, 'distance': d}
+    return sorted(results.values(), key=lambda result: (result['distance'], result['user'].pk, result['field']))
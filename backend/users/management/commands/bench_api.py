@@ -0,0 +1,91 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from users.benchmarking import analyze_tables, api_calls, measure_requests, seed_dataset
+from users.models import Booking, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Drives the main API endpoints through the Django test client and reports latency percentiles "
+        "and SQL queries per request. Everything, the seeded rows included, is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=20000, help="Synthetic workers to seed")
+        parser.add_argument('--employers', type=int, default=2000, help="Synthetic employers to seed")
+        parser.add_argument('--bookings-per-employer', type=int, default=20)
+        parser.add_argument('--no-seed', action='store_true', help="Run against the existing data (see seed_data)")
+        parser.add_argument('--repeat', type=int, default=30, help="Timed requests per endpoint")
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--output', help="Write the JSON report to this file")
+        parser.add_argument('--json', action='store_true', help="Print the JSON report")
+
+    def handle(self, *args, **options):
+        repeat, warmup = options['repeat'], options['warmup']
+        calls_needed = repeat + warmup
+
+        with transaction.atomic(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            if not options['no_seed']:
+                seed_dataset(options['workers'], options['employers'], options['bookings_per_employer'], seed=1)
+                analyze_tables()
+
+            admin = User.objects.create_user(
+                username='bench-admin@example.com', email='bench-admin@example.com', phone='bench-admin',
+                password=None, role='admin', is_staff=True,
+            )
+            worker, employer = self.pick_pair()
+            available = User.objects.filter(role='worker', is_deleted=False, is_available=True).exclude(
+                pk__in=Booking.objects.filter(employer=employer).values('worker_id')
+            ).exclude(pk=worker.pk).order_by('id')
+            fresh = list(available[:2 * calls_needed])
+            if len(fresh) < 2 * calls_needed:
+                raise CommandError(f"Need {2 * calls_needed} available workers without a booking, found {len(fresh)}.")
+
+            # Half the spare workers get hired, the other half accept a pending request from `employer`
+            spare_workers, responders = fresh[:calls_needed], fresh[calls_needed:]
+            pending = [Booking.objects.create(employer=employer, worker=w) for w in responders]
+
+            dataset = {
+                'workers': User.objects.filter(role='worker').count(),
+                'employers': User.objects.filter(role='employer').count(),
+                'bookings': Booking.objects.count(),
+            }
+            calls = api_calls(admin, employer, worker, spare_workers, pending)
+            results = {name: measure_requests(call, repeat, warmup) for name, call in calls.items()}
+            transaction.set_rollback(True)
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'dataset': dataset,
+            'repeat': repeat,
+            'endpoints': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:>20}: p50 {result['p50_ms']}ms  p95 {result['p95_ms']}ms  p99 {result['p99_ms']}ms  "
+                f"queries {result['queries_min']}-{result['queries_max']}  status {result['statuses']}"
+            )
+
+    def pick_pair(self):
+        """A worker with pending invites and an employer with a long history: the busiest dashboards."""
+        booking = (
+            Booking.objects.filter(status='pending', worker__is_available=True, worker__is_deleted=False)
+            .select_related('worker', 'employer').order_by('id').first()
+        )
+        if booking is None:
+            raise CommandError("No pending bookings to benchmark with; seed some data first.")
+        return booking.worker, booking.employer
@@ -0,0 +1,90 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.db.models import Q
+
+from users import bookings
+from users.benchmarking import seed_bookings, seed_employers, seed_workers
+from users.models import Booking, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Races concurrent accepts through the booking state machine on a real database and reports "
+        "throughput and whether every worker was hired exactly once. Seeded rows are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=200, help="Workers being hired")
+        parser.add_argument('--requests-per-worker', type=int, default=5, help="Pending requests each worker accepts at once")
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            self.stderr.write("SQLite serialises writers; run this against PostgreSQL.")
+            return
+
+        # Threads need to see the data, so it is committed and removed at the end
+        worker_tag = seed_workers(options['workers'], seed=1, available_share=1)
+        employer_tag = seed_employers(options['requests_per_worker'], seed=2)
+        seeded = User.objects.filter(
+            Q(username__startswith=f'bench-{worker_tag}-') | Q(username__startswith=f'bench-{employer_tag}-')
+        )
+        try:
+            workers = list(User.objects.filter(username__startswith=f'bench-{worker_tag}-'))
+            employer_ids = list(User.objects.filter(username__startswith=f'bench-{employer_tag}-').values_list('id', flat=True))
+            seed_bookings(employer_ids, [w.pk for w in workers], len(workers), seed=3, statuses=['pending'])
+
+            attempts = [
+                (worker, booking_id)
+                for worker in workers
+                for booking_id in Booking.objects.filter(worker=worker).values_list('id', flat=True)
+            ]
+            results = self.race(attempts, options['threads'])
+
+            hires = Booking.objects.filter(worker__in=workers, status='accepted').values('worker').distinct().count()
+            double_hired = (
+                Booking.objects.filter(worker__in=workers, status='accepted').count() - hires
+            )
+            results.update(workers=len(workers), hired_workers=hires, double_hired=double_hired)
+        finally:
+            seeded.delete()  # cascades to the bookings
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(
+            f"{results['attempts']} accepts over {options['threads']} threads in {results['seconds']}s "
+            f"({results['accepts_per_second']}/s): {results['hired']} hired, {results['conflicts']} conflicts"
+        )
+        verdict = self.style.SUCCESS('OK') if results['double_hired'] == 0 and results['hired_workers'] == results['workers'] \
+            else self.style.ERROR('FAILED')
+        self.stdout.write(f"{verdict}: {results['hired_workers']}/{results['workers']} workers hired, {results['double_hired']} double hires")
+
+    @staticmethod
+    def race(attempts, threads):
+        def attempt(job):
+            worker, booking_id = job
+            try:
+                bookings.accept(booking_id, worker)
+                return 'hired'
+            except bookings.BookingConflict:
+                return 'conflict'
+            finally:
+                close_old_connections()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            outcomes = list(pool.map(attempt, attempts))
+        seconds = time.perf_counter() - start
+        return {
+            'attempts': len(attempts),
+            'hired': outcomes.count('hired'),
+            'conflicts': outcomes.count('conflict'),
+            'seconds': round(seconds, 3),
+            'accepts_per_second': round(len(attempts) / seconds, 1),
+        }
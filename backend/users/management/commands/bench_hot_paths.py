@@ -0,0 +1,63 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.benchmarking import (
+    analyze_tables, has_full_scan, hot_path_queries, measure, plan_indexes, seed_bookings, seed_employers,
+    seed_workers,
+)
+from users.models import Booking, User
+
+
+class Command(BaseCommand):
+    help = "Seeds users and bookings, then times the hot dashboard/directory queries and shows which index serves each."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=50000, help="Synthetic workers to seed")
+        parser.add_argument('--employers', type=int, default=5000, help="Synthetic employers to seed")
+        parser.add_argument('--bookings-per-employer', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=30, help="Timed runs per query")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+        parser.add_argument('--keep', action='store_true', help="Keep the seeded rows instead of rolling back")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            worker_tag = seed_workers(options['workers'], seed=1)
+            employer_tag = seed_employers(options['employers'], seed=2)
+            worker_ids = list(User.objects.filter(username__startswith=f'bench-{worker_tag}-').values_list('id', flat=True))
+            employer_ids = list(User.objects.filter(username__startswith=f'bench-{employer_tag}-').values_list('id', flat=True))
+            bookings = seed_bookings(employer_ids, worker_ids, options['bookings_per_employer'], seed=3)
+            analyze_tables()
+
+            sample = Booking.objects.filter(employer_id=employer_ids[0]).order_by('id').first()
+            employer, worker = User.objects.get(pk=sample.employer_id), User.objects.get(pk=sample.worker_id)
+
+            results = {}
+            for name, (queryset, index) in hot_path_queries(employer, worker).items():
+                plan = queryset.explain()
+                # .all() so every run hits the database instead of the queryset's result cache
+                results[name] = measure(lambda: list(queryset.all()), options['repeat'])
+                results[name].update(
+                    expected_index=index,
+                    indexes_used=plan_indexes(plan),
+                    full_scan=has_full_scan(plan),
+                    plan=plan,
+                )
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(
+            f"{options['workers']} workers, {options['employers']} employers, {bookings} bookings"
+        )
+        for name, result in results.items():
+            marker = 'SCAN' if result['full_scan'] else 'ok  '
+            self.stdout.write(
+                f"[{marker}] {name:>24}: p50 {result['p50_ms']}ms  p95 {result['p95_ms']}ms  "
+                f"using {', '.join(result['indexes_used']) or '-'} (expected {result['expected_index']})"
+            )
@@ -0,0 +1,57 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import CharField
+from django.db.models.functions import Cast
+
+from users.benchmarking import analyze_tables, measure, seed_workers
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Compares the old text salary filter with the integer, index-backed one on a seeded dataset."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=20000, help="Synthetic workers to seed")
+        parser.add_argument('--repeat', type=int, default=30, help="Timed runs per filter")
+        parser.add_argument('--min', type=int, default=9000, dest='min_salary')
+        parser.add_argument('--max', type=int, default=15000, dest='max_salary')
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+        parser.add_argument('--keep', action='store_true', help="Keep the seeded rows instead of rolling back")
+
+    def handle(self, *args, **options):
+        low, high = options['min_salary'], options['max_salary']
+
+        with transaction.atomic():
+            seed_workers(options['workers'], seed=1)
+            analyze_tables()
+
+            directory = User.objects.filter(role='worker', is_available=True, is_deleted=False)
+            filters = {
+                # What the directory did while expected_salary was a CharField: string comparison
+                'text_column': directory.annotate(salary_text=Cast('expected_salary', CharField())).filter(
+                    salary_text__gte=str(low), salary_text__lte=str(high)
+                ),
+                'integer_column': directory.filter(expected_salary__gte=low, expected_salary__lte=high),
+            }
+
+            results = {}
+            for name, queryset in filters.items():
+                results[name] = measure(lambda: list(queryset.values_list('id', flat=True)), options['repeat'])
+                results[name]['rows'] = queryset.count()
+                results[name]['plan'] = queryset.values('id').explain()
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f"Salary range {low}-{high} over {options['workers']} seeded workers")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:>15}: p50 {result['p50_ms']}ms  p95 {result['p95_ms']}ms  rows {result['rows']}"
+            )
+            self.stdout.write(f"{'':>15}  plan: {result['plan'].splitlines()[0]}")
@@ -0,0 +1,69 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.db.models import Q
+
+from users.fingerprints import HASHED_FIELDS, fingerprint_images
+from users.models import ImageFingerprint, User
+
+
+def fingerprint(job):
+    user_id, fields = job
+    try:
+        fingerprint_images(user_id, fields)
+        return user_id, None
+    except Exception as e:
+        return user_id, e
+
+
+def fingerprint_in_pool(job):
+    try:
+        return fingerprint(job)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = "Backfills perceptual hashes of ID and passport photos that don't have an up-to-date one."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Rehash images that already have a fingerprint")
+        parser.add_argument('--workers', type=int, default=4, help="Users processed in parallel (1 = serially, in this thread)")
+        parser.add_argument('--batch-size', type=int, default=500, help="Users read per query")
+
+    def handle(self, *args, **options):
+        has_image = Q()
+        for field in HASHED_FIELDS:
+            has_image |= Q(**{f'{field}__gt': ''})
+        users = User.objects.filter(has_image).only('id', *HASHED_FIELDS).order_by('id')
+
+        hashed = set()
+        if not options['force']:
+            hashed = set(ImageFingerprint.objects.values_list('user_id', 'field', 'source'))
+
+        jobs = []
+        for user in users.iterator(chunk_size=options['batch_size']):
+            fields = [
+                f for f in HASHED_FIELDS
+                if getattr(user, f) and (user.pk, f, getattr(user, f).name) not in hashed
+            ]
+            if fields:
+                jobs.append((user.pk, fields))
+
+        if options['workers'] <= 1:
+            results = map(fingerprint, jobs)
+        else:
+            pool = ThreadPoolExecutor(max_workers=options['workers'])
+            results = pool.map(fingerprint_in_pool, jobs)
+
+        done = failed = 0
+        for user_id, error in results:
+            if error is None:
+                done += 1
+            else:
+                failed += 1
+                self.stderr.write(f"User {user_id}: {error}")
+        if options['workers'] > 1:
+            pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(f"Fingerprinted images for {done} users, {failed} failed."))
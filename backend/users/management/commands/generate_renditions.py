@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.db.models import Q
+
+from users.models import User
+from users.renditions import IMAGE_FIELDS, current_renditions, generate_renditions
+
+
+def render(job):
+    user_id, fields = job
+    try:
+        generate_renditions(user_id, fields)
+        return user_id, None
+    except Exception as e:
+        return user_id, e
+
+
+def render_in_pool(job):
+    try:
+        return render(job)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = "Backfills resized WebP renditions for passport and ID photos that don't have up-to-date ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regenerate renditions that already exist")
+        parser.add_argument('--workers', type=int, default=4, help="Users processed in parallel (1 = serially, in this thread)")
+        parser.add_argument('--batch-size', type=int, default=500, help="Users read per query")
+
+    def handle(self, *args, **options):
+        has_image = Q()
+        for field in IMAGE_FIELDS:
+            has_image |= Q(**{f'{field}__gt': ''})
+        users = User.objects.filter(has_image).only('id', 'renditions', *IMAGE_FIELDS).order_by('id')
+
+        jobs = []
+        for user in users.iterator(chunk_size=options['batch_size']):
+            fields = [f for f in IMAGE_FIELDS if getattr(user, f) and (options['force'] or not current_renditions(user, f))]
+            if fields:
+                jobs.append((user.pk, fields))
+
+        if options['workers'] <= 1:
+            results = map(render, jobs)
+        else:
+            pool = ThreadPoolExecutor(max_workers=options['workers'])
+            results = pool.map(render_in_pool, jobs)
+
+        done = failed = 0
+        for user_id, error in results:
+            if error is None:
+                done += 1
+            else:
+                failed += 1
+                self.stderr.write(f"User {user_id}: {error}")
+        if options['workers'] > 1:
+            pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(f"Rendered images for {done} users, {failed} failed."))
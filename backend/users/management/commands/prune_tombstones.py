@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = "Deletes deleted-booking tombstones older than BOOKING_TOMBSTONE_RETENTION_DAYS (run daily)."
+
+    def handle(self, *args, **options):
+        removed = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(
+            f"Removed {removed} tombstones older than {settings.BOOKING_TOMBSTONE_RETENTION_DAYS} days."
+        ))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+
+from users.counters import COUNTER_NAMES, reconcile
+from users.models import PlatformCounter
+
+
+class Command(BaseCommand):
+    help = "Recomputes the admin dashboard counters from the User and Booking tables and reports any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help="Counters to recompute (default: all)")
+
+    def handle(self, *args, **options):
+        names = options['names'] or COUNTER_NAMES
+        unknown = sorted(set(names) - set(COUNTER_NAMES))
+        if unknown:
+            self.stderr.write(f"Unknown counters: {', '.join(unknown)}")
+            return
+
+        before = dict(
+            PlatformCounter.objects.filter(name__in=names)
+            .values('name').annotate(total=Sum('value')).values_list('name', 'total')
+        )
+        after = reconcile(names)
+        drifted = 0
+        for name in names:
+            if before.get(name) != after[name]:
+                drifted += 1
+                self.stdout.write(f"{name}: {before.get(name)} -> {after[name]}")
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {len(names)} counters, {drifted} corrected."))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from users.benchmarking import analyze_tables, seed_dataset
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-generates a synthetic dataset (workers, employers, bookings, verification logs) and keeps it, "
+        "for load tests and `bench_api --no-seed`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=200000)
+        parser.add_argument('--employers', type=int, default=20000)
+        parser.add_argument('--bookings-per-employer', type=int, default=100, help="2M bookings with the defaults")
+        parser.add_argument('--logs-per-worker', type=int, default=1, help="Verification log entries per worker")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed, for reproducible datasets")
+
+    def handle(self, *args, **options):
+        # Batches commit one by one, so a large run doesn't hold one huge transaction open
+        admin = User.objects.filter(is_staff=True).order_by('id').first()
+        dataset = seed_dataset(
+            options['workers'],
+            options['employers'],
+            options['bookings_per_employer'],
+            logs_per_worker=options['logs_per_worker'],
+            admin=admin,
+            seed=options['seed'],
+        )
+        analyze_tables()
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(dataset['workers'])} workers, {len(dataset['employers'])} employers, "
+            f"{dataset['bookings']} bookings and {dataset['verification_logs']} verification logs."
+        ))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.outbox import send_due_emails
+
+
+class Command(BaseCommand):
+    help = "Delivers queued emails from the EmailOutbox table in batches, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain everything that is due, then exit")
+        parser.add_argument('--batch-size', type=int, default=None, help="Emails per batch (OUTBOX_BATCH_SIZE)")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep when nothing is due")
+        parser.add_argument('--backend', default=None, help="Email backend path (OUTBOX_EMAIL_BACKEND)")
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                sent, failed = send_due_emails(options['batch_size'], options['backend'])
+            except Exception as e:
+                # e.g. the mail API is unreachable: the claimed batch was handed back, so it is retried
+                self.stderr.write(f"Outbox batch failed: {e}")
+                sent = failed = 0
+                if options['once']:
+                    raise
+
+            if sent or failed:
+                self.stdout.write(f"Outbox: {sent} sent, {failed} failed")
+                continue
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,105 @@
+"""
+Private delivery of identity documents.
+
+ID photos, passport photos and their renditions are stored by
+ProtectedMediaStorage, whose URLs point at /api/media/<name> with an expiring
+signature instead of at the public /media/ tree. A serializer only hands such
+a URL to someone it already shows the document to, so an <img> tag (which
+can't send the API token) still works. Requests without a valid signature
+are let through for admins and for the worker who owns the file.
+
+Once access is checked the bytes are sent by nginx (X-Accel-Redirect to the
+internal location in PROTECTED_MEDIA_ACCEL_PREFIX), so no app worker is tied
+up per download. Without a prefix, e.g. under runserver, Django streams the
+file itself.
+"""
+import mimetypes
+import time
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.signing import Signer
+from django.http import FileResponse, HttpResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
+
+PROTECTED_FIELDS = ('id_photo_front', 'id_photo_back', 'passport_img')
+PROTECTED_PREFIX = 'identity/'
+
+def _signature(name, expires):
+    # Built per call so SECRET_KEY is read when signing, not at import time
+    return Signer(salt='users.media').signature(f'{name}:{expires}')
+
+
+def signing_window():
+    """The current PROTECTED_MEDIA_URL_TTL period; signed URLs change when it does."""
+    return int(time.time()) // settings.PROTECTED_MEDIA_URL_TTL
+
+
+def signed_url(name):
+    """
+    URL of protected file `name`, valid for one to two PROTECTED_MEDIA_URL_TTL periods.
+    The expiry is rounded to a period so repeated API calls hand out the same URL
+    and the browser cache keeps working.
+    """
+    expires = (signing_window() + 2) * settings.PROTECTED_MEDIA_URL_TTL
+    query = urlencode({'expires': expires, 'signature': _signature(name, expires)})
+    return f"{reverse('protected-media', args=[name])}?{query}"
+
+
+def signature_expiry(name, params):
+    """Unix time the signed URL in `params` expires at, or None if it isn't valid (any more)."""
+    try:
+        expires = int(params.get('expires', ''))
+    except ValueError:
+        return None
+    if expires < time.time() or not constant_time_compare(params.get('signature', ''), _signature(name, expires)):
+        return None
+    return expires
+
+
+def owned_files(user):
+    """Stored names of the user's documents and of their renditions."""
+    names = {getattr(user, field).name for field in PROTECTED_FIELDS if getattr(user, field)}
+    for entry in (user.renditions or {}).values():
+        names.update(name for label, name in entry.items() if label != 'source')
+    return names
+
+
+def is_protected_name(name):
+    parts = name.split('/')
+    return name.startswith(PROTECTED_PREFIX) and '..' not in parts and '' not in parts
+
+
+def send_file(storage, name, max_age):
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    prefix = settings.PROTECTED_MEDIA_ACCEL_PREFIX
+    if prefix:
+        # nginx serves the file from its internal location and keeps these headers
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = prefix + quote(name)
+    else:
+        response = FileResponse(storage.open(name, 'rb'), content_type=content_type)
+    response['X-Content-Type-Options'] = 'nosniff'
+    if max_age:
+        patch_cache_control(response, private=True, max_age=max_age)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class ProtectedMediaStorage(FileSystemStorage):
+    """Files under MEDIA_ROOT like the default storage, but with signed, access-checked URLs."""
+
+    def url(self, name):
+        return signed_url(name)
+
+
+protected_storage = ProtectedMediaStorage()
+
+
+def get_protected_storage():
+    # Referenced by the model fields (a callable keeps the storage out of migrations)
+    return protected_storage
@@ -0,0 +1,227 @@
+"""
+Per-route request metrics in Prometheus text format.
+
+MetricsMiddleware (users/middleware.py) times each request and, through a
+connection execute_wrapper, counts its SQL queries and their time. Totals are
+kept per (route name, method) in process memory, so recording costs a lock
+and a few additions. Every METRICS_FLUSH_INTERVAL seconds a process copies its totals
+to the shared cache; /api/metrics/ exports the copies of all live processes.
+
+Live processes are found through METRICS_MAX_PROCESSES slot keys. A process
+claims a free slot with cache.add, which is atomic, so processes starting at
+the same time can't overwrite each other's registration. The slot expires
+with the process's totals once it stops flushing.
+
+Each process's totals are exported as their own series, labelled with its
+slot, and never summed here: a sum would drop when a process dies, which
+Prometheus reads as a counter reset. Per-slot counters only start over when a
+new process takes a slot, which is an ordinary restart to Prometheus;
+aggregate with sum(rate(...)) without the slot label.
+
+Unknown HTTP methods are all labelled OTHER, so clients can't create
+arbitrary label values.
+"""
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+HTTP_METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'})
+
+PROCESS_ID = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+
+_lock = threading.Lock()
+_routes = {}
+_last_flush = [time.monotonic()]
+_slot = [None]
+
+
+def method_label(method):
+    return method if method in HTTP_METHODS else 'OTHER'
+
+
+def _slot_key(slot):
+    return f'metrics:slot:{slot}'
+
+
+def _process_key(process):
+    return f'metrics:process:{process}'
+
+
+def _new_stats():
+    return {
+        'latency_buckets': [0] * len(LATENCY_BUCKETS),
+        'latency_sum': 0.0,
+        'count': 0,
+        'statuses': {},
+        'query_buckets': [0] * len(QUERY_BUCKETS),
+        'queries': 0,
+        'sql_seconds': 0.0,
+    }
+
+
+def record(route, method, status, seconds, queries, sql_seconds):
+    with _lock:
+        stats = _routes.get((route, method))
+        if stats is None:
+            stats = _routes[(route, method)] = _new_stats()
+        stats['count'] += 1
+        stats['latency_sum'] += seconds
+        index = bisect_left(LATENCY_BUCKETS, seconds)
+        if index < len(LATENCY_BUCKETS):
+            stats['latency_buckets'][index] += 1
+        index = bisect_left(QUERY_BUCKETS, queries)
+        if index < len(QUERY_BUCKETS):
+            stats['query_buckets'][index] += 1
+        stats['queries'] += queries
+        stats['sql_seconds'] += sql_seconds
+        stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+
+    if time.monotonic() - _last_flush[0] >= settings.METRICS_FLUSH_INTERVAL:
+        flush()
+
+
+def snapshot():
+    with _lock:
+        return {
+            key: {**stats, 'latency_buckets': list(stats['latency_buckets']),
+                  'query_buckets': list(stats['query_buckets']), 'statuses': dict(stats['statuses'])}
+            for key, stats in _routes.items()
+        }
+
+
+def _claim_slot(ttl):
+    """Keeps this process's slot alive, claiming a free one if it has none (or lost it). None if all are taken."""
+    slot = _slot[0]
+    if slot is not None and cache.get(_slot_key(slot)) == PROCESS_ID:
+        cache.touch(_slot_key(slot), ttl)
+        return slot
+    for slot in range(settings.METRICS_MAX_PROCESSES):
+        if cache.add(_slot_key(slot), PROCESS_ID, ttl):
+            _slot[0] = slot
+            return slot
+    _slot[0] = None
+    return None
+
+
+def flush():
+    """Publishes this process's totals to the shared cache."""
+    _last_flush[0] = time.monotonic()
+    ttl = settings.METRICS_FLUSH_INTERVAL * 6
+    cache.set(_process_key(PROCESS_ID), snapshot(), ttl)
+    _claim_slot(ttl)
+
+
+def reset():
+    with _lock:
+        _routes.clear()
+    slots = [_slot_key(slot) for slot in range(settings.METRICS_MAX_PROCESSES)]
+    processes = cache.get_many(slots).values()
+    cache.delete_many(slots + [_process_key(p) for p in {*processes, PROCESS_ID}])
+    _slot[0] = None
+
+
+def collect():
+    """Totals of every live process, this one included, as {slot: {(route, method): stats}}."""
+    flush()
+    slots = cache.get_many([_slot_key(slot) for slot in range(settings.METRICS_MAX_PROCESSES)])
+    snapshots = cache.get_many([_process_key(p) for p in set(slots.values())])
+    return {
+        int(key.rsplit(':', 1)[1]): snapshots[_process_key(process)]
+        for key, process in slots.items()
+        if _process_key(process) in snapshots
+    }
+
+
+def merge(processes):
+    """Adds up collect()'s per-process totals into {(route, method): stats}."""
+    merged = {}
+    for routes in processes.values():
+        for key, stats in routes.items():
+            total = merged.setdefault(key, _new_stats())
+            for field in ('latency_sum', 'count', 'queries', 'sql_seconds'):
+                total[field] += stats[field]
+            for field in ('latency_buckets', 'query_buckets'):
+                total[field] = [a + b for a, b in zip(total[field], stats[field])]
+            for status, count in stats['statuses'].items():
+                total['statuses'][status] = total['statuses'].get(status, 0) + count
+    return merged
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _histogram(lines, name, labels, bounds, buckets, total, count):
+    cumulative = 0
+    for bound, bucket in zip(bounds, buckets):
+        cumulative += bucket
+        lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {cumulative}')
+    lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {count}')
+    lines.append(f'{name}_sum{_labels(**labels)} {total}')
+    lines.append(f'{name}_count{_labels(**labels)} {count}')
+
+
+def render(processes):
+    """Prometheus text exposition format (version 0.0.4) of collect()'s per-process totals."""
+    ordered = [
+        ({'route': route, 'method': method, 'slot': slot}, stats)
+        for (route, method, slot), stats in sorted(
+            ((route, method, slot), stats)
+            for slot, routes in processes.items()
+            for (route, method), stats in routes.items()
+        )
+    ]
+    lines = [
+        '# HELP kykam_http_request_duration_seconds Request latency by route.',
+        '# TYPE kykam_http_request_duration_seconds histogram',
+    ]
+    for labels, stats in ordered:
+        _histogram(lines, 'kykam_http_request_duration_seconds', labels,
+                   LATENCY_BUCKETS, stats['latency_buckets'], stats['latency_sum'], stats['count'])
+
+    lines += ['# HELP kykam_http_requests_total Requests by route and status code.',
+              '# TYPE kykam_http_requests_total counter']
+    for labels, stats in ordered:
+        for status, count in sorted(stats['statuses'].items()):
+            lines.append(f'kykam_http_requests_total{_labels(**labels, status=status)} {count}')
+
+    lines += ['# HELP kykam_db_queries_per_request SQL queries issued per request.',
+              '# TYPE kykam_db_queries_per_request histogram']
+    for labels, stats in ordered:
+        _histogram(lines, 'kykam_db_queries_per_request', labels,
+                   QUERY_BUCKETS, stats['query_buckets'], stats['queries'], stats['count'])
+
+    lines += ['# HELP kykam_db_query_seconds_total Time spent in SQL by route.',
+              '# TYPE kykam_db_query_seconds_total counter']
+    for labels, stats in ordered:
+        lines.append(f'kykam_db_query_seconds_total{_labels(**labels)} {stats["sql_seconds"]}')
+    return '\n'.join(lines) + '\n'
+
+
+class QueryRecorder:
+    """execute_wrapper that counts queries and their time for the current request."""
+
+    __slots__ = ('queries', 'seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.queries += 1
+
@@ -1,5 +1,10 @@
+import time
+
+from django.conf import settings as django_settings
+from django.db import connection
 from django.http import JsonResponse
-from .models import PlatformSetting
+from .caching import get_platform_settings
+from . import metrics
 
 class MaintenanceMiddleware:
     def __init__(self, get_response):
@@ -14,7 +19,7 @@ class MaintenanceMiddleware:
         if request.path in exempt_paths:
             return self.get_response(request)
 
-        settings = PlatformSetting.objects.first()
+        settings = get_platform_settings()
         if settings and settings.maintenance_mode:
             # 2. Check if the request has the Admin Token
             # DRF uses the 'Authorization' header
@@ -30,4 +35,77 @@ class MaintenanceMiddleware:
                 "message": settings.broadcast_message or "We are updating our systems."
             }, status=503)
 
-        return self.get_response(request)
\ No newline at end of file
+        return self.get_response(request)
+
+
+class MetricsMiddleware:
+    """Records latency, status and SQL query count/time per resolved route (users/metrics.py)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not django_settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        recorder = metrics.QueryRecorder()
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+
+        # Route names, not raw paths, keep the label set small (ids never become labels)
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match else 'unmatched'
+
+        def finish():
+            metrics.record(
+                route, metrics.method_label(request.method), response.status_code,
+                time.perf_counter() - start, recorder.queries, recorder.seconds,
+            )
+
+        if getattr(response, 'streaming', False):
+            # The body (e.g. a CSV export) is produced while it is sent, so the
+            # request is recorded when the server closes the response
+            stream = AsyncMeteredStream if response.is_async else MeteredStream
+            response.streaming_content = stream(response.streaming_content, recorder, finish)
+        else:
+            finish()
+        return response
+
+
+class MeteredStream:
+    """
+    Streaming response content that counts the SQL its chunks issue and calls
+    `finish` once, when the response is closed (Django closes every content
+    iterator that has a close() method), whether or not it was read to the end.
+    """
+
+    def __init__(self, content, recorder, finish):
+        self.content = content
+        self.recorder = recorder
+        self.finish = finish
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with connection.execute_wrapper(self.recorder):
+            return next(self.content)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.finish()
+
+
+class AsyncMeteredStream(MeteredStream):
+    """MeteredStream for async content; its queries run in other threads, so only the latency is recorded."""
+
+    __iter__ = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await anext(self.content)
@@ -0,0 +1,87 @@
+import re
+
+from django.db import migrations, models
+
+MAX_SALARY = 2147483647
+
+
+def parse_salary(value):
+    # Frozen copy of users.utils.parse_salary so the migration doesn't change if the helper does
+    match = re.search(r'\d[\d,]*', str(value or ''))
+    if not match:
+        return None
+    amount = int(match.group().replace(',', ''))
+    return amount if amount <= MAX_SALARY else None
+
+
+def copy_salaries_to_integers(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    batch = []
+    rows = User.objects.exclude(expected_salary__isnull=True, salary__isnull=True).only('id', 'expected_salary', 'salary')
+    for user in rows.iterator(chunk_size=2000):
+        user.expected_salary_amount = parse_salary(user.expected_salary)
+        user.salary_amount = parse_salary(user.salary)
+        batch.append(user)
+        if len(batch) >= 2000:
+            User.objects.bulk_update(batch, ['expected_salary_amount', 'salary_amount'])
+            batch = []
+    if batch:
+        User.objects.bulk_update(batch, ['expected_salary_amount', 'salary_amount'])
+
+
+def copy_salaries_to_text(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    batch = []
+    rows = User.objects.exclude(expected_salary_amount__isnull=True, salary_amount__isnull=True)
+    for user in rows.iterator(chunk_size=2000):
+        user.expected_salary = None if user.expected_salary_amount is None else str(user.expected_salary_amount)
+        user.salary = None if user.salary_amount is None else str(user.salary_amount)
+        batch.append(user)
+        if len(batch) >= 2000:
+            User.objects.bulk_update(batch, ['expected_salary', 'salary'])
+            batch = []
+    if batch:
+        User.objects.bulk_update(batch, ['expected_salary', 'salary'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0020_alter_user_experience'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='expected_salary_amount',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='salary_amount',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(copy_salaries_to_integers, copy_salaries_to_text),
+        migrations.RemoveField(
+            model_name='user',
+            name='expected_salary',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='salary',
+        ),
+        migrations.RenameField(
+            model_name='user',
+            old_name='expected_salary_amount',
+            new_name='expected_salary',
+        ),
+        migrations.RenameField(
+            model_name='user',
+            old_name='salary_amount',
+            new_name='salary',
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_available', True), ('is_deleted', False), ('role', 'worker')), fields=['expected_salary'], name='worker_available_salary_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+# GIN trigram indexes on UPPER(column): Postgres compiles `icontains` to
+# UPPER(col::text) LIKE UPPER(...), so the same index serves substring
+# matches and the `%>` word-similarity operator used by users/search.py.
+TRIGRAM_INDEXES = [
+    ('users_user_first_name_trgm', 'first_name'),
+    ('users_user_last_name_trgm', 'last_name'),
+    ('users_user_location_trgm', 'location'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # Postgres only. Without pg_trgm (or on SQLite) search falls back to plain substring matching.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON users_user USING gin (UPPER({column}) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0021_integer_salary_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
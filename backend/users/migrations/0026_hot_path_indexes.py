@@ -0,0 +1,54 @@
+# Generated by Django 5.2.9 on 2026-10-18 15:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0025_user_renditions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booking',
+            name='employer',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='bookings_made', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='worker',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='booking_requests', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['employer', '-created_at', '-id'], name='booking_employer_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['employer', 'status', '-created_at', '-id'], name='booking_employer_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['worker', '-created_at', '-id'], name='booking_worker_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['worker'], name='booking_worker_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['employer', 'worker', '-created_at', '-id'], name='booking_pair_latest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_available', True), ('is_deleted', False), ('role', 'worker')), fields=['-date_joined', '-id'], name='worker_directory_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_available', True), ('is_deleted', False), ('role', 'worker')), fields=['worker_type', '-date_joined', '-id'], name='worker_directory_type_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-18 16:10
+
+import users.media
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0026_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='id_photo_back',
+            field=models.ImageField(blank=True, null=True, storage=users.media.get_protected_storage, upload_to='identity/back/'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='id_photo_front',
+            field=models.ImageField(blank=True, null=True, storage=users.media.get_protected_storage, upload_to='identity/front/'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='passport_img',
+            field=models.ImageField(blank=True, null=True, storage=users.media.get_protected_storage, upload_to='identity/passport/'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9 on 2026-10-18 16:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0027_protected_identity_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=30)),
+                ('source', models.CharField(max_length=255)),
+                ('hash', models.BigIntegerField()),
+                ('band_0', models.IntegerField()),
+                ('band_1', models.IntegerField()),
+                ('band_2', models.IntegerField()),
+                ('band_3', models.IntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='image_fingerprints', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band_0'], name='fingerprint_band_0_idx'), models.Index(fields=['band_1'], name='fingerprint_band_1_idx'), models.Index(fields=['band_2'], name='fingerprint_band_2_idx'), models.Index(fields=['band_3'], name='fingerprint_band_3_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'field'), name='unique_image_fingerprint')],
+            },
+        ),
+    ]
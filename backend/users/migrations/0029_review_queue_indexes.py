@@ -0,0 +1,30 @@
+# Generated by Django 5.2.9 on 2026-10-18 16:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0028_image_fingerprints'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_deleted', False), ('role', 'worker'), ('status', 'pending')), fields=['date_joined', 'id'], name='worker_review_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='verificationlog',
+            index=models.Index(fields=['worker', '-created_at', '-id'], name='verification_worker_latest_idx'),
+        ),
+        # Drop the single-column FK index only once the composite index covers it
+        migrations.AlterField(
+            model_name='verificationlog',
+            name='worker',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='verification_history', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
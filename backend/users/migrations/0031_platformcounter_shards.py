@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0030_booking_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='platformcounter',
+            name='shard',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='platformcounter',
+            name='name',
+            field=models.CharField(max_length=50),
+        ),
+        migrations.AddConstraint(
+            model_name='platformcounter',
+            constraint=models.UniqueConstraint(fields=('name', 'shard'), name='platform_counter_shard_unique'),
+        ),
+    ]
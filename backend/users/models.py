@@ -2,10 +2,69 @@ from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.conf import settings
 from django.db import models
 from django.db.models import UniqueConstraint, Q
+from django.db.models.fields.files import FieldFile
+from django.utils import timezone
 
+from .media import get_protected_storage
 
 
-class User(AbstractUser):
+class TrackedFieldsModel(models.Model):
+    """
+    Remembers the database values of TRACKED_FIELDS so post_save receivers can
+    tell what a save actually changed (cached aggregates and counters use it).
+    """
+    TRACKED_FIELDS = ()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_tracked_values()
+        return instance
+
+    def save(self, *args, **kwargs):
+        loaded = self.loaded_values
+        missing = [f for f in self.TRACKED_FIELDS if f not in loaded] if loaded is not None else []
+        if missing:
+            # Partially loaded instance (e.g. request.user rebuilt from the auth cache):
+            # read the rest of the baseline so receivers still see what actually changed
+            stored = type(self)._base_manager.filter(pk=self.pk).values(*missing).first()
+            loaded.update(stored or {})
+        super().save(*args, **kwargs)
+        # post_save receivers have already compared against the old values by now
+        self._remember_tracked_values()
+
+    def _tracked_value(self, field):
+        value = self.__dict__.get(field)
+        # File fields are compared by stored name, not by FieldFile identity
+        return value.name if isinstance(value, FieldFile) else value
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using, fields, from_queryset)
+        # Values just read (e.g. deferred fields loaded on access) are database values too
+        if self.loaded_values is not None:
+            refreshed = self.TRACKED_FIELDS if fields is None else set(fields) & set(self.TRACKED_FIELDS)
+            self._loaded_values.update({f: self._tracked_value(f) for f in refreshed if f in self.__dict__})
+
+    def _remember_tracked_values(self):
+        self._loaded_values = {f: self._tracked_value(f) for f in self.TRACKED_FIELDS if f in self.__dict__}
+
+    @property
+    def loaded_values(self):
+        """Tracked values as last read from / written to the database; None for new instances."""
+        return getattr(self, '_loaded_values', None)
+
+    def changed_tracked_fields(self):
+        """Tracked fields that differ from what was loaded. New instances report all of them."""
+        loaded = self.loaded_values
+        if loaded is None:
+            return set(self.TRACKED_FIELDS)
+        return {f for f in self.TRACKED_FIELDS if f not in loaded or self._tracked_value(f) != loaded[f]}
+
+
+class User(TrackedFieldsModel, AbstractUser):
     ROLE_CHOICES = (
         ('employer', 'Employer'),
         ('worker', 'Worker'),
@@ -69,14 +128,19 @@ class User(AbstractUser):
     location = models.CharField(max_length=100, blank=True, null=True)
     age = models.CharField(max_length=3, blank=True, null=True)
     family_size = models.CharField(max_length=20, blank=True, null=True)
-    expected_salary = models.CharField(max_length=15, blank=True, null=True)
-    salary = models.CharField(max_length=15, blank=True, null=True)
+    # Monthly amounts in KSh, stored as integers so range filters compare numerically
+    expected_salary = models.PositiveIntegerField(blank=True, null=True)
+    salary = models.PositiveIntegerField(blank=True, null=True)
     
     # --- TRACEABILITY FIELDS ---
     id_number = models.CharField(max_length=50, unique=True, null=True, blank=True)
-    id_photo_front = models.ImageField(upload_to='identity/front/', null=True, blank=True)
-    id_photo_back = models.ImageField(upload_to='identity/back/', null=True, blank=True)
-    passport_img = models.ImageField(upload_to='identity/passport/', null=True, blank=True) # New
+    # Served only through signed, access-checked URLs (users/media.py)
+    id_photo_front = models.ImageField(upload_to='identity/front/', storage=get_protected_storage, null=True, blank=True)
+    id_photo_back = models.ImageField(upload_to='identity/back/', storage=get_protected_storage, null=True, blank=True)
+    passport_img = models.ImageField(upload_to='identity/passport/', storage=get_protected_storage, null=True, blank=True)
+    # Resized WebP copies of the images above, written by users/renditions.py:
+    # {field: {"source": <original name>, "<size label>": <rendition name>, ...}}
+    renditions = models.JSONField(default=dict, blank=True)
 
     # Emergency Contact / Next of Kin
     kin_name = models.CharField(max_length=100, null=True, blank=True)
@@ -89,41 +153,130 @@ class User(AbstractUser):
     groups = models.ManyToManyField(Group, related_name='custom_users', blank=True)
     user_permissions = models.ManyToManyField(Permission, related_name='custom_users_permissions', blank=True)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Backs the directory's min_salary/max_salary range scans
+            models.Index(
+                fields=['expected_salary'],
+                name='worker_available_salary_idx',
+                condition=Q(role='worker', is_available=True, is_deleted=False),
+            ),
+            # Default directory listing: available workers, newest first (keyset on date_joined, id)
+            models.Index(
+                fields=['-date_joined', '-id'],
+                name='worker_directory_idx',
+                condition=Q(role='worker', is_available=True, is_deleted=False),
+            ),
+            # Directory filtered by category
+            models.Index(
+                fields=['worker_type', '-date_joined', '-id'],
+                name='worker_directory_type_idx',
+                condition=Q(role='worker', is_available=True, is_deleted=False),
+            ),
+            # Verification review queue: pending workers, oldest first (keyset on date_joined, id)
+            models.Index(
+                fields=['date_joined', 'id'],
+                name='worker_review_queue_idx',
+                condition=Q(role='worker', status='pending', is_deleted=False),
+            ),
+        ]
+
+    # Fields that cached aggregates, platform counters, the directory cache, image renditions and
+    # fingerprints depend on (see users/signals.py)
+    TRACKED_FIELDS = (
+        'role', 'worker_type', 'is_deleted', 'status', 'is_verified', 'passport_img', 'id_photo_front',
+        'id_photo_back', 'is_available', 'expected_salary', 'experience', 'location', 'first_name', 'last_name',
+    )
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # Token auth builds request.user from a few cached fields (users/caching.py);
+        # reading any other field then loads all the deferred ones in one query
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using, fields, from_queryset)
+
     def __str__(self):
         return f"{self.username} ({self.role})"
     
 
 class VerificationLog(models.Model):
-    worker = models.ForeignKey(User, on_delete=models.CASCADE, related_name='verification_history')
+    # No single-column FK index: the index in Meta leads with worker
+    worker = models.ForeignKey(User, on_delete=models.CASCADE, related_name='verification_history', db_index=False)
     admin = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='performed_actions')
     action = models.CharField(max_length=20)
     rejection_reasons = models.JSONField(null=True, blank=True)
     comment = models.TextField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
-class Booking(models.Model):
+    class Meta:
+        indexes = [
+            # A worker's latest review: profile_status and the review queue's subquery
+            models.Index(fields=['worker', '-created_at', '-id'], name='verification_worker_latest_idx'),
+        ]
+
+class ImageFingerprint(models.Model):
+    """
+    Perceptual hash of one identity image, written by users/fingerprints.py.
+    The 64-bit hash is also split into four 16-bit bands, each indexed, so
+    near-duplicates can be found with a few index lookups (multi-index hashing).
+    """
+    # No single-column FK index: the unique constraint below leads with user
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='image_fingerprints', db_index=False)
+    field = models.CharField(max_length=30)
+    # Name of the upload the hash was computed from
+    source = models.CharField(max_length=255)
+    hash = models.BigIntegerField()
+    band_0 = models.IntegerField()
+    band_1 = models.IntegerField()
+    band_2 = models.IntegerField()
+    band_3 = models.IntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=['user', 'field'], name='unique_image_fingerprint'),
+        ]
+        indexes = [
+            models.Index(fields=['band_0'], name='fingerprint_band_0_idx'),
+            models.Index(fields=['band_1'], name='fingerprint_band_1_idx'),
+            models.Index(fields=['band_2'], name='fingerprint_band_2_idx'),
+            models.Index(fields=['band_3'], name='fingerprint_band_3_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.field} {self.hash & 0xFFFFFFFFFFFFFFFF:016x}"
+
+class Booking(TrackedFieldsModel):
+    TRACKED_FIELDS = ('status',)
+
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('accepted', 'Accepted'),
         ('declined', 'Declined'),
     ]
 
+    # No single-column FK indexes: the composite indexes in Meta lead with these columns
     employer = models.ForeignKey(
         settings.AUTH_USER_MODEL, 
         on_delete=models.CASCADE, 
         related_name='bookings_made',
         null=True,
-        blank=True
+        blank=True,
+        db_index=False,
     )
     worker = models.ForeignKey(
         settings.AUTH_USER_MODEL, 
         on_delete=models.CASCADE, 
         related_name='booking_requests',
         null=True,
-        blank=True
+        blank=True,
+        db_index=False,
     )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Moves on every write, including set-based ones (counters.bulk_transition); drives delta sync
+    updated_at = models.DateTimeField(auto_now=True)
 
 
     class Meta:
@@ -134,10 +287,43 @@ class Booking(models.Model):
                 name='unique_active_booking'
             )
         ]
+        indexes = [
+            # Employer history / my_requests pages and the employer stats counts
+            models.Index(fields=['employer', '-created_at', '-id'], name='booking_employer_feed_idx'),
+            models.Index(fields=['employer', 'status', '-created_at', '-id'], name='booking_employer_status_idx'),
+            # Worker job invite feeds
+            models.Index(fields=['worker', '-created_at', '-id'], name='booking_worker_feed_idx'),
+            # Auto-declining a worker's other pending requests on accept
+            models.Index(fields=['worker'], name='booking_worker_pending_idx', condition=Q(status='pending')),
+            # Directory's per-worker "latest request from this employer" subquery
+            models.Index(fields=['employer', 'worker', '-created_at', '-id'], name='booking_pair_latest_idx'),
+            # Delta sync (?since=, users/sync.py) of the invite, history and admin registry lists
+            models.Index(fields=['worker', 'updated_at', 'id'], name='booking_worker_sync_idx'),
+            models.Index(fields=['employer', 'updated_at', 'id'], name='booking_employer_sync_idx'),
+            models.Index(fields=['updated_at', 'id'], name='booking_sync_idx'),
+        ]
         ordering = ['-created_at']
 
     def __str__(self):
         return f"{self.employer.first_name} -> {self.worker.first_name} ({self.status})"
+class BookingTombstone(models.Model):
+    """A deleted booking, kept so delta syncs (users/sync.py) can tell clients to drop it."""
+    # Plain ids rather than foreign keys: the booking is gone and its users may follow
+    booking_id = models.BigIntegerField()
+    employer_id = models.BigIntegerField(null=True)
+    worker_id = models.BigIntegerField(null=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['worker_id', 'deleted_at'], name='tombstone_worker_idx'),
+            models.Index(fields=['employer_id', 'deleted_at'], name='tombstone_employer_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"Booking {self.booking_id} deleted {self.deleted_at}"
+
 class Category(models.Model):
     name = models.CharField(max_length=100)
     slug = models.SlugField(unique=True)
@@ -149,6 +335,23 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+class PlatformCounter(models.Model):
+    """
+    One shard of a running total for the admin dashboard, maintained by
+    users/counters.py. A counter's value is the sum of its shards.
+    """
+    name = models.CharField(max_length=50)
+    shard = models.PositiveSmallIntegerField(default=0)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'shard'], name='platform_counter_shard_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.name}[{self.shard}] = {self.value}"
+
 class PlatformSetting(models.Model):
     maintenance_mode = models.BooleanField(default=False)
     broadcast_message = models.TextField(blank=True, null=True)
@@ -161,3 +364,38 @@ class PlatformSetting(models.Model):
 
     def __str__(self):
         return "Global Platform Configuration"
+
+
+class EmailOutbox(models.Model):
+    """
+    Emails waiting to be delivered by `manage.py send_outbox`. Rows are written in
+    the same transaction as the change they announce, so a slow or failing mail
+    API never holds up the request that triggered it.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True, null=True)
+    from_email = models.CharField(max_length=254, blank=True, null=True)
+    to = models.JSONField()
+    reply_to = models.JSONField(blank=True, null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "Email Outbox"
+        indexes = [
+            models.Index(fields=['next_attempt_at'], condition=Q(status='pending'), name='outbox_pending_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
@@ -0,0 +1,125 @@
+"""
+Durable email outbox.
+
+Views call `enqueue_email()` inside their transaction instead of talking to
+SendGrid. `manage.py send_outbox` drains due rows in batches over a single
+backend connection, retrying failures with exponential backoff.
+
+A batch is claimed in a short transaction that pushes its rows'
+next_attempt_at OUTBOX_CLAIM_TIMEOUT seconds ahead, so no transaction or row
+lock is held while the mail API is talked to. If the worker dies mid-batch,
+the claim simply runs out and the rows are sent by the next run (an email may
+then go out twice, never zero times).
+"""
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+
+def queued_email(subject, body, to, html_body=None, from_email=None, reply_to=None):
+    """Unsaved outbox row. Pass a list of them to EmailOutbox.objects.bulk_create() to queue many at once."""
+    return EmailOutbox(
+        subject=subject[:255],
+        body=body,
+        html_body=html_body,
+        from_email=from_email,
+        to=list(to),
+        reply_to=list(reply_to) if reply_to else None,
+    )
+
+
+def enqueue_email(subject, body, to, html_body=None, from_email=None, reply_to=None):
+    """Queues an email. Call it in the same transaction as the change it announces."""
+    entry = queued_email(subject, body, to, html_body, from_email, reply_to)
+    entry.save()
+    return entry
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter: ~1m, 2m, 4m, ... capped at OUTBOX_MAX_RETRY_DELAY seconds."""
+    delay = min(settings.OUTBOX_RETRY_BASE_DELAY * 2 ** (attempts - 1), settings.OUTBOX_MAX_RETRY_DELAY)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def build_message(entry, connection):
+    message = EmailMultiAlternatives(
+        entry.subject,
+        entry.body,
+        entry.from_email or settings.DEFAULT_FROM_EMAIL,
+        entry.to,
+        reply_to=entry.reply_to,
+        connection=connection,
+    )
+    if entry.html_body:
+        message.attach_alternative(entry.html_body, "text/html")
+    return message
+
+
+def claim_due_emails(batch_size):
+    """
+    Claims up to `batch_size` due rows for this worker and returns them. Rows
+    are picked with SELECT ... FOR UPDATE SKIP LOCKED and moved out of the due
+    window before the transaction commits, so several workers can drain the
+    outbox side by side without sending anything twice.
+    """
+    with transaction.atomic():
+        entries = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=timezone.now())
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if entries:
+            EmailOutbox.objects.filter(pk__in=[entry.pk for entry in entries]).update(
+                next_attempt_at=timezone.now() + timedelta(seconds=settings.OUTBOX_CLAIM_TIMEOUT),
+            )
+    return entries
+
+
+def send_due_emails(batch_size=None, backend=None):
+    """Claims and sends one batch of due emails and returns (sent, failed)."""
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    sent = failed = 0
+
+    entries = claim_due_emails(batch_size)
+    if not entries:
+        return sent, failed
+
+    # One connection for the whole batch instead of one per email
+    connection = get_connection(backend or settings.OUTBOX_EMAIL_BACKEND, fail_silently=False)
+    try:
+        connection.open()
+    except Exception:
+        # Nothing was sent: hand the batch straight back instead of waiting out the claim
+        EmailOutbox.objects.filter(pk__in=[entry.pk for entry in entries]).update(next_attempt_at=timezone.now())
+        raise
+    try:
+        for entry in entries:
+            entry.attempts += 1
+            try:
+                if not connection.send_messages([build_message(entry, connection)]):
+                    raise RuntimeError("Backend reported the message as not sent.")
+            except Exception as e:
+                failed += 1
+                entry.last_error = str(e)[:1000]
+                if entry.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                    entry.status = 'failed'
+                else:
+                    entry.next_attempt_at = timezone.now() + retry_delay(entry.attempts)
+            else:
+                sent += 1
+                entry.status = 'sent'
+                entry.sent_at = timezone.now()
+                entry.last_error = None
+    finally:
+        connection.close()
+        # Also after an unexpected error, so what did go out is never sent again
+        EmailOutbox.objects.bulk_update(
+            entries, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+        )
+    return sent, failed
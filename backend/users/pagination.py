@@ -0,0 +1,136 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import F
+from django.db.models.fields.tuple_lookups import Tuple, TupleGreaterThan, TupleLessThan
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on the whole ordering tuple, e.g. (created_at, id).
+
+    Every page filters past the last row of the previous page instead of using
+    OFFSET, so page N costs the same as page 1 no matter how big the table is.
+    The response body stays a plain list (what the frontend already reads) and
+    the next page is advertised in a `Link: <url>; rel="next"` header.
+
+    Views can override the ordering with a `keyset_ordering` attribute. The last
+    field should always be unique (usually `id`) so the ordering is stable.
+    """
+    ordering = ('-created_at', '-id')
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = getattr(view, 'keyset_ordering', None) or self.ordering
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.position_filter(position))
+
+        # Fetch one extra row to know whether there is a next page without a COUNT(*).
+        # Cursor values are only converted to the column types when the query is
+        # compiled, so a tampered cursor fails here.
+        try:
+            rows = list(queryset[:self.page_size + 1])
+        except (ValidationError, ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = self.get_position(rows[-1]) if self.has_next else None
+        return rows
+
+    def resume_page(self, request, next_position):
+        """Prepares get_paginated_response() for a page whose rows were looked up elsewhere (e.g. a cache)."""
+        self.request = request
+        self.has_next = next_position is not None
+        self.next_position = next_position
+
+    def get_paginated_response(self, data):
+        headers = {}
+        next_link = self.get_next_link()
+        if next_link:
+            headers['Link'] = f'<{next_link}>; rel="next"'
+        return Response(data, headers=headers)
+
+    def get_page_size(self, request):
+        page_size = settings.API_PAGE_SIZE
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            requested = None
+        if requested and requested > 0:
+            page_size = requested
+        return min(page_size, settings.API_MAX_PAGE_SIZE)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    # --- Cursor helpers ---
+
+    def position_filter(self, position):
+        """
+        Rows strictly after `position` in the ordering, as one row-value
+        comparison, e.g. (created_at, id) < (x, y) for descending fields.
+
+        Postgres walks the matching composite index straight to the position;
+        backends without row values (SQLite) get the equivalent OR chain.
+        Every field of an ordering must share one direction.
+        """
+        descending = self.ordering[0].startswith('-')
+        if any(field.startswith('-') != descending for field in self.ordering):
+            raise ValueError('Keyset orderings must sort every field the same way')
+        columns = Tuple(*(F(field.lstrip('-')) for field in self.ordering))
+        lookup = TupleLessThan if descending else TupleGreaterThan
+        return lookup(columns, list(position))
+
+    def get_position(self, row):
+        names = [field.lstrip('-') for field in self.ordering]
+        if isinstance(row, dict):
+            return [row[name] for name in names]
+        return [getattr(row, name) for name in names]
+
+    def encode_cursor(self, position):
+        # isoformat keeps microseconds, which the keyset comparison needs to be exact
+        values = [v.isoformat() if isinstance(v, (datetime.date, datetime.datetime)) else v for v in position]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (binascii.Error, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+
+class UserKeysetPagination(KeysetPagination):
+    ordering = ('-date_joined', '-id')
+
+
+class BookingKeysetPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class ReviewQueuePagination(KeysetPagination):
+    # Oldest first, so whoever has waited longest is reviewed first
+    ordering = ('date_joined', 'id')
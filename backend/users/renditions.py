@@ -0,0 +1,133 @@
+"""
+Resized WebP renditions of passport and ID photos.
+
+Directory cards and the admin list only need small images, but used to load
+the full-size uploads. After an upload commits, `schedule_renditions()` hands
+the work to a small thread pool which writes each size next to the original
+(identity/passport/renditions/<name>_card.webp) and records it on
+`User.renditions`. Until a rendition exists, or when it was made from an older
+upload, the URL helpers fall back to the original file.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .models import User
+
+IMAGE_FIELDS = ('passport_img', 'id_photo_front')
+
+# label -> longest edge in pixels
+RENDITION_SIZES = {
+    'thumb': 96,
+    'card': 320,
+}
+
+WEBP_QUALITY = 80
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.RENDITION_WORKERS, thread_name_prefix='renditions')
+        return _executor
+
+
+def rendition_name(source_name, label):
+    directory, filename = os.path.split(source_name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'renditions', f'{stem}_{label}.webp')
+
+
+def render(source, size):
+    """Returns WebP bytes of `source` scaled to fit within size x size."""
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        output = BytesIO()
+        image.save(output, 'WEBP', quality=WEBP_QUALITY, method=4)
+    return output.getvalue()
+
+
+def generate_renditions(user_id, fields=IMAGE_FIELDS):
+    """Writes every rendition of `fields` for one user and records them. Safe to re-run."""
+    user = User.objects.filter(pk=user_id).only('id', 'renditions', *fields).first()
+    if user is None:
+        return
+    for field in fields:
+        file = getattr(user, field)
+        if not file:
+            continue
+        storage = file.storage
+        entry = {'source': file.name}
+        with file.open('rb') as source:
+            data = source.read()
+        for label, size in RENDITION_SIZES.items():
+            name = rendition_name(file.name, label)
+            if storage.exists(name):
+                storage.delete(name)
+            entry[label] = storage.save(name, ContentFile(render(BytesIO(data), size)))
+        _record(user_id, field, entry)
+
+
+def _record(user_id, field, entry):
+    with transaction.atomic():
+        user = User.objects.select_for_update().filter(pk=user_id).first()
+        # Skip if the user uploaded a different file while we were resizing; that upload schedules its own run
+        if user is None or getattr(user, field).name != entry['source']:
+            return
+        previous = user.renditions.get(field) or {}
+        user.renditions = {**user.renditions, field: entry}
+        user.save(update_fields=['renditions'])
+    storage = getattr(user, field).storage
+    for label, name in previous.items():
+        if label != 'source' and name not in entry.values() and storage.exists(name):
+            storage.delete(name)
+
+
+def _run(func, *args):
+    try:
+        func(*args)
+    finally:
+        # Pool threads keep their own DB connections; don't leave them open between jobs
+        close_old_connections()
+
+
+def run_in_background(func, *args):
+    """Runs func(*args) on the image worker pool once the current transaction commits."""
+    transaction.on_commit(lambda: _get_executor().submit(_run, func, *args))
+
+
+def schedule_renditions(user_id, fields=IMAGE_FIELDS):
+    """Generates renditions in the background once the current transaction commits."""
+    run_in_background(generate_renditions, user_id, tuple(fields))
+
+
+def current_renditions(user, field):
+    """The renditions recorded for `field` if they were made from the file it holds now, else None."""
+    file = getattr(user, field)
+    entry = (user.renditions or {}).get(field)
+    if file and entry and entry.get('source') == file.name:
+        return entry
+    return None
+
+
+def rendition_url(user, field, label):
+    """URL of the `label` rendition of `field`, or of the original while none is available."""
+    file = getattr(user, field)
+    if not file:
+        return None
+    entry = current_renditions(user, field)
+    if entry and entry.get(label):
+        return file.storage.url(entry[label])
+    return file.url
@@ -0,0 +1,88 @@
+"""
+Worker directory search.
+
+On PostgreSQL with pg_trgm, name and location matching is served by the GIN
+trigram indexes on UPPER(column) created in migration 0022: substring matches
+(`icontains` compiles to UPPER(col) LIKE ...) use the same index as the fuzzy
+`%>` word-similarity operator, which is what catches typos like "Wanjku".
+Rows are ranked by their best word similarity.
+
+Anywhere else (SQLite in local development and tests, or a Postgres without
+the extension) we fall back to plain substring matching ranked by whether the
+term starts the field or only appears inside it. There is no typo tolerance
+on the fallback path.
+"""
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Cast, Coalesce, Greatest, Upper
+
+NAME_FIELDS = ('first_name', 'last_name')
+LOCATION_FIELDS = ('location',)
+MAX_SEARCH_TERMS = 3
+
+# search_rank is an integer (similarity * 1000) so keyset cursors compare it exactly
+RANK_SCALE = 1000
+
+_trigram_available = {}
+
+
+def uses_trigram_search():
+    if connection.vendor != 'postgresql':
+        return False
+    if connection.alias not in _trigram_available:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram_available[connection.alias] = cursor.fetchone() is not None
+    return _trigram_available[connection.alias]
+
+
+def _trigram_match(term, fields):
+    from django.contrib.postgres.lookups import TrigramWordSimilar
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    term = term.upper()
+    condition = Q()
+    scores = []
+    for field in fields:
+        column = Upper(field)
+        condition |= Q(**{f'{field}__icontains': term}) | Q(TrigramWordSimilar(column, Value(term)))
+        scores.append(Coalesce(TrigramWordSimilarity(Value(term), column), Value(0.0)))
+    score = Greatest(*scores) if len(scores) > 1 else scores[0]
+    return condition, Cast(score * RANK_SCALE, IntegerField())
+
+
+def _substring_match(term, fields):
+    condition = Q()
+    scores = []
+    for field in fields:
+        condition |= Q(**{f'{field}__icontains': term})
+        scores.append(Case(
+            When(**{f'{field}__iexact': term}, then=Value(RANK_SCALE)),
+            When(**{f'{field}__istartswith': term}, then=Value(RANK_SCALE // 2)),
+            When(**{f'{field}__icontains': term}, then=Value(RANK_SCALE // 4)),
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+    score = Greatest(*scores) if len(scores) > 1 else scores[0]
+    return condition, score
+
+
+def search_workers(queryset, search=None, location=None):
+    """
+    Filters `queryset` to workers matching every search word (on first or last
+    name) and the location, and annotates a `search_rank` to order them by.
+    Returns the queryset unchanged when there is nothing to search for.
+    """
+    match = _trigram_match if uses_trigram_search() else _substring_match
+    criteria = [(term, NAME_FIELDS) for term in (search or '').split()[:MAX_SEARCH_TERMS]]
+    if location and location.strip():
+        criteria.append((location.strip(), LOCATION_FIELDS))
+    if not criteria:
+        return queryset
+
+    rank = None
+    for term, fields in criteria:
+        condition, score = match(term, fields)
+        queryset = queryset.filter(condition)
+        rank = score if rank is None else rank + score
+    return queryset.annotate(search_rank=rank)
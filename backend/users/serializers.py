@@ -5,6 +5,14 @@ from django.contrib.auth import authenticate
 from rest_framework import serializers
 from django.utils.text import slugify
 
+from .caching import get_category_worker_counts
+from .renditions import rendition_url
+
+
+def absolute_rendition_url(request, user, field, label):
+    url = rendition_url(user, field, label)
+    return request.build_absolute_uri(url) if url and request else url
+
 # User = get_user_model()
 
 class RegisterWorkerSerializer(serializers.ModelSerializer):
@@ -149,6 +157,34 @@ class AdminUserDetailSerializer(serializers.ModelSerializer):
             'id_photo_front', 'id_photo_back', 'location', 'age',
             'kin_name', 'kin_phone', 'worker_type', 'date_joined', 'passport_img', 'expected_salary', 'salary', 'requirements', 'accommodation'
         ]
+class BulkUserActionSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000)
+    reasons = serializers.ListField(child=serializers.CharField(), required=False, default=list)
+    comment = serializers.CharField(required=False, allow_blank=True, default='')
+
+class BookingHistoryFilterSerializer(serializers.Serializer):
+    # ?status=pending&status=accepted narrows the list; ?since=<cursor or date> asks for changes only (users/sync.py)
+    status = serializers.MultipleChoiceField(choices=['pending', 'accepted', 'declined', 'completed'], required=False)
+    since = serializers.CharField(required=False)
+
+class ExportFilterSerializer(serializers.Serializer):
+    # ?output=csv|ndjson (not ?format=, which DRF reserves for renderer negotiation)
+    output = serializers.ChoiceField(choices=['csv', 'ndjson'], default='csv')
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs):
+        if attrs.get('since') and attrs.get('until') and attrs['since'] >= attrs['until']:
+            raise serializers.ValidationError("'since' must be before 'until'.")
+        return attrs
+
+class BookingExportFilterSerializer(ExportFilterSerializer):
+    status = serializers.MultipleChoiceField(choices=['pending', 'accepted', 'declined', 'completed'], required=False)
+
+class UserExportFilterSerializer(ExportFilterSerializer):
+    status = serializers.MultipleChoiceField(choices=User.STATUS_CHOICES, required=False)
+    role = serializers.MultipleChoiceField(choices=User.ROLE_CHOICES, required=False)
+
 class BookingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
@@ -158,16 +194,21 @@ class BookingSerializer(serializers.ModelSerializer):
 class WorkerSerializer(serializers.ModelSerializer):
     my_request_status = serializers.SerializerMethodField()
     passport_img = serializers.SerializerMethodField()
+    passport_thumb = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = [
             'id', 'first_name', 'last_name', 'worker_type', 'location', 
-            'experience', 'expected_salary', 'passport_img', 'is_verified', 
+            'experience', 'expected_salary', 'passport_img', 'passport_thumb', 'is_verified', 
             'status', 'my_request_status', 'phone', 'age', 'is_available', 'current_employer',  'start_date','requirements'
         ]
 
     def get_my_request_status(self, obj):
+        # WorkerViewSet annotates the status onto the queryset, so the directory never queries per worker
+        if hasattr(obj, 'viewer_request_status'):
+            return obj.viewer_request_status
+
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             # Check for any booking between this employer and this worker
@@ -181,16 +222,23 @@ class WorkerSerializer(serializers.ModelSerializer):
             request = self.context.get('request')
             return request.build_absolute_uri(obj.passport_img.url)
         return None
+
+    def get_passport_thumb(self, obj):
+        # 320px WebP for directory cards; the original until the rendition has been generated
+        return absolute_rendition_url(self.context.get('request'), obj, 'passport_img', 'card')
     
 class CategorySerializer(serializers.ModelSerializer):
-    # This will pick up the 'worker_count' we manually set in get_queryset
-    worker_count = serializers.IntegerField(read_only=True)
+    worker_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Category
         fields = ['id', 'name', 'slug', 'icon_emoji', 'description', 'is_active', 'worker_count']
         read_only_fields = ['slug']
 
+    def get_worker_count(self, obj):
+        # Served from cache: one grouped COUNT for all categories, not one query per row
+        return get_category_worker_counts().get(obj.slug, 0)
+
     def create(self, validated_data):
         # Auto-generate slug from name if not provided
         if 'slug' not in validated_data:
@@ -219,6 +267,8 @@ class PlatformSettingsSerializer(serializers.ModelSerializer):
 # to ensure it returns the display name of the worker_type
 class AdminUserDetailSerializer(serializers.ModelSerializer):
     worker_type_display = serializers.CharField(source='get_worker_type_display', read_only=True)
+    passport_thumb = serializers.SerializerMethodField()
+    id_front_thumb = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -228,6 +278,49 @@ class AdminUserDetailSerializer(serializers.ModelSerializer):
             'id_photo_front', 'id_photo_back', 'location', 'age',
             'kin_name', 'kin_phone', 'worker_type', 'worker_type_display', 
             'date_joined', 'passport_img', 'expected_salary', 'salary', 
-            'requirements', 'accommodation'
+            'requirements', 'accommodation', 'passport_thumb', 'id_front_thumb'
         ]
 
+    def get_passport_thumb(self, obj):
+        return absolute_rendition_url(self.context.get('request'), obj, 'passport_img', 'card')
+
+    def get_id_front_thumb(self, obj):
+        return absolute_rendition_url(self.context.get('request'), obj, 'id_photo_front', 'card')
+
+
+class ReviewQueueSerializer(serializers.ModelSerializer):
+    """Row of the verification review queue; the extra fields are annotations from verification.pending_reviews()."""
+    worker_type_display = serializers.CharField(source='get_worker_type_display', read_only=True)
+    passport_thumb = serializers.SerializerMethodField()
+    documents = serializers.SerializerMethodField()
+    documents_complete = serializers.BooleanField(read_only=True)
+    latest_review = serializers.JSONField(read_only=True)
+
+    class Meta:
+        model = User
+        fields = [
+            'id', 'first_name', 'last_name', 'phone', 'id_number', 'worker_type', 'worker_type_display',
+            'location', 'date_joined', 'passport_thumb', 'documents', 'documents_complete', 'latest_review',
+        ]
+
+    def get_passport_thumb(self, obj):
+        return absolute_rendition_url(self.context.get('request'), obj, 'passport_img', 'thumb')
+
+    def get_documents(self, obj):
+        return {'id_front': obj.has_id_front, 'id_back': obj.has_id_back, 'passport': obj.has_passport}
+
+
+class PossibleDuplicateSerializer(serializers.Serializer):
+    """One entry of fingerprints.possible_duplicates(): another account with a near-identical ID photo."""
+    user_id = serializers.IntegerField(source='user.pk')
+    username = serializers.CharField(source='user.username')
+    full_name = serializers.SerializerMethodField()
+    role = serializers.CharField(source='user.role')
+    status = serializers.CharField(source='user.status')
+    is_deleted = serializers.BooleanField(source='user.is_deleted')
+    field = serializers.CharField()
+    matched_field = serializers.CharField()
+    distance = serializers.IntegerField()
+
+    def get_full_name(self, obj):
+        return f"{obj['user'].first_name} {obj['user'].last_name}".strip()
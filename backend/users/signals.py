@@ -0,0 +1,136 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .caching import (
+    DIRECTORY_FIELDS, bump_versions, invalidate_cached_users, invalidate_category_worker_counts,
+    invalidate_directory, invalidate_platform_settings, invalidate_token,
+)
+from . import counters
+from .events import CREATED, DELETED, UPDATED, booking_row, publish_booking_events, publish_session_revoked
+from .fingerprints import HASHED_FIELDS, forget_fingerprints, schedule_fingerprints
+from .renditions import IMAGE_FIELDS, schedule_renditions
+from .sync import record_deletion
+from .models import Booking, Category, PlatformSetting, User, VerificationLog
+
+
+def run_now_and_on_commit(func, *args):
+    # Clearing again after commit stops a concurrent request from re-caching the pre-commit row
+    func(*args)
+    transaction.on_commit(lambda: func(*args))
+
+
+@receiver([post_save, post_delete], sender=PlatformSetting)
+def platform_settings_changed(sender, **kwargs):
+    # Covers PlatformSettingsView.post and the Django admin. Wait for the commit so
+    # other processes can't reload the old row under the new version.
+    transaction.on_commit(invalidate_platform_settings)
+    run_now_and_on_commit(bump_versions, ['platform-settings'])
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_changed(sender, **kwargs):
+    run_now_and_on_commit(bump_versions, ['categories'])
+
+
+@receiver([post_save, post_delete], sender=Booking)
+def booking_changed(sender, instance, **kwargs):
+    # Set-based transitions bump the same stamps in users/bookings.py
+    run_now_and_on_commit(bump_versions, [f'employer-bookings:{instance.employer_id}'])
+
+
+@receiver(post_save, sender=Booking)
+def push_booking_saved(sender, instance, created, raw=False, **kwargs):
+    # hire and force_action; set-based transitions publish from users/bookings.py
+    if raw:
+        return
+    if created:
+        publish_booking_events(CREATED, [booking_row(instance)])
+    elif 'status' in instance.changed_tracked_fields():
+        publish_booking_events(UPDATED, [booking_row(instance)])
+
+
+@receiver(post_delete, sender=Booking)
+def push_booking_deleted(sender, instance, **kwargs):
+    publish_booking_events(DELETED, [booking_row(instance)])
+
+
+@receiver(post_delete, sender=Booking)
+def leave_tombstone(sender, instance, **kwargs):
+    # withdraw_request, remove_history and cascades: delta syncs report the id as deleted
+    record_deletion(instance)
+
+
+@receiver(post_save, sender=VerificationLog)
+def verification_logged(sender, instance, **kwargs):
+    # The worker's profile_status shows the latest review
+    run_now_and_on_commit(bump_versions, [f'user:{instance.worker_id}'])
+
+
+@receiver([post_save, post_delete], sender=Token)
+def token_changed(sender, instance, **kwargs):
+    # rotate_token, logout, password reset, soft delete and trash all delete tokens
+    run_now_and_on_commit(invalidate_token, instance.key)
+
+
+@receiver(post_delete, sender=Token)
+def close_token_sockets(sender, instance, **kwargs):
+    # Open notification sockets authenticated with the token close too (users/consumers.py)
+    publish_session_revoked(instance.user_id, instance.key)
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    run_now_and_on_commit(invalidate_cached_users, [instance.pk])
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    changed = instance.changed_tracked_fields()
+    if changed & {'role', 'worker_type', 'is_deleted'}:
+        run_now_and_on_commit(invalidate_category_worker_counts)
+    if (instance.role == 'worker' or 'role' in changed) and changed & DIRECTORY_FIELDS:
+        run_now_and_on_commit(invalidate_directory)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    if instance.role == 'worker':
+        run_now_and_on_commit(invalidate_category_worker_counts)
+        run_now_and_on_commit(invalidate_directory)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Booking)
+def update_counters_on_save(sender, instance, created, raw=False, **kwargs):
+    if not raw and (created or instance.changed_tracked_fields()):
+        counters.record_save(instance, created)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Booking)
+def update_counters_on_delete(sender, instance, **kwargs):
+    counters.record_delete(instance)
+
+
+@receiver(post_save, sender=User)
+def render_uploaded_images(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    fields = [f for f in instance.changed_tracked_fields() & set(IMAGE_FIELDS) if getattr(instance, f)]
+    if fields:
+        schedule_renditions(instance.pk, fields)
+
+
+@receiver(post_save, sender=User)
+def fingerprint_uploaded_images(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    changed = instance.changed_tracked_fields() & set(HASHED_FIELDS)
+    uploaded = [f for f in changed if getattr(instance, f)]
+    cleared = [f for f in changed if not getattr(instance, f)]
+    if uploaded:
+        schedule_fingerprints(instance.pk, uploaded)
+    if cleared:
+        forget_fingerprints(instance.pk, cleared)
@@ -0,0 +1,151 @@
+"""
+Delta sync for the booking lists (`?since=`).
+
+Passing `since` turns the invite, employer history and admin registry
+endpoints into change feeds. Instead of the whole list they return the rows
+created or changed after the cursor, oldest first, plus the ids of bookings
+deleted since then:
+
+    {"changes": [...], "deleted": [12, 15], "since": "<cursor>", "has_more": false}
+
+Call again with the returned cursor while `has_more` is true, then keep it
+for the next refresh. Full responses carry a starting cursor in the
+X-Sync-Since header, and `since` also takes a plain ISO date or datetime.
+
+Rows are stamped when written but only become visible when their transaction
+commits, so the cursor that ends a sync is set BOOKING_SYNC_LAG seconds back:
+a slow commit is picked up by the next sync instead of being skipped. Clients
+apply rows by id, so the few sent twice do no harm.
+
+On a filtered list (e.g. history `?status=`) a row that changed so it no
+longer matches is listed under "deleted", since the client should drop it.
+
+A page covers a window of time: its changed rows and the deletions up to
+where it ends, so each tombstone is sent once. At most `page_size`
+tombstones go out per page; a burst of deletions ends the page early.
+
+Tombstones are kept for BOOKING_TOMBSTONE_RETENTION_DAYS (`manage.py
+prune_tombstones` removes older ones). A `since` from before that window
+can't be answered reliably, so it gets 410 Gone with `"reset": true`, and
+the client reloads the full list.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .models import BookingTombstone
+
+SYNC_HEADER = 'X-Sync-Since'
+
+
+def encode_cursor(updated_at, pk=0):
+    return base64.urlsafe_b64encode(json.dumps([updated_at.isoformat(), pk]).encode()).decode()
+
+
+def decode_cursor(value):
+    """Returns the (updated_at, id) position for a cursor or an ISO date/datetime."""
+    pk = 0
+    try:
+        moment = parse_datetime(value)
+        if moment is None and parse_date(value):
+            moment = datetime.combine(parse_date(value), time.min)
+        if moment is None:
+            stamp, pk = json.loads(base64.urlsafe_b64decode(value.encode()))
+            moment = parse_datetime(stamp)
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError):
+        moment = None
+    if moment is None or not isinstance(pk, int):
+        raise ValidationError({'since': 'Invalid cursor.'})
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment, pk
+
+
+def start_cursor():
+    """Cursor a client should sync from after loading the full list now."""
+    return encode_cursor(timezone.now() - timedelta(seconds=settings.BOOKING_SYNC_LAG))
+
+
+def with_start_cursor(response, cursor):
+    response[SYNC_HEADER] = cursor
+    return response
+
+
+def retention_cutoff():
+    """Oldest moment tombstones are still kept for."""
+    return timezone.now() - timedelta(days=settings.BOOKING_TOMBSTONE_RETENTION_DAYS)
+
+
+def prune_tombstones():
+    """Deletes tombstones older than the retention window. Returns how many were removed."""
+    deleted, _ = BookingTombstone.objects.filter(deleted_at__lt=retention_cutoff()).delete()
+    return deleted
+
+
+def _position(row):
+    if isinstance(row, dict):
+        return row['updated_at'], row['id']
+    return row.updated_at, row.pk
+
+
+def changes_since(queryset, tombstones, since, page_size, serialize=list, matching=None):
+    """
+    Delta response for `queryset` (bookings visible to the caller, model
+    instances or values() dicts) and `tombstones` (BookingTombstone rows for
+    the same caller). `serialize` turns a page of rows into response data.
+
+    `matching` is the list's filter as a Q object. It is applied after
+    finding the changed rows, not to `queryset`: changed rows that fail it
+    are reported as deleted instead of silently left out.
+    """
+    sync_from = start_cursor()
+    moment, pk = decode_cursor(since)
+    if moment < retention_cutoff():
+        return Response(
+            {'detail': 'This sync cursor is too old, reload the full list.', 'reset': True},
+            status=status.HTTP_410_GONE,
+        )
+    rows = list(
+        queryset.filter(Q(updated_at__gt=moment) | Q(updated_at=moment, id__gt=pk))
+        .order_by('updated_at', 'id')[:page_size + 1]
+    )
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    end = _position(rows[-1]) if has_more else None
+
+    # Deletions inside the page's window only; the next page starts after it
+    window = tombstones.filter(deleted_at__gt=moment).order_by('deleted_at', 'id')
+    if end:
+        window = window.filter(deleted_at__lte=end[0])
+    stamps = list(window.values_list('deleted_at', flat=True)[:page_size + 1])
+    if len(stamps) > page_size:
+        # Too many deletions: end the page at the last one that fits (with any
+        # tombstone or row stamped the same moment, so none straddles two pages)
+        until = stamps[page_size - 1]
+        window = window.filter(deleted_at__lte=until)
+        rows = [row for row in rows if _position(row)[0] <= until]
+        last = _position(rows[-1]) if rows else None
+        end = last if last and last[0] == until else (until, 0)
+        has_more = True
+    deleted = list(window.values_list('booking_id', flat=True))
+    cursor = encode_cursor(*end) if has_more else sync_from
+
+    if matching is not None and rows:
+        ids = [_position(row)[1] for row in rows]
+        kept = set(queryset.filter(matching, id__in=ids).values_list('id', flat=True))
+        deleted += [pk for pk in ids if pk not in kept]
+        rows = [row for row in rows if _position(row)[1] in kept]
+    return Response({'changes': serialize(rows), 'deleted': deleted, 'since': cursor, 'has_more': has_more})
+
+
+def record_deletion(booking):
+    BookingTombstone.objects.create(booking_id=booking.pk, employer_id=booking.employer_id, worker_id=booking.worker_id)
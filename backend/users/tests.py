@@ -1,3 +1,1800 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import json
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+from urllib.parse import urlparse
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from django.urls import reverse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APITestCase
+
+from rest_framework.authtoken.models import Token
+from PIL import Image
+
+from . import benchmarking, bookings, caching, counters, exports, fingerprints, metrics, renditions, verification
+from .authentication import ExpiringTokenAuthentication
+from .events import booking_message, session_id, user_group
+from .models import (
+    User, Booking, BookingTombstone, Category, ImageFingerprint, PlatformCounter, PlatformSetting, EmailOutbox, VerificationLog,
+)
+from .outbox import claim_due_emails, enqueue_email, send_due_emails
+from .utils import parse_salary
+from .views.auth import rotate_token
+
+
+def make_user(role, n, **extra):
+    extra.setdefault('first_name', f"{role.title()}{n}")
+    return User.objects.create_user(
+        username=f"{role}{n}@example.com",
+        email=f"{role}{n}@example.com",
+        phone=f"07{role[0]}{n:07d}",
+        password="pass1234",
+        role=role,
+        **extra
+    )
+
+
+def next_link(response):
+    match = re.search(r'<([^>]+)>; rel="next"', response.get('Link', ''))
+    return match.group(1) if match else None
+
+
+class WorkerDirectoryQueryTests(APITestCase):
+    def setUp(self):
+        self.employer = make_user('employer', 1)
+        self.client.force_authenticate(self.employer)
+        self.url = reverse('workers-directory-list')
+        self.created = 0
+
+    def add_workers(self, count, with_booking=True):
+        for _ in range(count):
+            self.created += 1
+            worker = make_user('worker', self.created)
+            if with_booking:
+                Booking.objects.create(employer=self.employer, worker=worker, status='pending')
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx), response.data
+
+    def test_query_count_is_constant_as_directory_grows(self):
+        self.add_workers(2)
+        small_count, small_data = self.count_list_queries()
+
+        self.add_workers(15)
+        large_count, large_data = self.count_list_queries()
+
+        self.assertEqual(len(small_data), 2)
+        self.assertEqual(len(large_data), 17)
+        self.assertEqual(small_count, large_count)
+
+    def test_my_request_status_reflects_latest_booking(self):
+        self.add_workers(1, with_booking=False)
+        worker = User.objects.get(role='worker')
+        Booking.objects.create(employer=self.employer, worker=worker, status='declined')
+        Booking.objects.create(employer=self.employer, worker=worker, status='pending')
+        other = make_user('employer', 2)
+        Booking.objects.create(employer=other, worker=worker, status='accepted')
+
+        _, data = self.count_list_queries()
+        self.assertEqual(data[0]['my_request_status'], 'pending')
+
+    def test_my_request_status_is_none_without_booking(self):
+        self.add_workers(1, with_booking=False)
+        _, data = self.count_list_queries()
+        self.assertIsNone(data[0]['my_request_status'])
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.employer = make_user('employer', 1)
+        self.client.force_authenticate(self.employer)
+        self.workers = [make_user('worker', n) for n in range(1, 8)]
+
+    def collect(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.data)
+            url = next_link(response)
+        return ids
+
+    def test_walks_every_worker_once_in_stable_order(self):
+        ids = self.collect(reverse('workers-directory-list') + '?page_size=3')
+        expected = [w.id for w in sorted(self.workers, key=lambda w: (w.date_joined, w.id), reverse=True)]
+        self.assertEqual(ids, expected)
+
+    def test_ties_on_timestamp_are_broken_by_id(self):
+        User.objects.filter(role='worker').update(date_joined=timezone.now())
+        ids = self.collect(reverse('workers-directory-list') + '?page_size=2')
+        self.assertEqual(ids, sorted((w.id for w in self.workers), reverse=True))
+
+    @override_settings(API_MAX_PAGE_SIZE=4)
+    def test_page_size_is_capped(self):
+        response = self.client.get(reverse('workers-directory-list') + '?page_size=500')
+        self.assertEqual(len(response.data), 4)
+        self.assertIsNotNone(next_link(response))
+
+    def test_last_page_has_no_next_link(self):
+        response = self.client.get(reverse('workers-directory-list') + '?page_size=50')
+        self.assertEqual(len(response.data), 7)
+        self.assertIsNone(next_link(response))
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse('workers-directory-list') + '?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_with_unparseable_values_is_rejected(self):
+        cursor = base64.urlsafe_b64encode(json.dumps(['yesterday', 'x']).encode()).decode()
+        response = self.client.get(reverse('workers-directory-list'), {'cursor': cursor})
+        self.assertEqual(response.status_code, 404)
+
+    def test_job_invites_are_paginated(self):
+        worker = self.workers[0]
+        for n in range(2, 7):
+            Booking.objects.create(employer=make_user('employer', n), worker=worker)
+        self.client.force_authenticate(worker)
+        ids = self.collect(reverse('worker-requests-job-invites') + '?page_size=2')
+        self.assertEqual(ids, list(Booking.objects.filter(worker=worker).order_by('-created_at', '-id').values_list('id', flat=True)))
+
+
+class SalaryFilterTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(make_user('employer', 1))
+        for n, salary in enumerate([8000, 9000, 12000, 15000, 30000], start=1):
+            make_user('worker', n, expected_salary=salary)
+
+    def salaries(self, query):
+        response = self.client.get(reverse('workers-directory-list') + query)
+        return sorted(row['expected_salary'] for row in response.data)
+
+    def test_range_compares_numerically(self):
+        self.assertEqual(self.salaries('?min_salary=9000&max_salary=15000'), [9000, 12000, 15000])
+
+    def test_unparseable_bounds_are_ignored(self):
+        self.assertEqual(len(self.salaries('?min_salary=abc')), 5)
+
+    def test_parse_salary(self):
+        self.assertEqual(parse_salary('Ksh 15,000'), 15000)
+        self.assertEqual(parse_salary('15000.50'), 15000)
+        self.assertEqual(parse_salary(12000), 12000)
+        self.assertIsNone(parse_salary(''))
+        self.assertIsNone(parse_salary('negotiable'))
+
+
+class DirectorySearchTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(make_user('employer', 1))
+        make_user('worker', 1, first_name='Mary', last_name='Wanjiku', location='Nairobi West')
+        make_user('worker', 2, first_name='Rosemary', last_name='Achieng', location='Kisumu')
+        make_user('worker', 3, first_name='Jane', last_name='Maryanne', location='Nairobi')
+        make_user('worker', 4, first_name='Peter', last_name='Otieno', location='Mombasa')
+
+    def names(self, query):
+        response = self.client.get(reverse('workers-directory-list') + query)
+        self.assertEqual(response.status_code, 200)
+        return [row['first_name'] for row in response.data]
+
+    def test_exact_and_prefix_matches_rank_first(self):
+        self.assertEqual(self.names('?search=mary'), ['Mary', 'Jane', 'Rosemary'])
+
+    def test_every_search_word_must_match(self):
+        self.assertEqual(self.names('?search=mary wanjiku'), ['Mary'])
+
+    def test_location_filter_ranks_exact_location_first(self):
+        self.assertEqual(self.names('?location=nairobi'), ['Jane', 'Mary'])
+
+    def test_ranked_results_paginate_without_gaps(self):
+        first = self.client.get(reverse('workers-directory-list') + '?search=mary&page_size=2')
+        second = self.client.get(next_link(first))
+        names = [row['first_name'] for row in first.data + second.data]
+        self.assertEqual(names, ['Mary', 'Jane', 'Rosemary'])
+
+
+class DirectoryCacheTests(APITestCase):
+    def setUp(self):
+        self.employer = make_user('employer', 1)
+        self.client.force_authenticate(self.employer)
+        self.url = reverse('workers-directory-list')
+        self.workers = [make_user('worker', n, last_name='Wanjiku', location='Nairobi') for n in range(1, 4)]
+
+    def ids(self, query=''):
+        response = self.client.get(self.url + query)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data]
+
+    def test_repeat_searches_skip_the_filter_query(self):
+        first = self.ids('?search=Wanjiku&location=Nairobi')
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.ids('?search=%20wanjiku&location=nairobi%20&worker_type=all')
+        self.assertEqual(first, second)
+        self.assertEqual(len(ctx), 1)
+        self.assertNotIn('LIKE', ctx.captured_queries[0]['sql'].upper())
+
+    def test_request_status_and_next_link_stay_per_viewer(self):
+        Booking.objects.create(employer=self.employer, worker=self.workers[2])
+        self.client.get(self.url + '?page_size=2')
+
+        other = make_user('employer', 2)
+        Booking.objects.create(employer=other, worker=self.workers[1], status='declined')
+        self.client.force_authenticate(other)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url + '?page_size=2')
+        self.assertEqual(len(ctx), 1)
+        self.assertEqual([row['my_request_status'] for row in response.data], [None, 'declined'])
+        self.assertEqual([row['id'] for row in self.client.get(next_link(response)).data], [self.workers[0].pk])
+
+    def test_directory_changes_retire_cached_pages(self):
+        self.ids()
+        self.workers[0].expected_salary = 25000
+        self.workers[0].save()
+        self.assertEqual(self.ids('?min_salary=20000'), [self.workers[0].pk])
+
+        booking = Booking.objects.create(employer=self.employer, worker=self.workers[2])
+        bookings.accept(booking.pk, self.workers[2])
+        self.assertNotIn(self.workers[2].pk, self.ids())
+
+        self.client.force_authenticate(make_user('admin', 1, is_staff=True))
+        self.client.post(reverse('admin-users-bulk-trash'), {'ids': [self.workers[1].pk]}, format='json')
+        self.client.force_authenticate(self.employer)
+        self.assertEqual(self.ids(), [self.workers[0].pk])
+
+    @override_settings(API_MAX_PAGE_SIZE=2)
+    def test_only_bounded_pages_are_cached(self):
+        first = self.ids('?page_size=500')
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.ids('?page_size=500'), first)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(ctx), 1)
+
+        key = caching.directory_page_key({'unbounded': True})
+        caching.cache_directory_page(key, [w.pk for w in self.workers], None, 500)
+        self.assertIsNone(cache.get(key))
+
+    def test_unrelated_saves_keep_cached_pages(self):
+        self.ids()
+        generation = cache.get(caching.DIRECTORY_GENERATION_KEY)
+        worker = User.objects.get(pk=self.workers[0].pk)
+        worker.age = '29'
+        worker.save()
+        self.assertEqual(cache.get(caching.DIRECTORY_GENERATION_KEY), generation)
+
+
+class PlatformSettingsCacheTests(APITestCase):
+    def setUp(self):
+        caching.invalidate_platform_settings()
+        self.addCleanup(caching.invalidate_platform_settings)
+        self.settings_row = PlatformSetting.objects.create(broadcast_message='hello')
+
+    def test_repeat_reads_skip_the_database(self):
+        caching.get_platform_settings()
+        with self.assertNumQueries(0):
+            self.assertEqual(caching.get_platform_settings().broadcast_message, 'hello')
+
+    def test_saving_the_row_invalidates(self):
+        caching.get_platform_settings()
+        self.settings_row.broadcast_message = 'updated'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.settings_row.save()
+        self.assertEqual(caching.get_platform_settings().broadcast_message, 'updated')
+
+    @override_settings(PLATFORM_SETTINGS_CACHE_TTL=0)
+    def test_other_processes_are_picked_up_through_the_shared_version(self):
+        caching.get_platform_settings()
+        # Expired local copy, unchanged shared version: no reload
+        with self.assertNumQueries(0):
+            caching.get_platform_settings()
+
+        # Another process saved the row and bumped the shared version
+        PlatformSetting.objects.filter(pk=self.settings_row.pk).update(broadcast_message='from elsewhere')
+        cache.set(caching.PLATFORM_SETTINGS_VERSION_KEY, 'other-process')
+        with self.assertNumQueries(1):
+            self.assertEqual(caching.get_platform_settings().broadcast_message, 'from elsewhere')
+
+    def test_maintenance_mode_blocks_api_requests(self):
+        self.client.force_authenticate(make_user('employer', 1))
+        self.settings_row.maintenance_mode = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.settings_row.save()
+        response = self.client.get(reverse('workers-directory-list'))
+        self.assertEqual(response.status_code, 503)
+
+    def test_settings_endpoint_is_served_from_cache(self):
+        self.client.get(reverse('admin-platform'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('admin-platform'))
+        self.assertEqual(response.data['broadcast_message'], 'hello')
+
+
+class TokenAuthCacheTests(APITestCase):
+    def setUp(self):
+        self.worker = make_user('worker', 1)
+        self.token = rotate_token(self.worker)
+        self.auth = ExpiringTokenAuthentication()
+
+    def authenticate(self, key=None):
+        return self.auth.authenticate_credentials(key or self.token.key)
+
+    def test_warm_token_costs_no_queries(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user, token = self.authenticate()
+        self.assertEqual(user.pk, self.worker.pk)
+        self.assertEqual(token.key, self.token.key)
+
+    def test_cache_holds_only_what_auth_needs(self):
+        self.authenticate()
+        cached = cache.get(caching._user_cache_key(self.worker.pk))
+        self.assertEqual(set(cached), set(caching.AUTH_USER_FIELDS))
+        self.assertNotIn(self.worker.password, repr(cached))
+
+        user, _ = self.authenticate()
+        with self.assertNumQueries(0):
+            self.assertEqual((user.role, user.is_staff, user.is_active), ('worker', False, True))
+        # The rest of the row is read on first use, in one query
+        with self.assertNumQueries(1):
+            self.assertEqual((user.first_name, user.location, user.status), ('Worker1', self.worker.location, 'pending'))
+
+    def test_saving_the_cached_user_keeps_unread_fields(self):
+        User.objects.filter(pk=self.worker.pk).update(location='Kisumu')
+        self.authenticate()
+        user, _ = self.authenticate()
+        user.is_active = True
+        user.save()
+        self.assertEqual(User.objects.get(pk=self.worker.pk).location, 'Kisumu')
+
+    def test_saving_the_cached_user_keeps_counters_in_step(self):
+        counters.reconcile()
+        self.authenticate()
+        user, _ = self.authenticate()
+        self.assertIn('is_deleted', user.get_deferred_fields())
+        user.is_deleted = True
+        user.save()
+        after_save = counters.get_counters()
+        self.assertEqual(after_save['trashed_users'], 1)
+        counters.reconcile()
+        self.assertEqual(counters.get_counters(), after_save)
+
+    def test_each_request_gets_its_own_user_instance(self):
+        first, _ = self.authenticate()
+        first.location = 'changed in memory'
+        second, _ = self.authenticate()
+        self.assertIsNot(first, second)
+        self.assertNotEqual(second.location, 'changed in memory')
+
+    def test_unknown_keys_are_negatively_cached(self):
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate('0' * 40)
+        with self.assertNumQueries(0), self.assertRaises(AuthenticationFailed):
+            self.authenticate('0' * 40)
+
+    def test_rotating_the_token_revokes_the_old_key(self):
+        self.authenticate()
+        new_token = rotate_token(self.worker)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+        self.assertEqual(self.authenticate(new_token.key)[0].pk, self.worker.pk)
+
+    def test_saving_the_user_refreshes_the_cached_row(self):
+        self.authenticate()
+        self.worker.is_active = False
+        self.worker.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_trash_user_revokes_cached_token(self):
+        self.authenticate()
+        admin = make_user('admin', 1, is_staff=True)
+        self.client.force_authenticate(admin)
+        response = self.client.post(reverse('admin-users-trash-user', args=[self.worker.pk]))
+        self.assertEqual(response.status_code, 200)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_password_reset_revokes_cached_token(self):
+        self.authenticate()
+        uid = urlsafe_base64_encode(force_bytes(self.worker.pk))
+        reset_token = default_token_generator.make_token(self.worker)
+        response = self.client.post(f'/api/password-reset-confirm/{uid}/{reset_token}/', {'password': 'n3w-pass'})
+        self.assertEqual(response.status_code, 200)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_soft_delete_revokes_cached_token(self):
+        self.authenticate()
+        self.client.force_authenticate(make_user('admin', 1, is_staff=True))
+        response = self.client.patch(f'/api/{self.worker.pk}/soft-delete/')
+        self.assertEqual(response.status_code, 200)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    @override_settings(TOKEN_EXPIRED_AFTER_SECONDS=60)
+    def test_expired_cached_token_is_rejected_and_deleted(self):
+        self.authenticate()
+        Token.objects.filter(pk=self.token.pk).update(created=timezone.now() - timedelta(minutes=5))
+        caching.invalidate_token(self.token.key)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+        self.assertFalse(Token.objects.filter(pk=self.token.pk).exists())
+
+    def test_api_request_with_warm_token_skips_auth_queries(self):
+        url = reverse('worker-dashboard-profile-status')
+        headers = {'HTTP_AUTHORIZATION': f'Token {self.token.key}'}
+        self.client.get(url, **headers)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in ctx.captured_queries if 'authtoken_token' in q['sql']])
+        # Auth itself reads no user row; the profile fields the view shows are loaded once
+        self.assertEqual(len([q for q in ctx.captured_queries if 'FROM "users_user"' in q['sql']]), 1)
+
+    @override_settings(TOKEN_EXPIRED_AFTER_SECONDS=60)
+    def test_auth_views_reject_expired_tokens(self):
+        Token.objects.filter(pk=self.token.pk).update(created=timezone.now() - timedelta(minutes=5))
+        response = self.client.patch('/api/account/deactivate/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertIn(response.status_code, (401, 403))
+        self.assertTrue(User.objects.get(pk=self.worker.pk).is_active)
+        self.assertFalse(Token.objects.filter(pk=self.token.pk).exists())
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionError("mail API unreachable")
+
+
+class UnreachableEmailBackend(BaseEmailBackend):
+    def open(self):
+        raise ConnectionError("mail API unreachable")
+
+
+class ClaimCheckingEmailBackend(BaseEmailBackend):
+    """Records what another worker could claim while this one is sending."""
+    claimable = None
+
+    def send_messages(self, email_messages):
+        ClaimCheckingEmailBackend.claimable = claim_due_emails(10)
+        return len(email_messages)
+
+
+class CountingEmailBackend(BaseEmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+
+    def send_messages(self, email_messages):
+        mail.outbox.extend(email_messages)
+        return len(email_messages)
+
+
+class EmailOutboxTests(APITestCase):
+    def test_hire_queues_the_email_instead_of_sending_it(self):
+        employer = make_user('employer', 1)
+        worker = make_user('worker', 1)
+        self.client.force_authenticate(employer)
+        response = self.client.post(reverse('workers-directory-hire', args=[worker.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        entry = EmailOutbox.objects.get()
+        self.assertEqual(entry.to, [worker.email])
+        self.assertIn(employer.first_name, entry.html_body)
+
+    def test_password_reset_request_queues_the_email(self):
+        worker = make_user('worker', 1)
+        response = self.client.post('/api/password-reset-request/', {'email': worker.email})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(EmailOutbox.objects.get().to, [worker.email])
+
+    def test_worker_sends_a_batch_over_one_connection(self):
+        for n in range(3):
+            enqueue_email(f"Subject {n}", "Body", [f"to{n}@example.com"], html_body="<p>Body</p>")
+        CountingEmailBackend.opened = 0
+
+        sent, failed = send_due_emails(backend='users.tests.CountingEmailBackend')
+
+        self.assertEqual((sent, failed), (3, 0))
+        self.assertEqual(CountingEmailBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        self.assertFalse(EmailOutbox.objects.exclude(status='sent').exists())
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_failures_back_off_then_give_up(self):
+        entry = enqueue_email("Subject", "Body", ["to@example.com"])
+
+        self.assertEqual(send_due_emails(backend='users.tests.FailingEmailBackend'), (0, 1))
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.attempts), ('pending', 1))
+        self.assertGreater(entry.next_attempt_at, timezone.now())
+        self.assertIn('unreachable', entry.last_error)
+
+        # Not due yet, so the next run leaves it alone
+        self.assertEqual(send_due_emails(backend='users.tests.FailingEmailBackend'), (0, 0))
+
+        EmailOutbox.objects.filter(pk=entry.pk).update(next_attempt_at=timezone.now())
+        send_due_emails(backend='users.tests.FailingEmailBackend')
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.attempts), ('failed', 2))
+
+    def test_a_claimed_batch_is_not_due_while_it_is_sent(self):
+        entry = enqueue_email("Subject", "Body", ["to@example.com"])
+        self.assertEqual(send_due_emails(backend='users.tests.ClaimCheckingEmailBackend'), (1, 0))
+        self.assertEqual(ClaimCheckingEmailBackend.claimable, [])
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.attempts), ('sent', 1))
+
+    def test_unreachable_backend_hands_the_batch_back(self):
+        entry = enqueue_email("Subject", "Body", ["to@example.com"])
+        with self.assertRaises(ConnectionError):
+            send_due_emails(backend='users.tests.UnreachableEmailBackend')
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.attempts), ('pending', 0))
+        self.assertEqual([e.pk for e in claim_due_emails(10)], [entry.pk])
+
+    def test_send_outbox_command_drains_the_queue(self):
+        for n in range(5):
+            enqueue_email(f"Subject {n}", "Body", ["to@example.com"])
+        call_command('send_outbox', once=True, batch_size=2, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 5)
+
+
+class BulkVerificationTests(APITestCase):
+    def setUp(self):
+        counters.reconcile()
+        self.admin = make_user('admin', 1, is_staff=True)
+        self.client.force_authenticate(self.admin)
+
+    def make_workers(self, start, count):
+        return [make_user('worker', n, status='pending').pk for n in range(start, start + count)]
+
+    def post_ids(self, name, ids, **data):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse(f'admin-users-{name}'), {'ids': ids, **data}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response, len(queries)
+
+    def test_bulk_approve_cost_does_not_grow_with_the_batch(self):
+        _, small = self.post_ids('bulk-approve', self.make_workers(1, 2))
+        response, large = self.post_ids('bulk-approve', self.make_workers(10, 20))
+
+        self.assertEqual(small, large)
+        self.assertEqual(response.data['updated'], 20)
+        self.assertEqual(User.objects.filter(role='worker', status='approved', is_verified=True).count(), 22)
+        self.assertEqual(VerificationLog.objects.filter(action='approved', admin=self.admin).count(), 22)
+        self.assertEqual(EmailOutbox.objects.count(), 22)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_bulk_reject_logs_reasons_and_queues_them(self):
+        ids = self.make_workers(1, 3)
+        response, _ = self.post_ids('bulk-reject', ids, reasons=['Blurry ID'], comment='Retake it')
+
+        self.assertEqual(response.data['updated'], 3)
+        self.assertFalse(User.objects.filter(pk__in=ids).exclude(status='rejected').exists())
+        self.assertEqual(VerificationLog.objects.get(worker_id=ids[0]).rejection_reasons, ['Blurry ID'])
+        self.assertIn('Blurry ID', EmailOutbox.objects.filter(to=['worker1@example.com']).get().body)
+
+    def test_bulk_trash_revokes_tokens_but_spares_the_admin(self):
+        ids = self.make_workers(1, 2)
+        token = rotate_token(User.objects.get(pk=ids[0]))
+        ExpiringTokenAuthentication().authenticate_credentials(token.key)
+
+        response, _ = self.post_ids('bulk-trash', ids + [self.admin.pk])
+
+        self.assertEqual(response.data['updated'], 2)
+        self.assertFalse(Token.objects.filter(user_id__in=ids).exists())
+        self.assertFalse(User.objects.get(pk=self.admin.pk).is_deleted)
+        with self.assertRaises(AuthenticationFailed):
+            ExpiringTokenAuthentication().authenticate_credentials(token.key)
+
+    def test_bulk_review_skips_non_workers_and_trashed_users(self):
+        ids = self.make_workers(1, 2)
+        trashed = make_user('worker', 3, status='pending', is_deleted=True)
+        employer = make_user('employer', 1)
+        response, _ = self.post_ids('bulk-approve', ids + [trashed.pk, employer.pk, self.admin.pk])
+
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(response.data['skipped'], sorted([trashed.pk, employer.pk, self.admin.pk]))
+        self.assertEqual(User.objects.get(pk=trashed.pk).status, 'pending')
+        self.assertFalse(VerificationLog.objects.filter(worker__in=[trashed, employer, self.admin]).exists())
+
+    def test_bulk_actions_validate_the_ids(self):
+        response = self.client.post(reverse('admin-users-bulk-approve'), {'ids': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ReviewQueueTests(APITestCase):
+    def setUp(self):
+        self.admin = make_user('admin', 1, is_staff=True)
+        now = timezone.now()
+        self.waiting = [
+            make_user('worker', n, status='pending', id_photo_front='identity/front/a.jpg', passport_img='identity/passport/a.jpg')
+            for n in range(1, 5)
+        ]
+        self.waiting[1].id_photo_back = 'identity/back/a.jpg'
+        self.waiting[1].save()
+        for days, worker in zip((3, 5, 1, 4), self.waiting):
+            User.objects.filter(pk=worker.pk).update(date_joined=now - timedelta(days=days))
+        make_user('worker', 5, status='approved')
+        make_user('worker', 6, status='pending', is_deleted=True)
+        make_user('employer', 1, status='pending')
+
+        # Rejected once, then again after re-uploading: the newest entry wins
+        first = VerificationLog.objects.create(worker=self.waiting[1], admin=self.admin, action='rejected', comment='Blurry')
+        VerificationLog.objects.filter(pk=first.pk).update(created_at=now - timedelta(days=2))
+        VerificationLog.objects.create(worker=self.waiting[1], admin=self.admin, action='rejected', comment='Expired ID')
+        self.client.force_authenticate(self.admin)
+
+    def test_pending_workers_oldest_first_with_latest_review(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin-users-review-queue'))
+        self.assertEqual(len(queries), 1)
+        self.assertEqual([row['id'] for row in response.data], [self.waiting[i].pk for i in (1, 3, 0, 2)])
+
+        oldest = response.data[0]
+        self.assertEqual(oldest['latest_review'], {'action': 'rejected', 'comment': 'Expired ID'})
+        self.assertEqual(oldest['documents'], {'id_front': True, 'id_back': True, 'passport': True})
+        self.assertTrue(oldest['documents_complete'])
+        self.assertIsNone(response.data[1]['latest_review'])
+        self.assertEqual(response.data[1]['documents'], {'id_front': True, 'id_back': False, 'passport': True})
+        self.assertFalse(response.data[1]['documents_complete'])
+
+    def test_queue_pages_by_keyset(self):
+        response = self.client.get(reverse('admin-users-review-queue'), {'page_size': 3})
+        self.assertEqual(len(response.data), 3)
+        rest = self.client.get(next_link(response))
+        self.assertEqual([row['id'] for row in rest.data], [self.waiting[2].pk])
+        self.assertIsNone(next_link(rest))
+
+    def test_queue_is_admin_only(self):
+        self.client.force_authenticate(self.waiting[0])
+        self.assertEqual(self.client.get(reverse('admin-users-review-queue')).status_code, 403)
+
+
+class CategoryWorkerCountTests(APITestCase):
+    def setUp(self):
+        caching.invalidate_category_worker_counts()
+        self.addCleanup(caching.invalidate_category_worker_counts)
+        for slug in ('nanny', 'cook', 'gardener'):
+            Category.objects.create(name=slug.title(), slug=slug)
+        self.nanny = make_user('worker', 1, worker_type='nanny')
+        make_user('worker', 2, worker_type='nanny')
+        make_user('worker', 3, worker_type='cook')
+        make_user('worker', 4, worker_type='cook', is_deleted=True)
+
+    def public_counts(self):
+        response = self.client.get(reverse('admin-categories-public-list'))
+        return {row['slug']: row['worker_count'] for row in response.data}
+
+    def test_counts_come_from_one_grouped_query_then_cache(self):
+        self.client.force_authenticate(make_user('admin', 1, is_staff=True))
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('admin-categories-list'))
+        self.assertEqual({row['slug']: row['worker_count'] for row in response.data}, {'nanny': 2, 'cook': 1, 'gardener': 0})
+
+        # Warm: only the category rows themselves, however many categories there are
+        Category.objects.create(name='Elderly', slug='elderly')
+        with self.assertNumQueries(1):
+            self.client.get(reverse('admin-categories-list'))
+
+    def test_public_list_exposes_counts(self):
+        self.assertEqual(self.public_counts(), {'nanny': 2, 'cook': 1, 'gardener': 0})
+        with self.assertNumQueries(1):
+            self.public_counts()
+
+    def test_changing_worker_type_invalidates(self):
+        self.public_counts()
+        self.nanny.worker_type = 'gardener'
+        self.nanny.save()
+        self.assertEqual(self.public_counts(), {'nanny': 1, 'cook': 1, 'gardener': 1})
+
+    def test_unrelated_saves_keep_the_cache(self):
+        self.public_counts()
+        nanny = User.objects.get(pk=self.nanny.pk)
+        nanny.age = '31'
+        self.assertEqual(nanny.changed_tracked_fields(), set())
+        nanny.save()
+        with self.assertNumQueries(1):
+            self.public_counts()
+
+    def test_bulk_trash_invalidates(self):
+        self.public_counts()
+        self.client.force_authenticate(make_user('admin', 1, is_staff=True))
+        self.client.post(reverse('admin-users-bulk-trash'), {'ids': [self.nanny.pk]}, format='json')
+        self.assertEqual(self.public_counts()['nanny'], 1)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.admin = make_user('admin', 1, is_staff=True)
+        self.worker = make_user('worker', 1, worker_type='nanny')
+        self.employer = make_user('employer', 1)
+
+    def get(self, url, user=None, etag=None):
+        client = self.client_class()
+        if user:
+            client.force_authenticate(user)
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return client.get(url, **headers)
+
+    def assert_revalidates(self, url, user=None):
+        """Returns the current ETag after checking an unchanged resource is a 304 without SQL."""
+        response = self.get(url, user)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(url, user, response['ETag']).status_code, 304)
+        return response['ETag']
+
+    def test_categories_change_with_rows_and_worker_counts(self):
+        url = reverse('admin-categories-public-list')
+        etag = self.assert_revalidates(url)
+        Category.objects.create(name='Nanny', slug='nanny')
+        self.assertEqual(self.get(url, etag=etag).status_code, 200)
+
+        etag = self.assert_revalidates(url)
+        make_user('worker', 2, worker_type='nanny')
+        self.assertEqual(self.get(url, etag=etag).data[0]['worker_count'], 2)
+
+    def test_platform_settings_change_on_save(self):
+        url = reverse('admin-platform')
+        etag = self.assert_revalidates(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            PlatformSetting.objects.create(broadcast_message='Back soon')
+        self.assertEqual(self.get(url, etag=etag).data['broadcast_message'], 'Back soon')
+
+    def test_profile_status_changes_on_review(self):
+        url = reverse('worker-dashboard-profile-status')
+        etag = self.assert_revalidates(url, self.worker)
+
+        self.client.force_authenticate(self.admin)
+        self.client.post(reverse('admin-users-bulk-approve'), {'ids': [self.worker.pk]}, format='json')
+        response = self.get(url, User.objects.get(pk=self.worker.pk), etag)
+        self.assertEqual((response.status_code, response.data['status']), (200, 'approved'))
+
+        # Another user's tag never matches
+        self.assertEqual(self.get(url, make_user('worker', 2), response['ETag']).status_code, 200)
+
+    def test_profile_status_tag_rolls_over_with_signed_urls(self):
+        url = reverse('worker-dashboard-profile-status')
+        now = time.time()
+        with mock.patch('users.media.time.time', return_value=now):
+            etag = self.assert_revalidates(url, self.worker)
+        # No write happened, but the signed document URLs in the body have moved on
+        later = now + settings.PROTECTED_MEDIA_URL_TTL
+        with mock.patch('users.media.time.time', return_value=later):
+            self.assertEqual(self.get(url, self.worker, etag).status_code, 200)
+
+    def test_employer_stats_change_with_bookings(self):
+        url = reverse('employer-dash-stats')
+        etag = self.assert_revalidates(url, self.employer)
+        booking = Booking.objects.create(employer=self.employer, worker=self.worker)
+        self.assertEqual(self.get(url, self.employer, etag).data['total_sent'], 1)
+
+        etag = self.assert_revalidates(url, self.employer)
+        bookings.accept(booking.pk, self.worker)
+        self.assertEqual(self.get(url, self.employer, etag).data['accepted'], 1)
+
+
+class PlatformCounterTests(APITestCase):
+    def setUp(self):
+        self.admin = make_user('admin', 1, is_staff=True)
+        self.client.force_authenticate(self.admin)
+
+    def assert_counters_match_tables(self):
+        stored = counters.get_counters()
+        self.assertEqual(stored, {**stored, **counters._recount(counters.COUNTER_NAMES)})
+
+    def test_saves_bulk_updates_and_deletes_keep_counters_exact(self):
+        workers = [make_user('worker', n) for n in range(1, 5)]
+        employers = [make_user('employer', n, is_verified=True) for n in range(1, 3)]
+        self.assert_counters_match_tables()
+
+        self.client.post(reverse('admin-users-bulk-approve'), {'ids': [w.pk for w in workers[:3]]}, format='json')
+        self.client.post(reverse('admin-users-reject-worker', args=[workers[3].pk]), {'reasons': ['x']}, format='json')
+        for employer in employers:
+            Booking.objects.create(employer=employer, worker=workers[0])
+        self.assert_counters_match_tables()
+
+        # Accepting one invite auto-declines the other with a queryset UPDATE
+        booking = Booking.objects.filter(worker=workers[0]).first()
+        self.client.force_authenticate(workers[0])
+        self.client.post(reverse('worker-requests-respond-to-request', args=[booking.pk]), {'status': 'accepted'})
+        self.assertEqual(counters.get_counters()['active_hires'], 1)
+        self.assert_counters_match_tables()
+
+        self.client.force_authenticate(self.admin)
+        self.client.post(reverse('admin-users-bulk-trash'), {'ids': [workers[1].pk]}, format='json')
+        employers[1].delete()
+        self.assert_counters_match_tables()
+
+    def test_stats_is_a_single_query(self):
+        for n in range(1, 4):
+            make_user('worker', n)
+        counters.get_counters()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('admin-users-stats'))
+        self.assertEqual(response.data['workers'], 3)
+        self.assertEqual(response.data['total_users'], 4)
+
+    def test_writes_spread_over_shards_and_reads_sum_them(self):
+        counters.reconcile()
+        for n, shard in enumerate((1, 3, 3), start=1):
+            with mock.patch('users.counters.random.randrange', return_value=shard):
+                make_user('worker', n)
+        shards = dict(PlatformCounter.objects.filter(name='workers').values_list('shard', 'value'))
+        self.assertEqual(len(shards), settings.PLATFORM_COUNTER_SHARDS)
+        self.assertEqual((shards[0], shards[1], shards[3]), (0, 1, 2))
+        self.assertEqual(counters.get_counters()['workers'], 3)
+
+        counters.reconcile(['workers'])
+        shards = dict(PlatformCounter.objects.filter(name='workers').values_list('shard', 'value'))
+        self.assertEqual((shards[0], sum(shards.values())), (3, 3))
+
+    def test_reconcile_command_corrects_drift(self):
+        make_user('worker', 1)
+        counters.get_counters()
+        PlatformCounter.objects.filter(name='workers', shard=0).update(value=40)
+
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+
+        self.assertIn('workers: 40 -> 1', out.getvalue())
+        self.assert_counters_match_tables()
+
+
+class BookingFeedTests(APITestCase):
+    def setUp(self):
+        self.worker = make_user('worker', 1)
+        self.employers = [
+            make_user('employer', n, last_name='Otieno', location='Kisumu', salary=15000, family_size='4')
+            for n in range(1, 7)
+        ]
+
+    def invite(self, count):
+        for employer in self.employers[:count]:
+            Booking.objects.create(employer=employer, worker=self.worker)
+
+    def get_feed(self, url, count):
+        Booking.objects.all().delete()
+        self.invite(count)
+        self.client.get(url)  # warm the per-process caches
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), count)
+        return response, len(queries)
+
+    def test_invite_routes_cost_one_query_whatever_the_page_size(self):
+        self.client.force_authenticate(self.worker)
+        for name in ('worker-dashboard-job-invites', 'worker-requests-job-invites', 'worker-requests-my-invites'):
+            _, small = self.get_feed(reverse(name), 2)
+            response, large = self.get_feed(reverse(name), 6)
+            self.assertEqual(small, large, name)
+            self.assertEqual(large, 1, name)
+
+        row = response.data[0]
+        self.assertEqual(row['employer_name'], 'Employer6 Otieno')
+        self.assertEqual((row['location'], row['salary'], row['family_size']), ('Kisumu', 15000, '4'))
+        self.assertEqual(row['status'], 'pending')
+
+    def test_employer_history_is_one_query_and_filters(self):
+        employer = self.employers[0]
+        workers = [self.worker] + [make_user('worker', n, worker_type='cook') for n in range(2, 6)]
+        bookings = [Booking.objects.create(employer=employer, worker=w) for w in workers]
+        Booking.objects.filter(pk=bookings[0].pk).update(status='accepted')
+        month_ago = timezone.now() - timedelta(days=30)
+        Booking.objects.filter(pk__in=[b.pk for b in bookings[:2]]).update(created_at=month_ago, updated_at=month_ago)
+        self.client.force_authenticate(employer)
+        url = reverse('employer-dash-history')
+        self.client.get(url)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data), 5)
+        by_id = {row['id']: row for row in response.data}
+        self.assertEqual(by_id[bookings[0].pk]['worker_phone'], self.worker.phone)
+        self.assertIsNone(by_id[bookings[1].pk]['worker_phone'])
+        self.assertEqual(by_id[bookings[1].pk]['worker_type'], 'cook')
+
+        response = self.client.get(url, {'status': 'accepted'})
+        self.assertEqual([row['id'] for row in response.data], [bookings[0].pk])
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        response = self.client.get(reverse('employer-dash-my-requests'), {'since': since})
+        self.assertEqual({row['id'] for row in response.data['changes']}, {b.pk for b in bookings[2:]})
+        self.assertEqual(self.client.get(url, {'status': 'bogus'}).status_code, 400)
+
+
+@override_settings(BOOKING_SYNC_LAG=0)
+class DeltaSyncTests(APITestCase):
+    def setUp(self):
+        self.worker = make_user('worker', 1)
+        self.employers = [make_user('employer', n) for n in range(1, 4)]
+        self.bookings = [Booking.objects.create(employer=e, worker=self.worker) for e in self.employers]
+        hour_ago = timezone.now() - timedelta(hours=1)
+        Booking.objects.update(created_at=hour_ago, updated_at=hour_ago)
+
+    def start(self, user, name):
+        self.client.force_authenticate(user)
+        response = self.client.get(reverse(name))
+        self.assertEqual(response.status_code, 200)
+        return response['X-Sync-Since']
+
+    def sync(self, name, since, **params):
+        response = self.client.get(reverse(name), {'since': since, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_invites_return_only_changes_and_deletions(self):
+        since = self.start(self.worker, 'worker-requests-my-invites')
+        self.assertEqual(self.sync('worker-requests-my-invites', since)['changes'], [])
+
+        self.client.post(reverse('worker-requests-respond-to-request', args=[self.bookings[0].pk]), {'status': 'declined'})
+        self.client.force_authenticate(self.employers[1])
+        self.client.post(reverse('workers-directory-withdraw-request', args=[self.worker.pk]))
+        new = Booking.objects.create(employer=self.employers[1], worker=self.worker)
+
+        self.client.force_authenticate(self.worker)
+        data = self.sync('worker-requests-my-invites', since)
+        self.assertEqual([(row['id'], row['status']) for row in data['changes']],
+                         [(self.bookings[0].pk, 'declined'), (new.pk, 'pending')])
+        self.assertEqual(data['deleted'], [self.bookings[1].pk])
+        self.assertFalse(data['has_more'])
+
+        # The returned cursor picks up from here
+        self.assertEqual(self.sync('worker-requests-my-invites', data['since'])['changes'], [])
+
+    def test_set_based_transitions_move_updated_at_and_changes_page(self):
+        since = self.start(self.employers[2], 'employer-dash-history')
+        self.client.force_authenticate(self.worker)
+        self.client.post(reverse('worker-requests-respond-to-request', args=[self.bookings[0].pk]), {'status': 'accepted'})
+
+        # Auto-declined by the accept, which is a bulk UPDATE
+        self.client.force_authenticate(self.employers[2])
+        data = self.sync('employer-dash-history', since)
+        self.assertEqual([(row['id'], row['status']) for row in data['changes']], [(self.bookings[2].pk, 'declined')])
+
+        self.client.force_authenticate(make_user('admin', 1, is_staff=True))
+        first = self.sync('admin-hires-list', since, page_size=2)
+        self.assertTrue(first['has_more'])
+        rest = self.sync('admin-hires-list', first['since'], page_size=2)
+        self.assertFalse(rest['has_more'])
+        self.assertEqual(sorted(row['id'] for row in first['changes'] + rest['changes']), [b.pk for b in self.bookings])
+
+    def test_rows_leaving_the_status_filter_are_reported_as_deleted(self):
+        self.client.force_authenticate(self.employers[0])
+        response = self.client.get(reverse('employer-dash-history'), {'status': 'pending'})
+        since = response['X-Sync-Since']
+        self.assertEqual([row['id'] for row in response.data], [self.bookings[0].pk])
+
+        self.client.force_authenticate(self.worker)
+        self.client.post(reverse('worker-requests-respond-to-request', args=[self.bookings[0].pk]), {'status': 'declined'})
+        self.client.force_authenticate(self.employers[0])
+        data = self.sync('employer-dash-history', since, status='pending')
+        self.assertEqual((data['changes'], data['deleted']), ([], [self.bookings[0].pk]))
+        data = self.sync('employer-dash-history', since, status='declined')
+        self.assertEqual(([row['id'] for row in data['changes']], data['deleted']), ([self.bookings[0].pk], []))
+
+    def test_each_tombstone_is_sent_once_in_bounded_pages(self):
+        now = timezone.now()
+        ages = [90, 90, 80, 70, 30, 20]  # minutes; the bookings changed 60 minutes ago
+        for n, minutes in enumerate(ages, start=100):
+            tombstone = BookingTombstone.objects.create(booking_id=n, worker_id=self.worker.pk)
+            BookingTombstone.objects.filter(pk=tombstone.pk).update(deleted_at=now - timedelta(minutes=minutes))
+
+        self.client.force_authenticate(self.worker)
+        since = (now - timedelta(hours=2)).isoformat()
+        changes, deleted, pages = [], [], 0
+        while True:
+            data = self.sync('worker-requests-my-invites', since, page_size=2)
+            self.assertLessEqual(len(data['changes']), 2)
+            self.assertLessEqual(len(data['deleted']), 2)
+            changes += [row['id'] for row in data['changes']]
+            deleted += data['deleted']
+            since, pages = data['since'], pages + 1
+            if not data['has_more']:
+                break
+        self.assertEqual(sorted(changes), [b.pk for b in self.bookings])
+        self.assertEqual(deleted, list(range(100, 106)))
+        self.assertGreater(pages, 2)
+
+    @override_settings(BOOKING_TOMBSTONE_RETENTION_DAYS=7)
+    def test_cursors_older_than_tombstone_retention_must_resync(self):
+        self.client.force_authenticate(self.worker)
+        url = reverse('worker-requests-my-invites')
+        response = self.client.get(url, {'since': (timezone.now() - timedelta(days=8)).date().isoformat()})
+        self.assertEqual((response.status_code, response.data['reset']), (410, True))
+
+        old = BookingTombstone.objects.create(booking_id=1, worker_id=self.worker.pk)
+        BookingTombstone.objects.filter(pk=old.pk).update(deleted_at=timezone.now() - timedelta(days=8))
+        recent = BookingTombstone.objects.create(booking_id=2, worker_id=self.worker.pk)
+        out = StringIO()
+        call_command('prune_tombstones', stdout=out)
+        self.assertIn('Removed 1 tombstones', out.getvalue())
+        self.assertEqual(list(BookingTombstone.objects.values_list('pk', flat=True)), [recent.pk])
+
+    def test_since_accepts_dates_and_rejects_garbage(self):
+        self.client.force_authenticate(self.worker)
+        url = reverse('worker-requests-my-invites')
+        yesterday = (timezone.now() - timedelta(days=1)).date().isoformat()
+        self.assertEqual(len(self.client.get(url, {'since': yesterday}).data['changes']), 3)
+        self.assertEqual(self.client.get(url, {'since': 'not-a-cursor'}).status_code, 400)
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class AdminExportTests(APITestCase):
+    def setUp(self):
+        self.admin = make_user('admin', 1, is_staff=True)
+        self.client.force_authenticate(self.admin)
+        self.workers = [make_user('worker', n, last_name='Wanjiru', worker_type='nanny') for n in range(1, 4)]
+        self.employer = make_user('employer', 1, last_name='Otieno')
+        self.bookings = [Booking.objects.create(employer=self.employer, worker=w) for w in self.workers]
+        Booking.objects.filter(pk=self.bookings[0].pk).update(status='accepted')
+
+    def export(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_booking_csv_streams_every_row_in_chunks(self):
+        response, body = self.export('admin-hires-export')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="bookings-', response['Content-Disposition'])
+
+        rows = list(csv.DictReader(body.splitlines()))
+        self.assertEqual([int(row['id']) for row in rows], [b.pk for b in self.bookings])
+        self.assertEqual(rows[0]['worker_name'], 'Worker1 Wanjiru')
+        self.assertEqual(rows[0]['employer_name'], 'Employer1 Otieno')
+        self.assertEqual(rows[0]['status'], 'accepted')
+
+    def test_booking_filters(self):
+        Booking.objects.filter(pk=self.bookings[2].pk).update(created_at=timezone.now() - timedelta(days=10))
+        _, body = self.export('admin-hires-export', output='ndjson', status='pending',
+                              since=(timezone.now() - timedelta(days=1)).isoformat())
+        self.assertEqual([json.loads(line)['id'] for line in body.splitlines()], [self.bookings[1].pk])
+
+    def test_user_ndjson_export_filters_by_role(self):
+        response, body = self.export('admin-users-export', output='ndjson', role='worker')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['id'] for row in rows], [w.pk for w in self.workers])
+        self.assertNotIn('password', rows[0])
+
+    def test_asgi_export_streams_before_the_query_is_exhausted(self):
+        read = []
+        export_rows = exports.export_rows
+
+        def counting_rows(queryset, columns):
+            for row in export_rows(queryset, columns):
+                read.append(row)
+                yield row
+
+        async def first_chunk_and_rest(response):
+            chunks = aiter(response)
+            first = await anext(chunks)
+            rows_read_by_then = len(read)
+            rest = [chunk async for chunk in chunks]
+            return first, rows_read_by_then, rest
+
+        key = rotate_token(self.admin).key
+        with mock.patch('users.exports.export_rows', counting_rows):
+            response = async_to_sync(AsyncClient().get)(
+                reverse('admin-hires-export'), headers={'Authorization': f'Token {key}'},
+            )
+            self.assertTrue(response.is_async)
+            first, rows_read_by_then, rest = async_to_sync(first_chunk_and_rest)(response)
+
+        self.assertLess(rows_read_by_then, len(self.bookings))
+        rows = list(csv.DictReader(b''.join([first, *rest]).decode().splitlines()))
+        self.assertEqual([int(row['id']) for row in rows], [b.pk for b in self.bookings])
+
+    def test_exports_are_admin_only_and_validate_filters(self):
+        self.assertEqual(self.client.get(reverse('admin-users-export'), {'output': 'xml'}).status_code, 400)
+        self.client.force_authenticate(self.employer)
+        self.assertEqual(self.client.get(reverse('admin-hires-export')).status_code, 403)
+
+
+def image_upload(name='photo.jpg', size=(1200, 900), color='teal'):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class ImageRenditionTests(APITestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.worker = make_user('worker', 1, passport_img=image_upload(), id_photo_front=image_upload('id.jpg'))
+
+    def test_only_new_uploads_schedule_renditions(self):
+        with mock.patch('users.signals.schedule_renditions') as schedule:
+            self.worker.passport_img = image_upload('new.jpg')
+            self.worker.save()
+            schedule.assert_called_once_with(self.worker.pk, ['passport_img'])
+
+            schedule.reset_mock()
+            self.worker.location = 'Thika'
+            self.worker.save()
+            schedule.assert_not_called()
+
+    def test_renditions_are_small_webp_files_next_to_the_original(self):
+        renditions.generate_renditions(self.worker.pk)
+        self.worker.refresh_from_db()
+
+        entry = self.worker.renditions['passport_img']
+        self.assertEqual(entry['source'], self.worker.passport_img.name)
+        self.assertTrue(entry['card'].startswith('identity/passport/renditions/'))
+        with Image.open(self.worker.passport_img.storage.path(entry['card'])) as image:
+            self.assertEqual((image.format, max(image.size)), ('WEBP', 320))
+        with Image.open(self.worker.passport_img.storage.path(self.worker.renditions['id_photo_front']['thumb'])) as image:
+            self.assertEqual(max(image.size), 96)
+
+    def test_serializers_fall_back_to_the_original_until_rendered(self):
+        self.client.force_authenticate(make_user('employer', 1))
+        url = reverse('workers-directory-list')
+        thumb = lambda: urlparse(self.client.get(url).data[0]['passport_thumb']).path
+        self.assertTrue(thumb().endswith(self.worker.passport_img.name))
+
+        renditions.generate_renditions(self.worker.pk)
+        self.assertTrue(thumb().endswith('_card.webp'))
+
+        # A new upload makes the old renditions stale until they are regenerated
+        self.worker.refresh_from_db()
+        self.worker.passport_img = image_upload('new.jpg')
+        self.worker.save()
+        self.assertTrue(thumb().endswith(self.worker.passport_img.name))
+
+    def test_backfill_command_renders_missing_images_once(self):
+        out = StringIO()
+        call_command('generate_renditions', workers=1, stdout=out)
+        self.assertIn('Rendered images for 1 users, 0 failed.', out.getvalue())
+
+        out = StringIO()
+        call_command('generate_renditions', workers=1, stdout=out)
+        self.assertIn('Rendered images for 0 users', out.getvalue())
+
+
+class ProtectedMediaTests(APITestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.worker = make_user('worker', 1, passport_img=image_upload(), id_photo_back=image_upload('back.jpg'))
+        self.url = reverse('protected-media', args=[self.worker.id_photo_back.name])
+
+    def test_signed_urls_are_handed_out_and_checked(self):
+        signed = self.worker.id_photo_back.url
+        self.assertTrue(signed.startswith(self.url + '?'))
+        response = self.client.get(signed)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('private', response['Cache-Control'])
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'\xff\xd8'))
+
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.assertEqual(self.client.get(signed.replace('signature=', 'signature=x')).status_code, 403)
+        # A signature only opens the file it was made for
+        other = signed.replace(self.worker.id_photo_back.name, self.worker.passport_img.name)
+        self.assertEqual(self.client.get(other).status_code, 403)
+
+    def test_signatures_follow_the_secret_key(self):
+        signed = self.worker.id_photo_back.url
+        with override_settings(SECRET_KEY='rotated-' + settings.SECRET_KEY):
+            self.assertNotEqual(self.worker.id_photo_back.url, signed)
+            self.assertEqual(self.client.get(signed).status_code, 403)
+
+    def test_owner_and_admins_need_no_signature(self):
+        for user, status in ((self.worker, 200), (make_user('admin', 1, is_staff=True), 200), (make_user('worker', 2), 403)):
+            self.client.force_authenticate(user)
+            self.assertEqual(self.client.get(self.url).status_code, status)
+
+    @override_settings(PROTECTED_MEDIA_ACCEL_PREFIX='/protected-media/')
+    def test_nginx_sends_the_bytes_when_configured(self):
+        response = self.client.get(self.worker.id_photo_back.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.worker.id_photo_back.name)
+        self.assertEqual(response.content, b'')
+
+    def test_paths_outside_identity_are_not_served(self):
+        self.client.force_authenticate(make_user('admin', 1, is_staff=True))
+        for name in ('identity/../../settings.py', 'other/file.jpg'):
+            self.assertEqual(self.client.get(reverse('protected-media', args=[name])).status_code, 404)
+
+
+def document_upload(name, seed, size=(800, 500), quality=90):
+    """A JPEG with random blocks, so different seeds give perceptually different images."""
+    rng = random.Random(seed)
+    image = Image.new('RGB', (400, 250), 'white')
+    pixels = image.load()
+    for _ in range(40):
+        x, y = rng.randrange(380), rng.randrange(230)
+        shade = tuple(rng.randrange(256) for _ in range(3))
+        for dx in range(rng.randrange(20, 120)):
+            for dy in range(rng.randrange(20, 80)):
+                if x + dx < 400 and y + dy < 250:
+                    pixels[x + dx, y + dy] = shade
+    buffer = BytesIO()
+    image.resize(size).save(buffer, 'JPEG', quality=quality)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class DuplicateImageTests(APITestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.worker = make_user('worker', 1, id_photo_front=document_upload('id.jpg', seed=1))
+        # Same card photographed again: smaller and more compressed
+        self.copycat = make_user('worker', 2, id_photo_back=document_upload('copy.jpg', seed=1, size=(640, 400), quality=60))
+        self.other = make_user('worker', 3, id_photo_front=document_upload('other.jpg', seed=2))
+        for user in (self.worker, self.copycat, self.other):
+            fingerprints.fingerprint_images(user.pk)
+
+    def test_fingerprint_bands_split_the_hash(self):
+        fingerprint = ImageFingerprint.objects.get(user=self.worker, field='id_photo_front')
+        self.assertEqual(fingerprint.source, self.worker.id_photo_front.name)
+        value = fingerprint.hash & fingerprints.HASH_MASK
+        self.assertEqual(
+            [fingerprint.band_0, fingerprint.band_1, fingerprint.band_2, fingerprint.band_3],
+            fingerprints.bands(value),
+        )
+        self.assertEqual(sum(band << (16 * i) for i, band in enumerate(fingerprints.bands(value))), value)
+
+    def test_reused_photo_is_reported_across_fields(self):
+        duplicates = fingerprints.possible_duplicates(self.worker)
+        self.assertEqual([(d['user'].pk, d['field'], d['matched_field']) for d in duplicates],
+                         [(self.copycat.pk, 'id_photo_front', 'id_photo_back')])
+        self.assertLessEqual(duplicates[0]['distance'], settings.DUPLICATE_IMAGE_MAX_DISTANCE)
+        self.assertEqual(fingerprints.possible_duplicates(self.other), [])
+
+    @override_settings(DUPLICATE_IMAGE_MAX_CANDIDATES=1)
+    def test_candidates_agreeing_on_more_bands_are_checked_first(self):
+        ImageFingerprint.objects.all().delete()
+        target = 0x1234_5678_9ABC_DEF0
+
+        def store(user, value):
+            ImageFingerprint.objects.create(
+                user=user, field='id_photo_front', source='x.jpg', hash=fingerprints.to_signed(value),
+                **{f'band_{i}': band for i, band in enumerate(fingerprints.bands(value))},
+            )
+
+        # Created first, shares only the lowest band: far away, but a candidate all the same
+        store(self.other, target ^ (0xFFFF << 16) ^ (0xFFFF << 32) ^ (0xFFFF << 48))
+        store(self.copycat, target ^ 1)
+        matches = fingerprints.find_similar(target)
+        self.assertEqual([(m.user_id, d) for m, d in matches], [(self.copycat.pk, 1)])
+
+    def test_admin_endpoint_lists_possible_duplicates(self):
+        url = reverse('admin-users-possible-duplicates', args=[self.copycat.pk])
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+        self.client.force_authenticate(make_user('admin', 1, is_staff=True))
+        data = self.client.get(url).data
+        self.assertEqual([(d['user_id'], d['field'], d['matched_field']) for d in data],
+                         [(self.worker.pk, 'id_photo_back', 'id_photo_front')])
+
+    def test_new_upload_replaces_and_clearing_forgets_the_fingerprint(self):
+        self.worker.id_photo_front = document_upload('new.jpg', seed=3)
+        with mock.patch('users.signals.schedule_fingerprints') as schedule:
+            self.worker.save()
+        schedule.assert_called_once_with(self.worker.pk, ['id_photo_front'])
+        # Until the new upload is hashed, the stale fingerprint is ignored
+        self.assertEqual(fingerprints.possible_duplicates(self.worker), [])
+
+        self.worker.id_photo_front = None
+        self.worker.save()
+        self.assertFalse(ImageFingerprint.objects.filter(user=self.worker).exists())
+
+    def test_backfill_command_hashes_missing_images_once(self):
+        ImageFingerprint.objects.all().delete()
+        out = StringIO()
+        call_command('fingerprint_images', workers=1, stdout=out)
+        self.assertIn('Fingerprinted images for 3 users, 0 failed.', out.getvalue())
+        self.assertEqual(ImageFingerprint.objects.count(), 3)
+
+        out = StringIO()
+        call_command('fingerprint_images', workers=1, stdout=out)
+        self.assertIn('Fingerprinted images for 0 users', out.getvalue())
+
+
+class HotPathIndexTests(APITestCase):
+    """EXPLAIN the dashboard/directory queries on a small seeded dataset and check they are index-served."""
+
+    @classmethod
+    def setUpTestData(cls):
+        benchmarking.seed_workers(200, seed=1)
+        benchmarking.seed_employers(20, seed=2)
+        workers = list(User.objects.filter(role='worker').values_list('id', flat=True))
+        employers = list(User.objects.filter(role='employer').values_list('id', flat=True))
+        benchmarking.seed_bookings(employers, workers, 10, seed=3)
+        benchmarking.seed_verification_logs(workers, None, 1, seed=4)
+        benchmarking.analyze_tables()
+        sample = Booking.objects.order_by('id').first()
+        cls.employer, cls.worker = sample.employer, sample.worker
+
+    def explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            # Tiny tables make sequential scans and sorts look cheap; rule them out so the
+            # plan shows whether an index can serve the filter *and* the ordering
+            with connection.cursor() as cursor:
+                for option in ('enable_seqscan', 'enable_bitmapscan', 'enable_sort'):
+                    cursor.execute(f'SET LOCAL {option} = off')
+        return queryset.explain()
+
+    def test_hot_queries_are_index_served(self):
+        ours = {index.name for model in (User, Booking, VerificationLog) for index in model._meta.indexes}
+        for name, (queryset, _) in benchmarking.hot_path_queries(self.employer, self.worker).items():
+            with self.subTest(name):
+                plan = self.explain(queryset)
+                self.assertFalse(benchmarking.has_full_scan(plan), plan)
+                self.assertTrue(ours & set(benchmarking.plan_indexes(plan)), plan)
+
+    def test_booking_feeds_use_their_composite_indexes(self):
+        queries = benchmarking.hot_path_queries(self.employer, self.worker)
+        for name in ('employer_history', 'job_invites', 'directory_request_status', 'pending_invites', 'review_queue',
+                     'latest_review', 'invite_sync', 'history_sync'):
+            with self.subTest(name):
+                queryset, expected = queries[name]
+                self.assertIn(expected, benchmarking.plan_indexes(self.explain(queryset)))
+
+
+class BookingTransitionTests(APITestCase):
+    def setUp(self):
+        self.worker = make_user('worker', 1)
+        self.employers = [make_user('employer', n) for n in range(1, 4)]
+        self.bookings = [Booking.objects.create(employer=e, worker=self.worker) for e in self.employers]
+
+    def respond(self, booking, status):
+        self.client.force_authenticate(self.worker)
+        return self.client.post(reverse('worker-requests-respond-to-request', args=[booking.pk]), {'status': status})
+
+    def test_accept_hires_the_worker_and_declines_the_rest(self):
+        self.assertEqual(self.respond(self.bookings[0], 'accepted').status_code, 200)
+        self.worker.refresh_from_db()
+        self.assertEqual((self.worker.is_available, self.worker.current_employer_id), (False, self.employers[0].pk))
+        self.assertEqual(
+            list(Booking.objects.order_by('id').values_list('status', flat=True)), ['accepted', 'declined', 'declined'],
+        )
+
+    def test_second_accept_is_a_conflict(self):
+        self.respond(self.bookings[0], 'accepted')
+        self.assertEqual(self.respond(self.bookings[0], 'accepted').status_code, 409)
+        Booking.objects.filter(pk=self.bookings[1].pk).update(status='pending')
+        self.assertEqual(self.respond(self.bookings[1], 'accepted').status_code, 409)
+        self.assertEqual(Booking.objects.get(pk=self.bookings[1].pk).status, 'pending')
+
+    def test_release_only_applies_to_accepted_bookings(self):
+        self.client.force_authenticate(self.employers[0])
+        url = reverse('employer-dash-release-worker', args=[self.bookings[0].pk])
+        self.assertEqual(self.client.post(url).status_code, 409)
+
+        self.respond(self.bookings[0], 'accepted')
+        self.client.force_authenticate(self.employers[0])
+        self.assertEqual(self.client.post(url).status_code, 200)
+        self.worker.refresh_from_db()
+        self.assertEqual((self.worker.is_available, self.worker.current_employer_id), (True, None))
+        self.assertEqual(Booking.objects.get(pk=self.bookings[0].pk).status, 'completed')
+
+    def test_other_users_bookings_are_not_found(self):
+        self.client.force_authenticate(self.employers[1])
+        self.assertEqual(self.client.post(reverse('employer-dash-release-worker', args=[self.bookings[0].pk])).status_code, 404)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class BookingNotificationTests(APITestCase):
+    def setUp(self):
+        self.worker = make_user('worker', 1)
+        self.employers = [make_user('employer', n) for n in range(1, 3)]
+        self.layer = get_channel_layer()
+        self.inboxes = {}
+        for user in (self.worker, *self.employers):
+            channel = async_to_sync(self.layer.new_channel)()
+            async_to_sync(self.layer.group_add)(user_group(user.pk), channel)
+            self.inboxes[user.pk] = channel
+
+    def events(self, user):
+        """(event, booking id, status) of everything pushed to `user` so far."""
+        async def drain(channel):
+            messages = []
+            while True:
+                try:
+                    messages.append(await asyncio.wait_for(self.layer.receive(channel), 0.05))
+                except asyncio.TimeoutError:
+                    return messages
+        messages = async_to_sync(drain)(self.inboxes[user.pk])
+        return [(m['event'], m['booking']['id'], m['booking']['status']) for m in messages]
+
+    def test_hire_and_accept_reach_both_sides_after_commit(self):
+        self.client.force_authenticate(self.employers[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('workers-directory-hire', args=[self.worker.pk]))
+        first = Booking.objects.get(employer=self.employers[0])
+        self.assertEqual(self.events(self.worker), [('created', first.pk, 'pending')])
+        self.assertEqual(self.events(self.employers[0]), [('created', first.pk, 'pending')])
+
+        second = Booking.objects.create(employer=self.employers[1], worker=self.worker)
+        self.client.force_authenticate(self.worker)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('worker-requests-respond-to-request', args=[first.pk]), {'status': 'accepted'})
+        self.assertEqual(self.events(self.employers[0]), [('updated', first.pk, 'accepted')])
+        self.assertEqual(self.events(self.employers[1]), [('updated', second.pk, 'declined')])
+        self.assertEqual(self.events(self.worker), [('updated', first.pk, 'accepted'), ('updated', second.pk, 'declined')])
+
+    def test_admin_changes_and_deletes_are_pushed(self):
+        booking = Booking.objects.create(employer=self.employers[0], worker=self.worker)
+        self.events(self.worker)
+        self.client.force_authenticate(make_user('admin', 1, is_staff=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin-hires-force-action', args=[booking.pk]), {'status': 'declined'})
+            self.client.delete(reverse('admin-hires-withdraw-request', args=[booking.pk]))
+        self.assertEqual(self.events(self.worker), [('updated', booking.pk, 'declined'), ('deleted', booking.pk, 'declined')])
+        self.assertEqual(self.events(self.employers[1]), [])
+    def test_deleting_a_token_revokes_its_sockets(self):
+        key = rotate_token(self.worker).key
+        with self.captureOnCommitCallbacks(execute=True):
+            Token.objects.filter(user=self.worker).delete()
+        self.assertEqual(
+            async_to_sync(self.layer.receive)(self.inboxes[self.worker.pk]),
+            {'type': 'session.revoked', 'session': session_id(key)},
+        )
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class NotificationSocketTests(TransactionTestCase):
+    """
+    The notification WebSocket end to end. Channels closes old database connections
+    around every handler, which would break a TestCase's wrapping transaction.
+    """
+
+    def setUp(self):
+        self.worker = make_user('worker', 1)
+        self.employer = make_user('employer', 1)
+        self.layer = get_channel_layer()
+        self.message = booking_message(
+            'created', {'id': 7, 'employer_id': self.employer.pk, 'worker_id': self.worker.pk, 'status': 'pending'},
+        )
+
+    async def open_socket(self, key):
+        from kykam_agencies.asgi import application
+        communicator = WebsocketCommunicator(application, '/ws/notifications/')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        await communicator.send_json_to({'type': 'auth', 'token': key})
+        return communicator
+
+    async def assert_closed(self, communicator, timeout=1):
+        closed = await communicator.receive_output(timeout)
+        self.assertEqual((closed['type'], closed['code']), ('websocket.close', 4401))
+        await communicator.disconnect()
+
+    def test_websocket_relays_the_users_events(self):
+        key = rotate_token(self.worker).key
+
+        async def session():
+            await self.assert_closed(await self.open_socket('nope'))
+
+            communicator = await self.open_socket(key)
+            self.assertEqual(await communicator.receive_json_from(), {'type': 'auth', 'ok': True})
+            await self.layer.group_send(user_group(self.worker.pk), self.message)
+            received = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return received
+
+        self.assertEqual(async_to_sync(session)(), {
+            'type': 'booking', 'event': 'created',
+            'booking': {'id': 7, 'employer_id': self.employer.pk, 'worker_id': self.worker.pk, 'status': 'pending'},
+        })
+
+    def test_token_in_the_url_is_not_accepted(self):
+        from kykam_agencies.asgi import application
+        key = rotate_token(self.worker).key
+
+        @override_settings(WEBSOCKET_AUTH_TIMEOUT=0)
+        async def session():
+            communicator = WebsocketCommunicator(application, f'/ws/notifications/?token={key}')
+            await communicator.connect()
+            await self.assert_closed(communicator)
+
+        async_to_sync(session)()
+
+    def test_revocation_closes_only_sockets_of_that_token(self):
+        key = rotate_token(self.worker).key
+        revoked = {'type': 'session.revoked', 'session': session_id(key)}
+
+        async def session():
+            communicator = await self.open_socket(key)
+            await communicator.receive_json_from()
+            await self.layer.group_send(user_group(self.worker.pk), {**revoked, 'session': session_id('other')})
+            await self.layer.group_send(user_group(self.worker.pk), self.message)
+            self.assertEqual((await communicator.receive_json_from())['type'], 'booking')
+            await self.layer.group_send(user_group(self.worker.pk), revoked)
+            await self.assert_closed(communicator)
+
+        async_to_sync(session)()
+
+    @override_settings(TOKEN_EXPIRED_AFTER_SECONDS=1)
+    def test_sockets_close_when_the_token_expires(self):
+        key = rotate_token(self.worker).key
+
+        async def session():
+            communicator = await self.open_socket(key)
+            await communicator.receive_json_from()
+            await self.assert_closed(communicator, timeout=3)
+
+        async_to_sync(session)()
+
+
+class RequestMetricsTests(APITestCase):
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.admin = make_user('admin', 1, is_staff=True)
+        self.employer = make_user('employer', 1)
+        for n in range(1, 4):
+            make_user('worker', n)
+
+    def scrape(self, **headers):
+        self.client.force_authenticate(None)
+        return self.client.get(reverse('metrics'), **headers)
+
+    def test_records_latency_and_queries_per_route(self):
+        self.client.force_authenticate(self.employer)
+        issued = 0
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse('workers-directory-list'))
+            issued += len(queries)
+
+        stats = metrics.merge(metrics.collect())[('workers-directory-list', 'GET')]
+        self.assertEqual((stats['count'], stats['statuses'], stats['queries']), (2, {200: 2}, issued))
+
+        self.client.force_authenticate(self.admin)
+        body = self.client.get(reverse('metrics')).content.decode()
+        route = f'route="workers-directory-list",method="GET",slot="{metrics._slot[0]}"'
+        self.assertIn(f'kykam_http_request_duration_seconds_bucket{{{route},le="+Inf"}} 2', body)
+        self.assertIn(f'kykam_http_requests_total{{{route},status="200"}} 2', body)
+        self.assertIn(f'kykam_db_queries_per_request_sum{{{route}}} {issued}', body)
+
+    def test_unresolved_paths_share_one_label(self):
+        self.client.get('/api/no-such-page/1/')
+        self.client.get('/api/no-such-page/2/')
+        self.assertEqual(metrics.merge(metrics.collect())[('unmatched', 'GET')]['statuses'], {404: 2})
+
+    @override_settings(METRICS_TOKEN='scrape-me')
+    def test_endpoint_needs_admin_or_scrape_token(self):
+        self.assertIn(self.scrape().status_code, (401, 403))
+        self.assertIn(self.scrape(HTTP_AUTHORIZATION='Bearer wrong').status_code, (401, 403))
+
+        response = self.scrape(HTTP_AUTHORIZATION='Bearer scrape-me')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+    def test_merges_totals_published_by_other_processes(self):
+        metrics.record('workers-directory-list', 'GET', 200, 0.02, 3, 0.004)
+        other = {('workers-directory-list', 'GET'): {**metrics.snapshot()[('workers-directory-list', 'GET')]}}
+        cache.set('metrics:process:other', other, 60)
+        # Registered the way another process's flush does
+        self.assertTrue(cache.add(f'metrics:slot:{settings.METRICS_MAX_PROCESSES - 1}', 'other', 60))
+
+        stats = metrics.merge(metrics.collect())[('workers-directory-list', 'GET')]
+        self.assertEqual((stats['count'], stats['queries']), (2, 6))
+        slots = cache.get_many([f'metrics:slot:{n}' for n in range(settings.METRICS_MAX_PROCESSES)])
+        self.assertEqual(sorted(slots.values()), sorted([metrics.PROCESS_ID, 'other']))
+
+    def test_each_process_is_its_own_series(self):
+        metrics.record('workers-directory-list', 'GET', 200, 0.02, 3, 0.004)
+        other_slot = settings.METRICS_MAX_PROCESSES - 1
+        cache.set('metrics:process:other', metrics.snapshot(), 60)
+        cache.add(f'metrics:slot:{other_slot}', 'other', 60)
+
+        route = 'kykam_http_requests_total{route="workers-directory-list",method="GET"'
+        body = metrics.render(metrics.collect())
+        self.assertIn(f'{route},slot="{metrics._slot[0]}",status="200"}} 1', body)
+        self.assertIn(f'{route},slot="{other_slot}",status="200"}} 1', body)
+
+        # The other process dies: its series goes away, ours doesn't drop
+        cache.delete_many([f'metrics:slot:{other_slot}', 'metrics:process:other'])
+        body = metrics.render(metrics.collect())
+        self.assertIn(f'{route},slot="{metrics._slot[0]}",status="200"}} 1', body)
+        self.assertNotIn(f'slot="{other_slot}"', body)
+
+    def test_streamed_responses_are_recorded_when_closed(self):
+        self.client.force_authenticate(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin-users-export'))
+            self.assertNotIn(('admin-users-export', 'GET'), metrics.snapshot())
+            # The test client closes the response once its content is read
+            b''.join(response.streaming_content)
+
+        stats = metrics.snapshot()[('admin-users-export', 'GET')]
+        # The rows are read while streaming, and those queries count too
+        self.assertEqual((stats['count'], stats['queries']), (1, len(queries)))
+        self.assertGreater(stats['queries'], 0)
+
+    def test_unknown_methods_share_one_label(self):
+        self.client.generic('BREW', reverse('workers-directory-list'))
+        self.client.generic('PROPFIND-X', reverse('workers-directory-list'))
+        self.assertEqual(metrics.merge(metrics.collect())[('workers-directory-list', 'OTHER')]['count'], 2)
+
+
+class ApiBenchmarkTests(APITestCase):
+    def test_seed_data_generates_a_consistent_dataset(self):
+        make_user('admin', 1, is_staff=True)
+        out = StringIO()
+        call_command('seed_data', workers=40, employers=4, bookings_per_employer=5, logs_per_worker=2, stdout=out)
+
+        self.assertIn('Seeded 40 workers, 4 employers, 20 bookings and 80 verification logs', out.getvalue())
+        self.assertEqual(VerificationLog.objects.count(), 80)
+        stored = counters.get_counters()
+        self.assertEqual((stored['workers'], stored['employers']), (40, 4))
+        self.assertEqual(sum(caching.get_category_worker_counts().values()), 40)
+
+    def test_seeded_bookings_leave_hired_workers_consistent(self):
+        benchmarking.seed_workers(30, seed=1)
+        benchmarking.seed_employers(6, seed=2)
+        workers = list(User.objects.filter(role='worker').values_list('id', flat=True))
+        employers = list(User.objects.filter(role='employer').values_list('id', flat=True))
+        benchmarking.seed_bookings(employers, workers, 10, seed=3)
+
+        accepted = Booking.objects.filter(status='accepted').select_related('worker')
+        self.assertTrue(accepted.exists())
+        self.assertEqual(accepted.count(), accepted.values('worker').distinct().count())
+        for booking in accepted:
+            self.assertFalse(booking.worker.is_available)
+            self.assertEqual(booking.worker.current_employer_id, booking.employer_id)
+        self.assertFalse(Booking.objects.filter(status='pending', worker__current_employer__isnull=False).exists())
+        self.assertEqual(
+            User.objects.filter(role='worker', current_employer__isnull=False).count(), accepted.count(),
+        )
+
+    def test_bench_api_reports_every_endpoint_and_rolls_back(self):
+        users_before = User.objects.count()
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command(
+                'bench_api', workers=60, employers=3, bookings_per_employer=4, repeat=2, warmup=1,
+                output=output.name, stdout=StringIO(),
+            )
+            report = json.load(open(output.name))
+
+        self.assertEqual(set(report['endpoints']), {
+            'directory_list', 'directory_deep_page', 'directory_search', 'hire', 'respond_to_request', 'job_invites',
+            'employer_history', 'admin_stats', 'review_queue', 'categories',
+        })
+        for name, result in report['endpoints'].items():
+            self.assertEqual(result['statuses'], [200], name)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertGreater(report['endpoints']['directory_list']['queries_min'], 0)
+        self.assertEqual(User.objects.count(), users_before)
+
+
+@skipUnless(connection.vendor == 'postgresql', "needs a database with real row locking")
+class BookingContentionTests(TransactionTestCase):
+    """Many threads accepting at once against a real database: exactly one hire may win."""
+
+    def setUp(self):
+        self.worker = make_user('worker', 1)
+        self.bookings = [
+            Booking.objects.create(employer=make_user('employer', n), worker=self.worker).pk for n in range(1, 9)
+        ]
+
+    def race(self, attempts):
+        barrier = threading.Barrier(len(attempts))
+
+        def attempt(booking_id):
+            barrier.wait()
+            try:
+                bookings.accept(booking_id, self.worker)
+                return 'hired'
+            except bookings.BookingConflict:
+                return 'conflict'
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=len(attempts)) as pool:
+            return sorted(pool.map(attempt, attempts))
+
+    def test_simultaneous_accepts_of_different_requests_hire_once(self):
+        outcomes = self.race(self.bookings)
+        self.assertEqual(outcomes.count('hired'), 1)
+        self.assertEqual(Booking.objects.filter(status='accepted').count(), 1)
+        self.assertEqual(Booking.objects.filter(status='declined').count(), len(self.bookings) - 1)
+        self.assertEqual(counters.get_counters()['active_hires'], 1)
+
+    def test_siblings_withdrawn_during_an_accept_get_no_declined_event(self):
+        accepted, withdrawn, *rest = self.bookings
+        locked = threading.Event()
+
+        def withdraw():
+            with transaction.atomic():
+                Booking.objects.select_for_update().get(pk=withdrawn)
+                locked.set()
+                time.sleep(0.5)  # accept() is now waiting on this row
+                Booking.objects.filter(pk=withdrawn).delete()
+            connection.close()
+
+        def accept():
+            locked.wait()
+            try:
+                bookings.accept(accepted, self.worker)
+            finally:
+                connection.close()
+
+        with mock.patch('users.bookings.publish_booking_events') as publish:
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                for future in [pool.submit(withdraw), pool.submit(accept)]:
+                    future.result()
+
+        (_, rows), _ = publish.call_args
+        self.assertEqual({row['id']: row['status'] for row in rows}, {
+            accepted: 'accepted', **{pk: 'declined' for pk in rest},
+        })
+
+    def test_simultaneous_accepts_of_the_same_request_hire_once(self):
+        outcomes = self.race([self.bookings[0]] * 8)
+        self.assertEqual(outcomes, ['conflict'] * 7 + ['hired'])
+
+
+@skipUnless(connection.vendor == 'postgresql', "needs a database with real row locking")
+class ReviewContentionTests(TransactionTestCase):
+    def test_worker_trashed_during_a_review_is_skipped(self):
+        admin = make_user('admin', 1, is_staff=True)
+        reviewed, trashed = (make_user('worker', n, status='pending') for n in (1, 2))
+        locked = threading.Event()
+
+        def trash():
+            with transaction.atomic():
+                User.objects.select_for_update().get(pk=trashed.pk)
+                locked.set()
+                time.sleep(0.5)  # review_users() is now waiting on this row
+                User.objects.filter(pk=trashed.pk).update(is_deleted=True)
+            connection.close()
+
+        def review():
+            locked.wait()
+            try:
+                return verification.review_users([reviewed.pk, trashed.pk], 'approved', admin)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [pool.submit(trash), pool.submit(review)]
+            self.assertEqual(futures[1].result(), (1, [trashed.pk]))
+        self.assertEqual(User.objects.get(pk=trashed.pk).status, 'pending')
+        self.assertFalse(VerificationLog.objects.filter(worker=trashed).exists())
@@ -58,6 +58,8 @@ urlpatterns = [
     path('admin/users/<int:user_id>/reset-password/', views.AdminUserPasswordResetView.as_view(), name='admin-password-reset'),
     path('admin/manage-users/<int:user_id>/permanent_erase/', views.AdminPermanentDeleteUserView.as_view(), name='admin-permanent-erase'),
     path('contact-us/', views.ContactUsView.as_view()),
+    path('metrics/', views.MetricsView.as_view(), name='metrics'),
+    path('media/<path:name>', views.ProtectedMediaView.as_view(), name='protected-media'),
     path('set-csrf/', views.set_csrf_token, name='set-csrf'),
    
     # Include all router-generated URLs
@@ -1,7 +1,21 @@
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+import re
 
-def send_verification_email(worker, action, reasons=None, comment=None):
+from .outbox import enqueue_email
+
+MAX_SALARY = 2147483647
+
+
+def parse_salary(value):
+    """Turns free-text salary input ("15,000", "Ksh 15000") into an int, or None if it has no amount."""
+    match = re.search(r'\d[\d,]*', str(value or ''))
+    if not match:
+        return None
+    amount = int(match.group().replace(',', ''))
+    return amount if amount <= MAX_SALARY else None
+
+
+def verification_email(worker, action, reasons=None, comment=None):
+    """Subject and body of the approval / rejection notice."""
     if action == 'approved':
         subject = "Account Verified - Kykam Agencies"
         message = f"Hello {worker.first_name},\n\nGreat news! Your account has been verified. You can now start receiving job requests."
@@ -9,11 +23,10 @@ def send_verification_email(worker, action, reasons=None, comment=None):
         subject = "Action Required: Verification Update"
         reason_text = "\n".join([f"- {r}" for r in reasons]) if reasons else ""
         message = f"Hello {worker.first_name},\n\nUnfortunately, we couldn't verify your documents for the following reasons:\n\n{reason_text}\n\nNotes: {comment}\n\nPlease log in and re-upload your documents."
+    return subject, message
 
-    send_mail(
-        subject,
-        message,
-        None, # Uses DEFAULT_FROM_EMAIL
-        [worker.email],
-        fail_silently=False,
-    )
\ No newline at end of file
+
+def send_verification_email(worker, action, reasons=None, comment=None):
+    subject, message = verification_email(worker, action, reasons, comment)
+    # Queued, not sent: delivered by `manage.py send_outbox`
+    enqueue_email(subject, message, [worker.email])
@@ -0,0 +1,118 @@
+"""
+Set-based worker verification for clearing review backlogs.
+
+`pending_reviews()` lists the workers waiting for review. Each review call is one UPDATE for the status change, one bulk INSERT for the
+VerificationLog rows and one for the queued emails, whatever the batch size
+(plus the fixed handful of statements that keep the dashboard counters in step).
+"""
+from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, JSONField, OuterRef, Q, Subquery
+from django.db.models.functions import JSONObject
+from rest_framework.authtoken.models import Token
+
+from .caching import invalidate_cached_users, invalidate_category_worker_counts, invalidate_directory
+from .counters import bulk_transition
+from .models import EmailOutbox, User, VerificationLog
+from .outbox import queued_email
+from .signals import run_now_and_on_commit
+from .utils import verification_email
+
+# Annotation name -> image field; the review queue reports which documents were uploaded
+DOCUMENT_FIELDS = {
+    'has_id_front': 'id_photo_front',
+    'has_id_back': 'id_photo_back',
+    'has_passport': 'passport_img',
+}
+
+
+def _uploaded(field):
+    return Q(**{f'{field}__isnull': False}) & ~Q(**{field: ''})
+
+
+def pending_reviews():
+    """
+    Pending workers annotated, in the same SELECT, with their latest review
+    (`latest_review`: {"action", "comment"} or None, from one correlated
+    subquery on verification_worker_latest_idx) and document flags. Order it
+    oldest first, as worker_review_queue_idx does.
+    """
+    latest = (
+        VerificationLog.objects.filter(worker=OuterRef('pk'))
+        .order_by('-created_at', '-id')
+        .values(review=JSONObject(action='action', comment='comment'))[:1]
+    )
+    complete = Q()
+    for field in DOCUMENT_FIELDS.values():
+        complete &= _uploaded(field)
+    return (
+        User.objects.filter(role='worker', status='pending', is_deleted=False)
+        .annotate(
+            latest_review=Subquery(latest, output_field=JSONField()),
+            documents_complete=ExpressionWrapper(complete, output_field=BooleanField()),
+            **{
+                name: ExpressionWrapper(_uploaded(field), output_field=BooleanField())
+                for name, field in DOCUMENT_FIELDS.items()
+            },
+        )
+    )
+
+
+REVIEW_CHANGES = {
+    'approved': {'status': 'approved', 'is_verified': True, 'is_active': True},
+    'rejected': {'status': 'rejected', 'is_verified': False},
+}
+
+
+def review_users(user_ids, action, admin, reasons=None, comment=None, notify=True):
+    """
+    Approves or rejects the workers among `user_ids` in bulk. Employers, admins
+    and trashed accounts are left alone. Returns the number of users updated
+    and the sorted ids that were skipped (not reviewable, or not found).
+    """
+    changes = REVIEW_CHANGES[action]
+    user_ids = set(user_ids)
+    with transaction.atomic():
+        # Locked as they are read, so a worker trashed or changed meanwhile can't be reviewed from a stale row
+        users = list(
+            User.objects.filter(pk__in=user_ids, role='worker', is_deleted=False)
+            .select_for_update().order_by('pk').only('id', 'first_name', 'email')
+        )
+        ids = [user.pk for user in users]
+        skipped = sorted(user_ids - set(ids))
+        if not users:
+            return 0, skipped
+
+        bulk_transition(User.objects.filter(pk__in=ids), **changes)
+        VerificationLog.objects.bulk_create([
+            VerificationLog(
+                worker=user, admin=admin, action=action,
+                rejection_reasons=reasons if action == 'rejected' else None,
+                comment=comment or None,
+            )
+            for user in users
+        ])
+        if notify:
+            EmailOutbox.objects.bulk_create([
+                queued_email(*verification_email(user, action, reasons, comment), [user.email])
+                for user in users if user.email
+            ])
+        run_now_and_on_commit(invalidate_cached_users, ids)
+    return len(ids), skipped
+
+
+def trash_users(user_ids, exclude=None):
+    """Soft-deletes `user_ids` in bulk and revokes their tokens. Returns the number trashed."""
+    queryset = User.objects.filter(pk__in=user_ids, is_deleted=False)
+    if exclude is not None:
+        queryset = queryset.exclude(pk=exclude.pk)
+    with transaction.atomic():
+        ids = list(queryset.select_for_update().order_by('pk').values_list('id', flat=True))
+        if not ids:
+            return 0
+
+        bulk_transition(User.objects.filter(pk__in=ids), is_deleted=True, is_active=False, status='banned')
+        Token.objects.filter(user_id__in=ids).delete()
+        run_now_and_on_commit(invalidate_cached_users, ids)
+        run_now_and_on_commit(invalidate_category_worker_counts)
+        run_now_and_on_commit(invalidate_directory)
+    return len(ids)
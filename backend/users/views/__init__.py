@@ -5,7 +5,9 @@ from .auth import (
 )
 from .admin import (
     AdminUserManagementViewSet, AdminHiringRegistryViewSet, 
-    CategoryViewSet, PlatformSettingsView,AdminPermanentDeleteUserView,AdminUserPasswordResetView, ContactUsView
+    CategoryViewSet, PlatformSettingsView,AdminPermanentDeleteUserView,AdminUserPasswordResetView, ContactUsView,
+    MetricsView
 )
 from .workers import WorkerDashboardViewSet, WorkerBookingViewSet
-from .employers import EmployerDashboardViewSet, WorkerViewSet
\ No newline at end of file
+from .employers import EmployerDashboardViewSet, WorkerViewSet
+from .media import ProtectedMediaView
\ No newline at end of file
@@ -8,17 +8,31 @@ from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
 from rest_framework.permissions import  IsAdminUser,AllowAny, IsAuthenticated
 
-from ..models import VerificationLog, Booking, Category, PlatformSetting
+from ..models import VerificationLog, Booking, BookingTombstone, Category, PlatformSetting
 from ..serializers import (
- AdminUserDetailSerializer,CategorySerializer,PlatformSettingsSerializer
+ AdminUserDetailSerializer,BookingExportFilterSerializer,BulkUserActionSerializer,CategorySerializer,
+ PlatformSettingsSerializer,PossibleDuplicateSerializer,ReviewQueueSerializer,UserExportFilterSerializer
 )
 from ..utils import send_verification_email
-from rest_framework.authentication import TokenAuthentication, SessionAuthentication
+from ..pagination import BookingKeysetPagination, ReviewQueuePagination, UserKeysetPagination
+from ..caching import get_category_worker_counts, get_platform_settings
+from ..outbox import enqueue_email
+from ..verification import pending_reviews, review_users, trash_users
+from ..counters import get_counters
+from ..exports import booking_export, serves_asgi, user_export
+from ..fingerprints import possible_duplicates
+from ..sync import changes_since, start_cursor, with_start_cursor
+from ..conditional import conditional
+from .. import metrics
+from rest_framework.authentication import SessionAuthentication
+from ..authentication import ExpiringTokenAuthentication
 from rest_framework import views, status, permissions
 from rest_framework.response import Response
-from django.core.mail import EmailMultiAlternatives
 from django.utils.html import strip_tags
+from django.utils.crypto import constant_time_compare
+from django.http import HttpResponse
 from django.conf import settings
+from django.db import transaction
 
 
 User = get_user_model()
@@ -28,51 +42,54 @@ class AdminUserManagementViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAdminUser]
     filter_backends = [drf_filters.SearchFilter]
     search_fields = ['username', 'phone', 'id_number', 'first_name', 'last_name']
+    pagination_class = UserKeysetPagination
 
     def get_queryset(self):
-        queryset = User.objects.all().order_by('-date_joined')
+        queryset = User.objects.all().order_by('-date_joined', '-id')
         trash = self.request.query_params.get('trash')
         if trash == 'true': queryset = queryset.filter(is_deleted=True)
         elif trash == 'false': queryset = queryset.filter(is_deleted=False)
         return queryset
 
+    # Keys of the stats payload, all read from the counters table
+    STATS_COUNTERS = [
+        'total_users', 'active_users', 'trashed_users', 'pending', 'approved',
+        'rejected', 'banned', 'workers', 'employers', 'active_hires',
+    ]
+
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        # 1. Run the main user aggregate first (this creates the 'stats' variable)
-        stats = User.objects.aggregate(
-            total_users=Count('id'),
-            active_users=Count('id', filter=Q(is_deleted=False)),
-            trashed_users=Count('id', filter=Q(is_deleted=True)),
-            pending=Count('id', filter=Q(status='pending')),
-            approved=Count('id', filter=Q(status='approved')),
-            rejected=Count('id', filter=Q(status='rejected')),
-            banned=Count('id', filter=Q(status='banned')),
-            workers=Count('id', filter=Q(role='worker')),
-            employers=Count('id', filter=Q(role='employer')),
-        )
-        
-        # 2. Now that 'stats' is a dictionary, you can add new keys to it
-        stats['active_hires'] = Booking.objects.filter(status='accepted').count()
-        
-        return Response(stats)
+        # Maintained incrementally (users/counters.py), so this is one small SELECT
+        counters = get_counters()
+        return Response({name: counters[name] for name in self.STATS_COUNTERS})
+
+    @action(detail=False, methods=['get'])
+    def review_queue(self, request):
+        """Pending workers, longest-waiting first, with their latest review and which documents they uploaded"""
+        paginator = ReviewQueuePagination()
+        page = paginator.paginate_queryset(self.filter_queryset(pending_reviews()), request, view=self)
+        serializer = ReviewQueueSerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=['post'])
     def approve_worker(self, request, pk=None):
         user = self.get_object()
-        user.is_verified, user.status, user.is_active = True, 'approved', True
-        user.save()
-        VerificationLog.objects.create(worker=user, admin=request.user, action='approved')
-        send_verification_email(user, 'approved')
+        with transaction.atomic():
+            user.is_verified, user.status, user.is_active = True, 'approved', True
+            user.save()
+            VerificationLog.objects.create(worker=user, admin=request.user, action='approved')
+            send_verification_email(user, 'approved')
         return Response({'status': 'User approved'})
 
     @action(detail=True, methods=['post'])
     def reject_worker(self, request, pk=None):
         user = self.get_object()
         reasons, comment = request.data.get('reasons', []), request.data.get('comment', '')
-        user.status, user.is_verified = 'rejected', False
-        user.save()
-        VerificationLog.objects.create(worker=user, admin=request.user, action='rejected', rejection_reasons=reasons, comment=comment)
-        send_verification_email(user, 'rejected', reasons, comment)
+        with transaction.atomic():
+            user.status, user.is_verified = 'rejected', False
+            user.save()
+            VerificationLog.objects.create(worker=user, admin=request.user, action='rejected', rejection_reasons=reasons, comment=comment)
+            send_verification_email(user, 'rejected', reasons, comment)
         return Response({'status': 'User rejected'})
 
     @action(detail=True, methods=['post'])
@@ -83,23 +100,88 @@ class AdminUserManagementViewSet(viewsets.ModelViewSet):
         Token.objects.filter(user=user).delete()
         return Response({'status': 'User moved to trash'})
 
+    @action(detail=True, methods=['get'])
+    def possible_duplicates(self, request, pk=None):
+        """Other accounts whose ID or passport photos look like this user's (users/fingerprints.py)"""
+        user = self.get_object()
+        return Response(PossibleDuplicateSerializer(possible_duplicates(user), many=True).data)
+
+    # --- Bulk actions: one UPDATE per batch, logs and emails inserted in bulk ---
+
+    @action(detail=False, methods=['post'])
+    def bulk_approve(self, request):
+        serializer = BulkUserActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated, skipped = review_users(serializer.validated_data['ids'], 'approved', request.user)
+        return Response({'status': 'Users approved', 'updated': updated, 'skipped': skipped})
+
+    @action(detail=False, methods=['post'])
+    def bulk_reject(self, request):
+        serializer = BulkUserActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        updated, skipped = review_users(data['ids'], 'rejected', request.user, data['reasons'], data['comment'])
+        return Response({'status': 'Users rejected', 'updated': updated, 'skipped': skipped})
+
+    @action(detail=False, methods=['post'])
+    def bulk_trash(self, request):
+        serializer = BulkUserActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # Never lock the acting admin out of their own session
+        updated = trash_users(serializer.validated_data['ids'], exclude=request.user)
+        return Response({'status': 'Users moved to trash', 'updated': updated})
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Streams users as CSV or NDJSON; filters: status, role, since/until (date joined)"""
+        filters = UserExportFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        data = filters.validated_data
+        return user_export(
+            data['output'], asynchronous=serves_asgi(request), statuses=data.get('status'), roles=data.get('role'),
+            since=data.get('since'), until=data.get('until'),
+        )
+
 class AdminHiringRegistryViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAdminUser]
-    queryset = Booking.objects.select_related('employer', 'worker').all().order_by('-created_at')
-    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    queryset = Booking.objects.select_related('employer', 'worker').all().order_by('-created_at', '-id')
+    authentication_classes = [ExpiringTokenAuthentication, SessionAuthentication]
+    pagination_class = BookingKeysetPagination
 
-    def list(self, request):
-        queryset = self.get_queryset()
-        data = [{
+    def registry_rows(self, bookings):
+        return [{
             "id": b.id,
             "employer_name": f"{b.employer.first_name} {b.employer.last_name}",
             "worker_name": f"{b.worker.first_name} {b.worker.last_name}",
             # If you went with the slug approach for worker_type:
             "worker_type": b.worker.worker_type, 
             "status": b.status,
-            "created_at": b.created_at
-        } for b in queryset]
-        return Response(data)
+            "created_at": b.created_at,
+            "updated_at": b.updated_at,
+        } for b in bookings]
+
+    def list(self, request):
+        since = request.query_params.get('since')
+        if since:
+            # Changes only (users/sync.py)
+            return changes_since(
+                self.get_queryset(), BookingTombstone.objects.all(), since,
+                self.paginator.get_page_size(request), serialize=self.registry_rows,
+            )
+        cursor = start_cursor()
+        queryset = self.paginate_queryset(self.get_queryset())
+        return with_start_cursor(self.get_paginated_response(self.registry_rows(queryset)), cursor)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Streams the whole registry as CSV or NDJSON; filters: status, since/until (created)"""
+        filters = BookingExportFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        data = filters.validated_data
+        return booking_export(
+            data['output'], asynchronous=serves_asgi(request), statuses=data.get('status'),
+            since=data.get('since'), until=data.get('until'),
+        )
 
     @action(detail=True, methods=['post'])
     def force_action(self, request, pk=None):
@@ -126,23 +208,18 @@ class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.all()
 
     def get_queryset(self):
-        # 1. Fetch all categories
-        categories = Category.objects.all().order_by('name')
-        
-        # 2. Manually add the worker_count to each category object
-        # We do this by filtering the User table for matching worker_type strings
-        for category in categories:
-            category.worker_count = User.objects.filter(
-                role='worker', 
-                worker_type=category.slug # Matches "nanny" (slug) to "nanny" (CharField)
-            ).count()
-            
-        return categories
+        # worker_count comes from CategorySerializer.get_worker_count (cached grouped COUNT)
+        return Category.objects.all().order_by('name')
 
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    @conditional('categories')
     def public_list(self, request):
         cats = Category.objects.filter(is_active=True)
-        return Response([{"id": c.id, "name": c.name, "emoji": c.icon_emoji, "slug": c.slug} for c in cats])
+        counts = get_category_worker_counts()
+        return Response([
+            {"id": c.id, "name": c.name, "emoji": c.icon_emoji, "slug": c.slug, "worker_count": counts.get(c.slug, 0)}
+            for c in cats
+        ])
 
 
    
@@ -161,13 +238,15 @@ class PlatformSettingsView(APIView):
             return [permissions.AllowAny()]
         return [permissions.IsAdminUser()]
 
+    @conditional('platform-settings')
     def get(self, request):
-        settings = PlatformSetting.objects.first()
+        settings = get_platform_settings()
         # 2. Use the imported Serializer class, not the model name
         serializer = PlatformSettingsSerializer(settings)
         return Response(serializer.data)
 
     def post(self, request):
+        # Fresh row for the update; the cached copy is shared and gets invalidated by the post_save signal
         settings = PlatformSetting.objects.first()
         
         # 3. Use the imported Serializer class here as well
@@ -184,7 +263,7 @@ class PlatformSettingsView(APIView):
 
 class AdminUserPasswordResetView(APIView):
     # Ensure both token and session (for browser tests) are allowed
-    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    authentication_classes = [ExpiringTokenAuthentication, SessionAuthentication]
     permission_classes = [IsAuthenticated]
  
 
@@ -276,18 +355,31 @@ class ContactUsView(APIView):
         
         text_content = strip_tags(html_content)
 
-        try:
-            msg = EmailMultiAlternatives(
-                full_subject,
-                text_content,
-                settings.DEFAULT_FROM_EMAIL, 
-                [settings.DEFAULT_FROM_EMAIL] 
-            )
-            # This allows you to click 'Reply' in your Gmail and email the user back directly
-            msg.extra_headers = {'Reply-To': sender_email}
-            msg.attach_alternative(html_content, "text/html")
-            msg.send()
-
-            return Response({"success": "Your message has been received. We will get back to you soon!"})
-        except Exception as e:
-            return Response({"error": "System busy. Please try again later."}, status=500)
\ No newline at end of file
+        # Queued for the outbox worker; reply_to lets you hit 'Reply' and email the user back directly
+        enqueue_email(
+            full_subject,
+            text_content,
+            [settings.DEFAULT_FROM_EMAIL],
+            html_body=html_content,
+            reply_to=[sender_email],
+        )
+        return Response({"success": "Your message has been received. We will get back to you soon!"})
+
+
+class HasMetricsToken(permissions.BasePermission):
+    """Lets a Prometheus scraper in with `Authorization: Bearer <METRICS_TOKEN>`."""
+
+    def has_permission(self, request, view):
+        token = settings.METRICS_TOKEN
+        header = request.headers.get('Authorization', '')
+        return bool(token) and constant_time_compare(header, f'Bearer {token}')
+
+
+class MetricsView(APIView):
+    permission_classes = [IsAdminUser | HasMetricsToken]
+
+    def get(self, request):
+        return HttpResponse(
+            metrics.render(metrics.collect()),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
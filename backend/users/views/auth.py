@@ -3,7 +3,6 @@ from django.db.models import Count, Q
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
-from django.core.mail import send_mail
 from django.conf import settings
 from django.utils import timezone
 from django.http import JsonResponse
@@ -16,7 +15,6 @@ from rest_framework.authtoken.models import Token
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.views import APIView
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.authentication import TokenAuthentication
 from ..serializers import (
     LoginAdminSerializer, RegisterWorkerSerializer, RegisterEmployerSerializer, 
     LoginWorkerSerializer, LoginEmployerSerializer,
@@ -24,7 +22,8 @@ from ..serializers import (
 
 # Import your custom CSRF-exempt class
 # Ensure authentication.py is in the same folder as this file
-from ..authentication import CsrfExemptSessionAuthentication
+from ..authentication import CsrfExemptSessionAuthentication, ExpiringTokenAuthentication
+from ..outbox import enqueue_email
 
 User = get_user_model()
 
@@ -45,7 +44,7 @@ class RegisterWorkerView(generics.CreateAPIView):
     parser_classes = (MultiPartParser, FormParser)
     permission_classes = [AllowAny]
     # Bypass CSRF and allow Token/Session auth
-    authentication_classes = [CsrfExemptSessionAuthentication, TokenAuthentication]
+    authentication_classes = [CsrfExemptSessionAuthentication, ExpiringTokenAuthentication]
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -61,7 +60,7 @@ class RegisterEmployerView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = RegisterEmployerSerializer
     permission_classes = [AllowAny]
-    authentication_classes = [CsrfExemptSessionAuthentication, TokenAuthentication]
+    authentication_classes = [CsrfExemptSessionAuthentication, ExpiringTokenAuthentication]
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -76,7 +75,7 @@ class RegisterEmployerView(generics.CreateAPIView):
 class WorkerLoginView(generics.GenericAPIView):
     serializer_class = LoginWorkerSerializer
     permission_classes = [AllowAny]
-    authentication_classes = [CsrfExemptSessionAuthentication, TokenAuthentication]
+    authentication_classes = [CsrfExemptSessionAuthentication, ExpiringTokenAuthentication]
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -95,7 +94,7 @@ class WorkerLoginView(generics.GenericAPIView):
 class EmployerLoginView(generics.GenericAPIView):
     serializer_class = LoginEmployerSerializer
     permission_classes = [AllowAny]
-    authentication_classes = [CsrfExemptSessionAuthentication, TokenAuthentication]
+    authentication_classes = [CsrfExemptSessionAuthentication, ExpiringTokenAuthentication]
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -113,7 +112,7 @@ class EmployerLoginView(generics.GenericAPIView):
 class AdminLoginView(generics.GenericAPIView):
     permission_classes = [AllowAny]
     serializer_class = LoginAdminSerializer  
-    authentication_classes = [CsrfExemptSessionAuthentication, TokenAuthentication]
+    authentication_classes = [CsrfExemptSessionAuthentication, ExpiringTokenAuthentication]
 
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
@@ -129,7 +128,7 @@ class AdminLoginView(generics.GenericAPIView):
 
 class LogoutView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
-    authentication_classes = [CsrfExemptSessionAuthentication, TokenAuthentication]
+    authentication_classes = [CsrfExemptSessionAuthentication, ExpiringTokenAuthentication]
 
     def post(self, request):
         if request.auth:
@@ -142,7 +141,7 @@ class LogoutView(generics.GenericAPIView):
 
 class PasswordResetRequestView(APIView):
     permission_classes = [AllowAny]
-    authentication_classes = [CsrfExemptSessionAuthentication, TokenAuthentication]
+    authentication_classes = [CsrfExemptSessionAuthentication, ExpiringTokenAuthentication]
 
     def post(self, request):
         email = request.data.get('email')
@@ -153,22 +152,18 @@ class PasswordResetRequestView(APIView):
             uid = urlsafe_base64_encode(force_bytes(user.pk))
             reset_url = f"{settings.FRONTEND_URL}/reset-password/{uid}/{token}"
             
-            try:
-                send_mail(
-                    "Password Reset Request",
-                    f"Click the link below to reset your password:\n{reset_url}",
-                    settings.DEFAULT_FROM_EMAIL,
-                    [email],
-                    fail_silently=False,
-                )
-            except Exception as e:
-                return Response({"error": f"Mail system error: {str(e)}"}, status=500)
+            # Queued for the outbox worker so a slow mail API can't stall the request
+            enqueue_email(
+                "Password Reset Request",
+                f"Click the link below to reset your password:\n{reset_url}",
+                [email],
+            )
         
         return Response({"message": "If an account exists, a link has been sent."}, status=200)
 
 class PasswordResetConfirmView(APIView):
     permission_classes = [AllowAny]
-    authentication_classes = [CsrfExemptSessionAuthentication, TokenAuthentication]
+    authentication_classes = [CsrfExemptSessionAuthentication, ExpiringTokenAuthentication]
 
     def post(self, request, uidb64, token):
         try:
@@ -188,7 +183,7 @@ class PasswordResetConfirmView(APIView):
 
 class SoftDeleteUserView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
-    authentication_classes = [CsrfExemptSessionAuthentication, TokenAuthentication]
+    authentication_classes = [CsrfExemptSessionAuthentication, ExpiringTokenAuthentication]
 
     def patch(self, request, user_id):
         try:
@@ -206,7 +201,7 @@ class SoftDeleteUserView(APIView):
 
 class PermanentDeleteUserView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
-    authentication_classes = [CsrfExemptSessionAuthentication, TokenAuthentication]
+    authentication_classes = [CsrfExemptSessionAuthentication, ExpiringTokenAuthentication]
 
     def delete(self, request, user_id):
         confirm = request.query_params.get("confirm")
@@ -227,7 +222,7 @@ class PermanentDeleteUserView(APIView):
 
 class DeactivateMyAccountView(APIView):
     permission_classes = [IsAuthenticated]
-    authentication_classes = [CsrfExemptSessionAuthentication, TokenAuthentication]
+    authentication_classes = [CsrfExemptSessionAuthentication, ExpiringTokenAuthentication]
 
     def patch(self, request):
         user = request.user
@@ -1,5 +1,5 @@
 from django.contrib.auth import get_user_model, update_session_auth_hash
-from django.db.models import Count, Q
+from django.db.models import Count, Q, OuterRef, Subquery
 from rest_framework import generics, status, permissions, viewsets, filters as drf_filters
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
@@ -8,22 +8,45 @@ from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from django.conf import settings
-from ..models import VerificationLog, Booking
+from ..models import VerificationLog, Booking, BookingTombstone
 from ..serializers import (
-     WorkerSerializer
+     BookingHistoryFilterSerializer, WorkerSerializer
 )
-from ..utils import send_verification_email
+from ..utils import send_verification_email, parse_salary
+from ..caching import cache_directory_page, directory_page_key, get_directory_page
+from ..conditional import conditional
+from ..outbox import enqueue_email
+from ..pagination import BookingKeysetPagination, UserKeysetPagination
+from ..search import MAX_SEARCH_TERMS, search_workers
+from ..feeds import employer_history
+from ..sync import changes_since, start_cursor, with_start_cursor
+from .. import bookings
 from django.shortcuts import get_object_or_404
-from django.db import transaction
-from django.core.mail import EmailMultiAlternatives
+from django.db import IntegrityError, transaction
 from django.utils.html import strip_tags
 
 User = get_user_model()
 
-class EmployerDashboardViewSet(viewsets.ViewSet):
+
+def release_worker_response(request, booking_id):
+    """Completes an accepted booking and frees the worker (guarded, see users/bookings.py)"""
+    try:
+        worker = bookings.complete(booking_id, request.user)
+    except bookings.BookingNotFound as e:
+        return Response({"error": str(e)}, status=404)
+    except bookings.BookingConflict as e:
+        return Response({"error": str(e)}, status=409)
+    return Response({
+        "message": f"{worker.first_name} has been released and is now available for others."
+    })
+
+
+class EmployerDashboardViewSet(viewsets.GenericViewSet):
     permission_classes = [IsAuthenticated]
+    pagination_class = BookingKeysetPagination
 
     @action(detail=False, methods=['get'])
+    @conditional(lambda request: f'employer-bookings:{request.user.pk}')
     def stats(self, request):
         if request.user.role != 'employer':
             return Response({"error": "Unauthorized"}, status=403)
@@ -34,56 +57,32 @@ class EmployerDashboardViewSet(viewsets.ViewSet):
 
     @action(detail=True, methods=['post'])
     def release_worker(self, request, pk=None):
-        # Find the active booking
-        booking = get_object_or_404(Booking, id=pk, employer=request.user, status='accepted')
-        
-        # 1. Update Booking Status
-        booking.status = 'completed'
-        booking.save()
-        
-        # 2. Make Worker Available again
-        worker = booking.worker
-        worker.is_available = True
-        worker.current_employer = None
-        worker.save()
-        
-        return Response({
-            "message": f"{worker.first_name} has been released and is now available for others."
-        })
+        return release_worker_response(request, pk)
     
 
-    @action(detail=False, methods=['get'])
-    def my_requests(self, request):
-        bookings = Booking.objects.filter(employer=request.user).select_related('worker')
-        data = [{
-            "id": b.id,
-            "worker_name": f"{b.worker.first_name} {b.worker.last_name}",
-            "status": b.status,
-            "date": b.created_at,
-            "worker_phone": b.worker.phone if b.status == 'accepted' else "Locked"
-        } for b in bookings]
-        return Response(data)
-    
-    
     @action(detail=False, methods=['get'])
     def history(self, request):
-        """Returns all hiring requests made by the current employer"""
-        bookings = Booking.objects.filter(employer=request.user).order_by('-created_at')
-        
-        data = []
-        for b in bookings:
-            data.append({
-                "id": b.id,
-                "worker_id": b.worker.id,
-                "worker_name": f"{b.worker.first_name} {b.worker.last_name}",
-                "worker_type": b.worker.worker_type.replace('_', ' ') if b.worker.worker_type else "General",
-                "status": b.status,
-                "date": b.created_at.strftime("%d %b %Y"),
-                # Only show phone if worker accepted
-                "worker_phone": b.worker.phone if b.status == 'accepted' else None,
-                "location": b.worker.location
-            })
-        return Response(data)
+        """Hiring requests made by the current employer, paginated and filterable by status; ?since= for changes only"""
+        filters = BookingHistoryFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        statuses = filters.validated_data.get('status')
+        since = filters.validated_data.get('since')
+        if since:
+            # Bookings whose status left the filter come back as deleted (users/sync.py)
+            tombstones = BookingTombstone.objects.filter(employer_id=request.user.pk)
+            return changes_since(
+                employer_history(request.user), tombstones, since, self.paginator.get_page_size(request),
+                matching=Q(status__in=statuses) if statuses else None,
+            )
+        bookings = employer_history(request.user, statuses=statuses)
+        cursor = start_cursor()
+        return with_start_cursor(self.get_paginated_response(self.paginate_queryset(bookings)), cursor)
+
+    @action(detail=False, methods=['get'])
+    def my_requests(self, request):
+        # Older route used by EmployerHires; same feed as history
+        return self.history(request)
+
     @action(detail=True, methods=['delete'])
     def remove_history(self, request, pk=None):
         # Only allow deleting if the booking belongs to the employer 
@@ -100,76 +99,106 @@ class WorkerViewSet(viewsets.ReadOnlyModelViewSet):
     """View used by Employers to find Workers"""
     permission_classes = [IsAuthenticated]
     serializer_class = WorkerSerializer # Use the one with 'my_request_status'
+    pagination_class = UserKeysetPagination
+    keyset_ordering = None
+
+    def get_filters(self):
+        """
+        The directory filters in canonical form: defaults dropped, salaries parsed,
+        search words lowercased (matching is case-insensitive anyway). Equivalent
+        query strings therefore share one directory cache entry.
+        """
+        params = self.request.query_params
+
+        def choice(name):
+            value = (params.get(name) or '').strip()
+            return value if value and value != 'all' else None
+
+        return {
+            # Only the literal default 'false' hides unavailable workers
+            'show_unavailable': params.get('show_unavailable', 'false') != 'false',
+            'worker_type': choice('worker_type'),
+            'experience': choice('experience'),
+            'min_salary': parse_salary(params.get('min_salary')),
+            'max_salary': parse_salary(params.get('max_salary')),
+            'search': ' '.join((params.get('search') or '').lower().split()[:MAX_SEARCH_TERMS]) or None,
+            'location': (params.get('location') or '').strip().lower() or None,
+        }
+
+    def with_request_status(self, queryset):
+        # Resolve the viewer's request status for every worker in the same query
+        # (WorkerSerializer.get_my_request_status reads this instead of querying per card)
+        latest_request = Booking.objects.filter(
+            employer=self.request.user, worker=OuterRef('pk')
+        ).order_by('-created_at', '-id').values('status')[:1]
+        return queryset.annotate(viewer_request_status=Subquery(latest_request))
 
     def get_queryset(self):
-        # 1. Start with basic filtered queryset
+        filters = self.get_filters()
         queryset = User.objects.filter(role='worker', is_deleted=False)
-        params = self.request.query_params
-        
-        # 2. Extract Filters
-        location = params.get('location')
-        worker_type = params.get('worker_type')
-        search = params.get('search')
-        min_salary = params.get('min_salary')
-        max_salary = params.get('max_salary')
-        experience = params.get('experience')
-
-        show_unavailable = self.request.query_params.get('show_unavailable', 'false')
-        if show_unavailable == 'false':
+        if not filters['show_unavailable']:
             queryset = queryset.filter(is_available=True)
 
-        # 3. Apply Filtering
-        if location: 
-            queryset = queryset.filter(location__icontains=location)
-        if worker_type and worker_type != 'all': 
-            queryset = queryset.filter(worker_type=worker_type)
-        if search:
-            queryset = queryset.filter(Q(first_name__icontains=search) | Q(last_name__icontains=search))
-        
-        # NOTE: Since expected_salary is a CharField, __gte might fail on some DBs.
-        # It is better to cast to integer if possible, but here is the standard filter:
-        if min_salary: 
-            queryset = queryset.filter(expected_salary__gte=min_salary)
-        if max_salary: 
-            queryset = queryset.filter(expected_salary__lte=max_salary)
-        
-        # Experience is a ChoiceField (string), __gte won't work logically. 
-        # Usually, you filter for exact match on choices:
-        if experience and experience != 'all':
-            queryset = queryset.filter(experience=experience)
+        if filters['worker_type']:
+            queryset = queryset.filter(worker_type=filters['worker_type'])
+
+        # expected_salary is an integer column, so these are numeric range scans
+        # served by worker_available_salary_idx. Unparseable bounds are ignored.
+        if filters['min_salary'] is not None:
+            queryset = queryset.filter(expected_salary__gte=filters['min_salary'])
+        if filters['max_salary'] is not None:
+            queryset = queryset.filter(expected_salary__lte=filters['max_salary'])
+
+        # Experience is a ChoiceField (string), so it is an exact match on the choice
+        if filters['experience']:
+            queryset = queryset.filter(experience=filters['experience'])
+
+        queryset = self.with_request_status(queryset)
+
+        # Name/location search (trigram-indexed and typo tolerant on Postgres, see users/search.py).
+        # Matches are ranked, so the keyset paginator orders by rank before recency.
+        if filters['search'] or filters['location']:
+            queryset = search_workers(queryset, search=filters['search'], location=filters['location'])
+            self.keyset_ordering = ('-search_rank', '-date_joined', '-id')
+
+        return queryset.order_by(*(self.keyset_ordering or ('-date_joined', '-id')))
+
+    def list(self, request, *args, **kwargs):
+        # Pages are cached as worker ids (users/caching.py); the rows and the viewer's
+        # request status are always read fresh, in one query by primary key. Only
+        # bounded pages are cached, so a hit never looks up more than one page of ids.
+        paginator = self.paginator
+        page_size = paginator.get_page_size(request)
+        key = directory_page_key({
+            **self.get_filters(),
+            'cursor': request.query_params.get(paginator.cursor_query_param),
+            'page_size': page_size,
+        })
+        cached = get_directory_page(key, page_size)
+        if cached is None:
+            workers = self.paginate_queryset(self.get_queryset())
+            cache_directory_page(key, [w.pk for w in workers], paginator.next_position, page_size)
+        else:
+            ids, next_position = cached
+            found = {w.pk: w for w in self.with_request_status(User.objects.filter(pk__in=ids))}
+            workers = [found[pk] for pk in ids if pk in found]
+            paginator.resume_page(request, next_position)
 
-        return queryset.order_by('-date_joined')
+        serializer = self.get_serializer(workers, many=True)
+        return self.get_paginated_response(serializer.data)
     @action(detail=True, methods=['post'])
     def release_worker(self, request, pk=None):
-        # Find the active booking
-        booking = get_object_or_404(Booking, id=pk, employer=request.user, status='accepted')
-        
-        # 1. Update Booking Status
-        booking.status = 'completed'
-        booking.save()
-        
-        # 2. Make Worker Available again
-        worker = booking.worker
-        worker.is_available = True
-        worker.current_employer = None
-        worker.save()
-        
-        return Response({
-            "message": f"{worker.first_name} has been released and is now available for others."
-        })
+        return release_worker_response(request, pk)
 
     @action(detail=True, methods=['post'])
     def accept_booking(self, request, pk=None):
-        booking = self.get_object()
-        booking.status = 'accepted'
-        booking.save()
-
-        # Automatically set worker to unavailable
-        worker = booking.worker
-        worker.is_available = False
-        worker.current_employer = booking.employer
-        worker.save()
-        
+        # pk is the booking, accepted by the worker it was sent to (same as respond_to_request)
+        try:
+            bookings.accept(pk, request.user)
+        except bookings.BookingNotFound as e:
+            return Response({"error": str(e)}, status=404)
+        except bookings.BookingConflict as e:
+            return Response({"error": str(e)}, status=409)
         return Response({"message": "You are now hired!"})
 
     @action(detail=True, methods=['post'])
@@ -188,15 +217,7 @@ class WorkerViewSet(viewsets.ReadOnlyModelViewSet):
         if existing:
             return Response({"error": "You already have a pending request with this worker."}, status=400)
 
-        # Create the booking
-        Booking.objects.create(
-            employer=request.user, 
-            worker=worker_user, 
-            status='pending'
-        )
         subject = "New Hire Request - Kykam Agencies"
-        from_email = settings.DEFAULT_FROM_EMAIL
-        to = worker_user.email
 
         # HTML Body (This looks better to the user)
         html_content = f"""
@@ -210,15 +231,18 @@ class WorkerViewSet(viewsets.ReadOnlyModelViewSet):
         # Plain text version (Crucial for avoiding spam filters)
         text_content = strip_tags(html_content)
 
+        # The booking and its notification commit together; the outbox worker does the sending
         try:
-            msg = EmailMultiAlternatives(subject, text_content, from_email, [to])
-            msg.attach_alternative(html_content, "text/html")
-            msg.send(fail_silently=False)
-            print(f"--- SUCCESS: Hire request email sent to {to} via SendGrid ---")
-            print(f"email sending is {from_email}")
-        except Exception as e:
-            # We log the error but don't break the response for the user
-            print(f"--- SENDGRID ERROR: {str(e)} ---")
+            with transaction.atomic():
+                Booking.objects.create(
+                    employer=request.user, 
+                    worker=worker_user, 
+                    status='pending'
+                )
+                enqueue_email(subject, text_content, [worker_user.email], html_body=html_content)
+        except IntegrityError:
+            # A concurrent request won the race; unique_active_booking allows one pending request per pair
+            return Response({"error": "You already have a pending request with this worker."}, status=400)
 
         return Response({"message": "Hire request sent successfully!"})
 
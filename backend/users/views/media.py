@@ -0,0 +1,28 @@
+import time
+
+from django.http import Http404
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import AllowAny
+from rest_framework.views import APIView
+
+from ..media import is_protected_name, owned_files, protected_storage, send_file, signature_expiry
+
+
+class ProtectedMediaView(APIView):
+    """Identity documents: a signed URL, an admin, or the owning worker (see users/media.py)"""
+    permission_classes = [AllowAny]
+
+    def get(self, request, name):
+        if not is_protected_name(name):
+            raise Http404
+
+        expires = signature_expiry(name, request.query_params)
+        user = request.user
+        if expires is None and not (user.is_authenticated and (user.is_staff or name in owned_files(user))):
+            raise PermissionDenied("You do not have access to this file.")
+
+        if not protected_storage.exists(name):
+            raise Http404
+        # Signed URLs may be cached until they expire; token-authenticated reads are revalidated
+        max_age = int(expires - time.time()) if expires is not None else 0
+        return send_file(protected_storage, name, max_age)
@@ -8,11 +8,17 @@ from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 
-from ..models import VerificationLog, Booking
+from ..models import VerificationLog, Booking, BookingTombstone
 from ..serializers import (
      WorkerSerializer
 )
-from ..utils import send_verification_email
+from ..utils import send_verification_email, parse_salary
+from ..pagination import BookingKeysetPagination
+from .. import bookings
+from ..feeds import invite_feed
+from ..sync import changes_since, start_cursor, with_start_cursor
+from ..conditional import conditional
+from ..media import signing_window
 from django.shortcuts import get_object_or_404
 from django.db import transaction
 
@@ -22,16 +28,30 @@ User = get_user_model()
 # WORKER DASHBOARD & DIRECTORY
 # -----------------------------------------------------------
 
-class WorkerDashboardViewSet(viewsets.ViewSet):
+def job_invites_response(view, request):
+    """Shared by the dashboard and worker-requests invite routes: one query per page; ?since= for changes only."""
+    since = request.query_params.get('since')
+    if since:
+        tombstones = BookingTombstone.objects.filter(worker_id=request.user.pk)
+        return changes_since(invite_feed(request.user), tombstones, since, view.paginator.get_page_size(request))
+    cursor = start_cursor()
+    invites = view.paginate_queryset(invite_feed(request.user))
+    return with_start_cursor(view.get_paginated_response(invites), cursor)
+
+
+class WorkerDashboardViewSet(viewsets.GenericViewSet):
     permission_classes = [IsAuthenticated]
+    pagination_class = BookingKeysetPagination
 
+    # The body carries signed document URLs, so the tag also rolls over with their signing period
     @action(detail=False, methods=['get'])
+    @conditional(lambda request: f'user:{request.user.pk}', vary=lambda request: signing_window())
     def profile_status(self, request):
         user = request.user
         if user.role != 'worker':
             return Response({"error": "Not a worker"}, status=403)
         
-        latest_log = VerificationLog.objects.filter(worker=user).order_by('-created_at').first()
+        latest_log = VerificationLog.objects.filter(worker=user).order_by('-created_at', '-id').first()
         
         data = {
             "first_name": user.first_name,
@@ -60,11 +80,14 @@ class WorkerDashboardViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['patch'], parser_classes=[MultiPartParser, FormParser])
     def update_profile(self, request):
         user = request.user
-        editable_text_fields = ['location', 'worker_type', 'experience', 'kin_name', 'kin_phone', 'expected_salary']
+        editable_text_fields = ['location', 'worker_type', 'experience', 'kin_name', 'kin_phone']
         
         for field in editable_text_fields:
             if field in request.data:
                 setattr(user, field, request.data[field])
+
+        if 'expected_salary' in request.data:
+            user.expected_salary = parse_salary(request.data['expected_salary'])
         
         if 'passport_img' in request.FILES:
             user.passport_img = request.FILES['passport_img']
@@ -90,22 +113,7 @@ class WorkerDashboardViewSet(viewsets.ViewSet):
         return Response({"message": "Password updated successfully"})
     @action(detail=False, methods=['get'], url_path='job_invites')
     def job_invites(self, request):
-        invites = Booking.objects.filter(worker=request.user).order_by('-created_at')
-        data = [{
-            "id": i.id,
-            "employer_name": f"{i.employer.first_name} {i.employer.last_name}",
-            "location": i.employer.location,
-            "status": i.status,
-            "salary": i.employer.salary,
-            "family_size": i.employer.family_size,
-            "employer_phone": i.employer.phone,
-            "start_date": i.employer.start_date,
-            "requirements": i.employer.requirements,
-            "created_at": i.created_at
-        } for i in invites]
-        return Response(data)
-
-from django.db.models import Q
+        return job_invites_response(self, request)
 
 # -----------------------------------------------------------
 # 2. THE BOOKINGS (For Workers to see and respond to invites)
@@ -113,69 +121,33 @@ from django.db.models import Q
 class WorkerBookingViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     queryset = Booking.objects.all()
+    pagination_class = BookingKeysetPagination
 
     # This fixes the 404 for /api/worker-requests/job_invites/
     @action(detail=False, methods=['get'], url_path='job_invites')
     def job_invites(self, request):
-        invites = Booking.objects.filter(worker=request.user).order_by('-created_at')
-        data = [{
-            "id": i.id,
-            "employer_name": f"{i.employer.first_name} {i.employer.last_name}",
-            "location": i.employer.location,
-            "status": i.status,
-            "salary": i.employer.salary,
-            "age": i.employer.age,
-            "family_size": i.employer.family_size,
-            "employer_phone": i.employer.phone,
-            "requirements": i.employer.requirements,
-            "start_date": i.employer.start_date,
-            "created_at": i.created_at,
-           
-        } for i in invites]
-        return Response(data)
+        return job_invites_response(self, request)
+
     @action(detail=False, methods=['get'], url_path='my_invites')
     def my_invites(self, request):
-        # We can just call the same logic as above
-        return WorkerDashboardViewSet.job_invites(self, request)
-
-   
+        return job_invites_response(self, request)
 
     @action(detail=True, methods=['post'])
     def respond_to_request(self, request, pk=None):
-        # Use a transaction to ensure either everything updates or nothing does
-        with transaction.atomic():
-            # 1. Locate the specific pending request for this worker
-            booking = get_object_or_404(Booking, id=pk, worker=request.user, status='pending')
-            new_status = request.data.get('status')
-
+        # Guarded transitions (users/bookings.py): a double accept gets a 409, not a second hire
+        new_status = request.data.get('status')
+        try:
             if new_status == 'accepted':
-                worker = booking.worker
-                
-                # 2. Update Worker to "Booked"
-                worker.is_available = False
-                worker.current_employer = booking.employer
-                worker.save()
-
-                # 3. Mark the current booking as Accepted
-                booking.status = 'accepted'
-                booking.save()
-
-                # 4. AUTO-DECLINE: Cancel all other pending requests for this worker
-                # This prevents other employers from being "stuck" waiting for a response
-                other_requests = Booking.objects.filter(
-                    worker=worker, 
-                    status='pending'
-                ).exclude(id=booking.id)
-                
-                other_requests.update(status='declined')
-
+                bookings.accept(pk, request.user)
                 return Response({
                     "message": "Job accepted. Other pending requests have been automatically declined."
                 })
-
             elif new_status == 'declined':
-                booking.status = 'declined'
-                booking.save()
+                bookings.decline(pk, request.user)
                 return Response({"message": "Request declined."})
+        except bookings.BookingNotFound as e:
+            return Response({"error": str(e)}, status=404)
+        except bookings.BookingConflict as e:
+            return Response({"error": str(e)}, status=409)
 
         return Response({"error": "Invalid status choice."}, status=400)
@@ -0,0 +1,66 @@
+import { useEffect, useRef } from 'react';
+
+const VITE_API_BASE_URL = import.meta.env.VITE_API_BASE_URL;
+
+export type BookingEvent = {
+  type: 'booking';
+  event: 'created' | 'updated' | 'deleted';
+  booking: { id: number; employer_id: number; worker_id: number; status: string };
+};
+
+// Close code the server uses for a missing, expired or revoked token (users/consumers.py)
+const UNAUTHORIZED = 4401;
+
+const socketUrl = () => {
+  const base = VITE_API_BASE_URL || window.location.origin;
+  return `${base.replace(/^http/, 'ws')}/ws/notifications/`;
+};
+
+/**
+ * Calls `onEvent` whenever one of the signed-in user's bookings is created,
+ * changes status or is deleted, so lists can refetch instead of polling.
+ * Reconnects with backoff and fires `onEvent(null)` after a reconnect, since
+ * events sent while offline are lost.
+ */
+export const useBookingEvents = (onEvent: (event: BookingEvent | null) => void) => {
+  const handler = useRef(onEvent);
+  handler.current = onEvent;
+
+  useEffect(() => {
+    const token = localStorage.getItem('token');
+    if (!token) return;
+
+    let socket: WebSocket | null = null;
+    let retry: ReturnType<typeof setTimeout>;
+    let attempts = 0;
+    let stopped = false;
+
+    const connect = () => {
+      const current = new WebSocket(socketUrl());
+      socket = current;
+      // The token goes in the first message rather than the URL, which ends up in access logs
+      current.onopen = () => current.send(JSON.stringify({ type: 'auth', token }));
+      current.onmessage = (message) => {
+        const data = JSON.parse(message.data);
+        if (data.type === 'auth') {
+          if (attempts > 0) handler.current(null);
+          attempts = 0;
+          return;
+        }
+        handler.current(data);
+      };
+      current.onclose = (close) => {
+        if (stopped || close.code === UNAUTHORIZED) return;
+        attempts += 1;
+        retry = setTimeout(connect, Math.min(1000 * 2 ** attempts, 30000));
+      };
+    };
+    connect();
+
+    return () => {
+      stopped = true;
+      clearTimeout(retry);
+      socket?.close();
+    };
+  }, []);
+};
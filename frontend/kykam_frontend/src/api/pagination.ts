@@ -0,0 +1,48 @@
+import axios, { AxiosInstance, AxiosRequestConfig } from 'axios';
+
+// Rows per request; the server caps it at API_MAX_PAGE_SIZE (users/pagination.py)
+export const PAGE_SIZE = 100;
+
+export type Page<T> = { rows: T[]; next: string | null };
+
+/**
+ * Cursor of the next page, read from the `Link: <...>; rel="next"` header that
+ * paginated list endpoints send, or null on the last page. Only the cursor is
+ * kept, so the next request reuses the caller's own URL and params.
+ */
+export const nextCursor = (link?: string | null): string | null => {
+  const match = link?.match(/<([^>]+)>;\s*rel="next"/);
+  if (!match) return null;
+  return new URL(match[1], window.location.origin).searchParams.get('cursor');
+};
+
+/** One page of a list endpoint, starting at `cursor` (the first page when null). */
+export const getPage = async <T>(
+  url: string,
+  config: AxiosRequestConfig = {},
+  cursor: string | null = null,
+  pageSize = PAGE_SIZE,
+  client: AxiosInstance = axios,
+): Promise<Page<T>> => {
+  const res = await client.get<T[]>(url, {
+    ...config,
+    params: { ...config.params, page_size: pageSize, cursor: cursor || undefined },
+  });
+  return { rows: res.data, next: nextCursor(res.headers.link) };
+};
+
+/** Every row of a list endpoint, fetched one bounded page at a time. */
+export const getAllPages = async <T>(
+  url: string,
+  config: AxiosRequestConfig = {},
+  client: AxiosInstance = axios,
+): Promise<T[]> => {
+  const rows: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const page: Page<T> = await getPage<T>(url, config, cursor, PAGE_SIZE, client);
+    rows.push(...page.rows);
+    cursor = page.next;
+  } while (cursor);
+  return rows;
+};
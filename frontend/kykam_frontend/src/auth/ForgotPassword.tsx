@@ -8,7 +8,8 @@ export default function ForgotPassword() {
   const onFinish = async (values: { email: string }) => {
     setLoading(true);
     try {
-      await api.post("/password-reset-request/", values);
+      // No session token: a stale one would be rejected as expired
+      await api.post("/password-reset-request/", values, { headers: { Authorization: "" } });
       message.success("Check your email for the reset link!");
     } catch (err) {
       message.error("Failed to send reset link.");
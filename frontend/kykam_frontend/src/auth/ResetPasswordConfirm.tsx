@@ -8,7 +8,8 @@ export default function ResetPasswordConfirm() {
 
   const onFinish = async (values: any) => {
     try {
-      await api.post(`/password-reset-confirm/${uid}/${token}/`, { password: values.password });
+      // No session token: a stale one would be rejected as expired
+      await api.post(`/password-reset-confirm/${uid}/${token}/`, { password: values.password }, { headers: { Authorization: "" } });
       message.success("Password updated! Please login.");
       navigate("/login/worker"); // or a generic login choice
     } catch (err) {
@@ -9,6 +9,8 @@ import {
   UnlockOutlined, CheckCircleOutlined, ReloadOutlined, SafetyCertificateOutlined
 } from '@ant-design/icons';
 import axios from 'axios';
+import { useBookingEvents } from '../../api/bookingEvents';
+import { getAllPages } from '../../api/pagination';
 
 const { Title, Text } = Typography;
 const API = import.meta.env.VITE_API_BASE_URL;
@@ -21,10 +23,10 @@ const EmployerHires = () => {
     try {
       setLoading(true);
       const token = localStorage.getItem('token');
-      const res = await axios.get(`${API}/api/employer-dashboard/my_requests/`, {
+      const requests = await getAllPages<any>(`${API}/api/employer-dashboard/my_requests/`, {
         headers: { Authorization: `Token ${token}` }
       });
-      setData(res.data);
+      setData(requests);
     } catch (err) {
       message.error("Failed to load your request history");
     } finally {
@@ -36,6 +38,9 @@ const EmployerHires = () => {
     fetchMyRequests();
   }, []);
 
+  // Accepts and declines show up without a manual refresh
+  useBookingEvents(() => fetchMyRequests());
+
   const handleDelete = async (bookingId: number) => {
     try {
       const token = localStorage.getItem('token');
@@ -111,7 +116,7 @@ const EmployerHires = () => {
     },
     {
       title: 'Initiated',
-      dataIndex: 'date',
+      dataIndex: 'created_at',
       key: 'date',
       render: (date: string) => (
         <div className="flex flex-col">
@@ -242,7 +247,7 @@ const EmployerHires = () => {
                   <div className="flex justify-between items-center bg-white p-3 rounded-xl border border-slate-100 mb-4">
                     <div className="text-[10px] text-slate-400 uppercase font-bold tracking-tighter">Request Date</div>
                     <div className="text-xs font-bold text-slate-600">
-                      {new Date(record.date).toLocaleDateString('en-GB', { day: '2-digit', month: 'short' })}
+                      {new Date(record.created_at).toLocaleDateString('en-GB', { day: '2-digit', month: 'short' })}
                     </div>
                   </div>
 
@@ -9,6 +9,7 @@ import {
   InfoCircleOutlined, EnvironmentOutlined,
 } from "@ant-design/icons";
 import axios from "axios";
+import { getPage } from "../../api/pagination";
 import EmployerHires from "./EmployerHires";
 import AccountSettings from "./AccountSettings";
 
@@ -17,7 +18,9 @@ const { Option } = Select;
 const API = import.meta.env.VITE_API_BASE_URL;
 
 const EmployerDashboard = () => {
-  const [workers, setWorkers] = useState([]);
+  const [workers, setWorkers] = useState<any[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [stats, setStats] = useState({ total_sent: 0, accepted: 0 });
   const [isFilterOpen, setIsFilterOpen] = useState(false);
@@ -34,7 +37,7 @@ const EmployerDashboard = () => {
       const headers = { Authorization: `Token ${token}` };
 
       // 1. Fetch Workers with active query params
-      const workerRes = await axios.get(`${API}/api/workers/`, {
+      const workerPage = await getPage<any>(`${API}/api/workers/`, {
         headers,
         // params: {
         //   search: search || undefined,
@@ -43,7 +46,8 @@ const EmployerDashboard = () => {
         //   max_salary: salaryRange[1],
         // }
       });    
-      setWorkers(workerRes.data);
+      setWorkers(workerPage.rows);
+      setNextCursor(workerPage.next);
 
       // 2. Fetch Stats
       const statsRes = await axios.get(`${API}/api/employer-dashboard/stats/`, {
@@ -57,6 +61,22 @@ const EmployerDashboard = () => {
     }
   }, [search, category, salaryRange]);
 
+  const loadMoreWorkers = async () => {
+    try {
+      setLoadingMore(true);
+      const token = localStorage.getItem("token");
+      const page = await getPage<any>(`${API}/api/workers/`, {
+        headers: { Authorization: `Token ${token}` },
+      }, nextCursor);
+      setWorkers((current) => [...current, ...page.rows]);
+      setNextCursor(page.next);
+    } catch (err: any) {
+      message.error("Failed to load more workers");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchData();
   }, [fetchData]);
@@ -161,7 +181,7 @@ const EmployerDashboard = () => {
                       <div className="flex flex-col items-center text-center">
                         <Avatar
                           size={80}
-                          src={worker.passport_img}
+                          src={worker.passport_thumb || worker.passport_img}
                           icon={<UserOutlined />}
                           className={`border-4 border-slate-50 shadow-sm ${!worker.is_available ? 'grayscale' : ''}`}
                         />
@@ -221,6 +241,13 @@ const EmployerDashboard = () => {
             </Row>
             
           )}
+          {!loading && nextCursor && (
+            <div className="text-center mt-8">
+              <Button onClick={loadMoreWorkers} loading={loadingMore} className="rounded-xl h-10 px-8">
+                Load More Workers
+              </Button>
+            </div>
+          )}
         </>
       ),
     },
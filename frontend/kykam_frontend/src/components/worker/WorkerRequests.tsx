@@ -22,6 +22,8 @@ import {
   ReloadOutlined,
 } from '@ant-design/icons'
 import axios from 'axios'
+import { useBookingEvents } from '../../api/bookingEvents'
+import { getAllPages } from '../../api/pagination'
 
 const { Title, Text } = Typography
 const API = import.meta.env.VITE_API_BASE_URL;
@@ -39,10 +41,10 @@ const WorkerRequests = () => {
   const fetchRequests = async () => {
     try {
       const token = localStorage.getItem('token')
-      const res = await axios.get(`${API}/api/worker-requests/my_invites/`, {
+      const invites = await getAllPages<any>(`${API}/api/worker-requests/my_invites/`, {
         headers: { Authorization: `Token ${token}` },
       })
-      setRequests(res.data)
+      setRequests(invites)
     } catch {
       message.error('Failed to load requests')
     } finally {
@@ -54,6 +56,9 @@ const WorkerRequests = () => {
     fetchRequests()
   }, [])
 
+  // New invites and withdrawals show up without a manual refresh
+  useBookingEvents(() => fetchRequests())
+
   const handleResponse = async (
     id: number,
     status: 'accepted' | 'declined'
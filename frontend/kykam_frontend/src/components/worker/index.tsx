@@ -11,6 +11,7 @@ import {
 
 // --- CUSTOM IMPORTS ---
 import api from "../../api/axios"; 
+import { getAllPages } from "../../api/pagination";
 import { useAuth } from "../../context/AuthContext";
 import EditProfileDrawer from "./EditProfileDrawer";
 import AccountSettings from "./AccountSettings";
@@ -34,8 +35,7 @@ const WorkerDashboard = () => {
 
   const fetchInvites = useCallback(async () => {
     try {
-      const res = await api.get('worker-requests/my_invites/');
-      setInvites(res.data);
+      setInvites(await getAllPages<any>('worker-requests/my_invites/', {}, api));
     } catch (err) {
       console.error("Error fetching invites:", err);
     }
@@ -71,6 +71,8 @@ export const AuthProvider = ({ children }: { children: ReactNode }) => {
   // 2. Login Logic
   const login = async ({ phone, password, type }: LoginCredentials) => {
     try {
+      // A new session: don't send a stale (possibly expired) token with the credentials
+      delete api.defaults.headers.common['Authorization'];
       const { data } = await api.post(`/login/${type}/`, { phone, password });
 
       const authUser: User = {
@@ -100,6 +102,7 @@ export const AuthProvider = ({ children }: { children: ReactNode }) => {
   const register = async ({ type, payload }: RegisterRequest) => {
     try {
       // Axios automatically sets 'Content-Type': 'multipart/form-data' if payload is FormData
+      delete api.defaults.headers.common['Authorization'];
       await api.post(`/register/${type}/`, payload);
       
       message.success('Registration Successful! Please login.');
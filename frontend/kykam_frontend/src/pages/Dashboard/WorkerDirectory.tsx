@@ -19,6 +19,7 @@ import {
   VerifiedOutlined,
 } from '@ant-design/icons'
 import axios from 'axios'
+import { getPage } from '../../api/pagination'
 
 const { Search } = Input
 const { Option } = Select
@@ -32,6 +33,8 @@ const WorkerDirectory = () => {
   const [searchParams, setSearchParams] = useSearchParams()
 
   const [workers, setWorkers] = useState<any[]>([])
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [loading, setLoading] = useState(true)
 
   // URL-synced state
@@ -42,12 +45,14 @@ const WorkerDirectory = () => {
     searchParams.get('type') || 'all'
   )
 
-  const fetchWorkers = async () => {
+  // Pages of the directory; `cursor` null loads the first page and replaces the list
+  const fetchWorkers = async (cursor: string | null = null) => {
     try {
-      setLoading(true)
+      if (cursor) setLoadingMore(true)
+      else setLoading(true)
       const token = localStorage.getItem('token')
 
-      const res = await axios.get(`${API}/api/workers/`, {
+      const page = await getPage<any>(`${API}/api/workers/`, {
         headers: {
           Authorization: `Token ${token}`, // change to Bearer if using JWT
         },
@@ -55,13 +60,15 @@ const WorkerDirectory = () => {
           worker_type: category !== 'all' ? category : undefined,
           search: searchTerm || undefined,
         },
-      })
+      }, cursor)
 
-      setWorkers(res.data)
+      setWorkers((current) => (cursor ? [...current, ...page.rows] : page.rows))
+      setNextCursor(page.next)
     } catch (err) {
       message.error('Failed to load workers')
     } finally {
       setLoading(false)
+      setLoadingMore(false)
     }
   }
 
@@ -75,7 +82,7 @@ const WorkerDirectory = () => {
 
   // ⏳ Debounced fetch
   useEffect(() => {
-    const timer = setTimeout(fetchWorkers, 400)
+    const timer = setTimeout(() => fetchWorkers(), 400)
     return () => clearTimeout(timer)
   }, [searchTerm, category])
 
@@ -199,6 +206,14 @@ const WorkerDirectory = () => {
             ))}
           </Row>
         )}
+
+        {!loading && nextCursor && (
+          <div className="flex justify-center mt-8">
+            <Button onClick={() => fetchWorkers(nextCursor)} loading={loadingMore}>
+              Load more
+            </Button>
+          </div>
+        )}
       </div>
     </div>
   )
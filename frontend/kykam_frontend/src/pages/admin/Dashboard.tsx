@@ -2,6 +2,7 @@ import { useEffect, useState } from 'react';
 import axios from 'axios';
 import gsap from 'gsap';
 import UserTable from '../../components/admin/UserTable';
+import { getAllPages } from '../../api/pagination';
 import HiringRegistry from './HiringRegistry'; 
 import CategoryManager from './CategoryManager';
 import PlatformSettings from './PlatformSettings';
@@ -47,8 +48,7 @@ const Dashboard = () => {
       headers: { Authorization: `Token ${token}` },
     };
   setLoading(true);
-  const res = await axios.get(`'${API}/api/admin/manage-hires/'`, config);
-  setHires(res.data);
+  setHires(await getAllPages<any>(`${API}/api/admin/manage-hires/`, config));
   setLoading(false);
 };
 
@@ -58,15 +58,15 @@ const Dashboard = () => {
       const token = localStorage.getItem('token');
       const headers = { Authorization: `Token ${token}` };
       
-      const [statsRes, usersRes, hiresRes] = await Promise.all([
+      const [statsRes, users, hires] = await Promise.all([
         axios.get(`${API}/api/admin/manage-users/stats/`, { headers }),
-        axios.get(`${API}/api/admin/manage-users/`, { headers }),
-        axios.get(`${API}/api/admin/manage-hires/`, { headers }) // Endpoint for the registry
+        getAllPages<any>(`${API}/api/admin/manage-users/`, { headers }),
+        getAllPages<any>(`${API}/api/admin/manage-hires/`, { headers }) // Endpoint for the registry
       ]);
       
       setStats(statsRes.data);
-      setUsers(usersRes.data);
-      setHires(hiresRes.data);
+      setUsers(users);
+      setHires(hires);
       
       gsap.from(".stat-card", {
         opacity: 0,
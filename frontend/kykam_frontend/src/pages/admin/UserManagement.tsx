@@ -1,6 +1,6 @@
 import { useEffect, useState } from 'react';
-import axios from 'axios';
 import UserTable from '../../components/admin/UserTable';
+import { getAllPages } from '../../api/pagination';
 const API = import.meta.env.VITE_API_BASE_URL;
 const UserManagement = () => {
   const [users, setUsers] = useState([]);
@@ -11,10 +11,10 @@ const UserManagement = () => {
       try {
         // Replace with your login token logic
         const token = localStorage.getItem('token'); 
-        const response = await axios.get(`${API}/api/admin/manage-users/`, {
+        const users = await getAllPages<any>(`${API}/api/admin/manage-users/`, {
           headers: { Authorization: `Token ${token}` }
         });
-        setUsers(response.data);
+        setUsers(users);
       } catch (error) {
         console.error("Error fetching users:", error);
       } finally {
@@ -10,7 +10,8 @@ import {
   CloseCircleOutlined,
   UserOutlined,
   IdcardOutlined,
-  HomeOutlined
+  HomeOutlined,
+  WarningOutlined
 } from '@ant-design/icons';
 
 const API = import.meta.env.VITE_API_BASE_URL;
@@ -21,6 +22,7 @@ const VerificationPage = () => {
   const [user, setUser] = useState<any>(null);
   const [loading, setLoading] = useState(true);
   const [isModalOpen, setIsModalOpen] = useState(false);
+  const [duplicates, setDuplicates] = useState<any[]>([]);
 
   useEffect(() => {
     const fetchUserDetails = async () => {
@@ -36,7 +38,20 @@ const VerificationPage = () => {
         setLoading(false);
       }
     };
+    // Other accounts whose ID / passport photos look like this user's
+    const fetchPossibleDuplicates = async () => {
+      try {
+        const token = localStorage.getItem('token');
+        const res = await axios.get(`${API}/api/admin/manage-users/${userId}/possible_duplicates/`, {
+          headers: { Authorization: `Token ${token}` }
+        });
+        setDuplicates(res.data);
+      } catch (error) {
+        setDuplicates([]);
+      }
+    };
     fetchUserDetails();
+    fetchPossibleDuplicates();
   }, [userId]);
 
   const handleApprove = async () => {
@@ -133,6 +148,33 @@ const VerificationPage = () => {
             </div>
           </section>
 
+          {duplicates.length > 0 && (
+            <section className="bg-red-500/[0.05] p-6 rounded-3xl border border-red-500/20">
+              <h3 className="text-red-400 text-[10px] font-bold uppercase tracking-widest mb-6 flex items-center gap-2">
+                <WarningOutlined /> Possible Duplicates
+              </h3>
+              <div className="space-y-4">
+                {duplicates.map((d) => (
+                  <div key={`${d.user_id}-${d.field}`}>
+                    <button
+                      className="text-sm text-slate-200 capitalize hover:text-cyan-400 bg-transparent border-none p-0 cursor-pointer"
+                      onClick={() => navigate(`/admin/verify/${d.user_id}`)}
+                    >
+                      {d.full_name || d.username}
+                    </button>
+                    <p className="text-[10px] text-slate-500 m-0">
+                      {d.field.replace(/_/g, ' ')} matches their {d.matched_field.replace(/_/g, ' ')}
+                    </p>
+                    <Space size={4} className="mt-1">
+                      <Tag color={d.distance === 0 ? 'red' : 'orange'}>{d.distance} bits apart</Tag>
+                      <Tag>{d.is_deleted ? 'trashed' : d.status}</Tag>
+                    </Space>
+                  </div>
+                ))}
+              </div>
+            </section>
+          )}
+
           {isWorker ? (
             <section className="bg-white/[0.03] p-6 rounded-3xl border border-white/5">
               <h3 className="text-amber-400 text-[10px] font-bold uppercase tracking-widest mb-6 flex items-center gap-2">